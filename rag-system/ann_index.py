@@ -0,0 +1,255 @@
+# ann_index.py
+"""
+Inverted-file (IVF) approximate nearest-neighbour search.
+
+Rows are clustered around ``nlist`` k-means centroids and a query is only
+compared with the rows of its ``nprobe`` closest clusters, so it scans
+about nprobe / nlist of the corpus. Raise SIS_ANN_NPROBE for recall,
+lower it for latency; benchmarks/bench_ann.py prints the trade-off.
+
+The index wraps a VectorIndex or VectorStore. Vectors stay in the base
+(memory-mapped, for the store) and each row's cluster is kept in the
+base's label column, so a warm start needs no reassignment. Search stays
+exact until there are SIS_ANN_MIN_ROWS live rows to cluster.
+"""
+
+import math
+import os
+import threading
+
+import numpy as np
+
+from vector_index import normalize, top_k
+from vector_store import TOMBSTONE
+
+ANN_INDEX = os.getenv("SIS_ANN_INDEX", "ivf")
+NLIST = int(os.getenv("SIS_ANN_NLIST", "0"))  # 0 picks about sqrt(rows)
+NPROBE = int(os.getenv("SIS_ANN_NPROBE", "16"))
+MIN_ROWS = int(os.getenv("SIS_ANN_MIN_ROWS", "50000"))
+
+KMEANS_ITERS = 10
+SAMPLE_PER_LIST = 32
+# Retrain once the corpus has grown this many times since the last run
+RETRAIN_GROWTH = 4
+ASSIGN_BLOCK = 16384
+# Re-sort the inverted lists once this many rows were appended since
+TAIL_MIN = 4096
+TAIL_RATIO = 0.05
+
+
+def assign(vectors, centroids: np.ndarray) -> np.ndarray:
+    """Closest centroid (by dot product) for every row, block by block"""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        block = np.asarray(vectors[start:start + ASSIGN_BLOCK])
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T,
+                                                     axis=1)
+    return labels
+
+
+def kmeans(sample: np.ndarray, k: int, iters: int = KMEANS_ITERS,
+           seed: int = 0) -> np.ndarray:
+    """Spherical k-means: unit-length centroids, assignment by dot product"""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), k, replace=False)].copy()
+    for _ in range(iters):
+        labels = assign(sample, centroids)
+        counts = np.bincount(labels, minlength=k)
+        filled = counts > 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        order = np.argsort(labels, kind="stable")
+        centroids[filled] = np.add.reduceat(sample[order], starts, axis=0)
+        # Reseed clusters that lost all their rows
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(len(sample), len(empty),
+                                                 replace=False)]
+        normalize(centroids)
+    return centroids
+
+
+class IVFIndex:
+    """IVF search layered over a VectorIndex or VectorStore.
+
+    Inserts are assigned to their closest centroid as they arrive;
+    clustering runs in a background thread once the corpus reaches
+    ``min_rows`` and again whenever it has grown ``RETRAIN_GROWTH``-fold.
+    """
+
+    def __init__(self, base, nlist: int = NLIST, nprobe: int = NPROBE,
+                 min_rows: int = MIN_ROWS):
+        self.base = base
+        self.dim = base.dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_rows = min_rows
+        self._centroids = None
+        self._trained_rows = 0
+        self._loaded = False
+        # Bumped by every training run to invalidate the inverted lists
+        self._version = 0
+        self._lists = None
+        self._lock = threading.RLock()
+        self._train_lock = threading.Lock()
+        self._trainer = None
+
+    def __len__(self):
+        return len(self.base)
+
+    def watermark(self, kind: int) -> int:
+        return self.base.watermark(kind)
+
+    def ids(self, kind: int):
+        return self.base.ids(kind)
+
+    def count(self, kind: int) -> int:
+        return self.base.count(kind)
+
+    def remove(self, keys):
+        self.base.remove(keys)
+
+    def _load(self):
+        """Pick up centroids persisted by an earlier run"""
+        if self._loaded:
+            return
+        centroids, meta = self.base.load_array("ivf_centroids")
+        if centroids is not None and centroids.shape[1] == self.dim:
+            self._centroids = centroids.astype(np.float32)
+            self._trained_rows = meta.get("trained_rows", len(centroids))
+        self._loaded = True
+
+    def add(self, keys, vectors: np.ndarray, labels=None):
+        """Insert rows, labelled with their cluster once trained"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            self._load()
+            if self._centroids is not None:
+                labels = assign(vectors, self._centroids)
+            self.base.add(keys, vectors, labels)
+        self._maybe_train()
+
+    def _maybe_train(self):
+        with self._lock:
+            live = len(self.base)
+            if self._centroids is None:
+                due = live >= self.min_rows
+            else:
+                due = live >= RETRAIN_GROWTH * self._trained_rows
+            if due and not (self._trainer and self._trainer.is_alive()):
+                self._trainer = threading.Thread(target=self.train,
+                                                 name="ivf-trainer",
+                                                 daemon=True)
+                self._trainer.start()
+
+    def train(self) -> dict:
+        """Cluster a sample of the live rows and relabel every row"""
+        with self._train_lock:
+            # Retried if a compaction moves the rows mid-way
+            for _ in range(3):
+                vectors, keys, _, layout = self.base.snapshot()
+                rows = len(keys)
+                live = np.flatnonzero(np.asarray(keys) != TOMBSTONE)
+                if not len(live):
+                    break
+                nlist = self.nlist or min(16384, max(16, int(math.sqrt(
+                    len(live)))))
+                nlist = min(nlist, len(live))
+                rng = np.random.default_rng(rows)
+                sample = np.sort(rng.choice(
+                    live, min(len(live), nlist * SAMPLE_PER_LIST),
+                    replace=False))
+                centroids = kmeans(np.asarray(vectors[sample]), nlist,
+                                   seed=rows)
+                labels = assign(vectors, centroids)
+
+                with self._lock:
+                    vectors, keys, _, current = self.base.snapshot()
+                    if current != layout:
+                        continue
+                    # Rows added meanwhile were labelled with the old
+                    # centroids
+                    labels = np.concatenate(
+                        [labels, assign(vectors[rows:], centroids)])
+                    self.base.set_labels(layout, 0, labels)
+                    self.base.save_array("ivf_centroids", centroids,
+                                         {"trained_rows": len(live)})
+                    self._centroids = centroids
+                    self._trained_rows = len(live)
+                    self._loaded = True
+                    self._version += 1
+                    self._lists = None
+                    break
+        return self.stats()
+
+    def _inverted_lists(self, labels, layout) -> dict:
+        """Row positions grouped by cluster, re-sorted when stale.
+
+        Rows appended after the sort are checked by label at query time
+        until there are enough of them to sort again.
+        """
+        lists, rows = self._lists, len(labels)
+        if (lists is None or lists["layout"] != layout
+                or lists["version"] != self._version
+                or rows - lists["rows"] > max(TAIL_MIN,
+                                              TAIL_RATIO * lists["rows"])):
+            # Unassigned rows (-1) land in bucket 0, which is always scanned
+            shifted = np.asarray(labels) + 1
+            order = np.argsort(shifted, kind="stable")
+            bounds = np.searchsorted(shifted[order],
+                                     np.arange(len(self._centroids) + 2))
+            lists = self._lists = {"layout": layout,
+                                   "version": self._version,
+                                   "rows": rows, "order": order,
+                                   "bounds": bounds}
+        return lists
+
+    def search(self, queries: np.ndarray, k: int = 5, nprobe: int = None):
+        """Approximate top-k (keys, scores) per query row, best first"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            self._load()
+            centroids = self._centroids
+            if centroids is None:
+                return self.base.search(queries, k)
+            vectors, keys, labels, layout = self.base.snapshot()
+            lists = self._inverted_lists(labels, layout)
+
+        nprobe = max(1, min(nprobe or self.nprobe, len(centroids)))
+        probes = np.argpartition(-(queries @ centroids.T), nprobe - 1,
+                                 axis=1)[:, :nprobe]
+        order, bounds, sorted_rows = (lists["order"], lists["bounds"],
+                                      lists["rows"])
+        tail = np.asarray(labels[sorted_rows:])
+
+        results = []
+        for query, probe in zip(queries, probes):
+            parts = [order[bounds[0]:bounds[1]]]
+            parts += [order[bounds[p + 1]:bounds[p + 2]] for p in probe]
+            if len(tail):
+                hit = np.isin(tail, probe) | (tail < 0)
+                parts.append(sorted_rows + np.flatnonzero(hit))
+            # Sorted positions read the mapped matrix front to back
+            rows = np.sort(np.concatenate(parts))
+            if not len(rows):
+                results.append(([], []))
+                continue
+            row_keys = np.asarray(keys[rows])
+            scores = np.asarray(vectors[rows]) @ query
+            scores[row_keys == TOMBSTONE] = -np.inf
+            results.extend(top_k(scores[None, :], row_keys, k))
+        return results
+
+    def stats(self) -> dict:
+        stats = self.base.stats()
+        with self._lock:
+            self._load()
+            stats["ann"] = {
+                "type": "ivf",
+                "trained": self._centroids is not None,
+                "nlist": 0 if self._centroids is None else len(self._centroids),
+                "nprobe": self.nprobe,
+                "min_rows": self.min_rows,
+                "trained_rows": self._trained_rows,
+                "training": bool(self._trainer and self._trainer.is_alive())
+            }
+        return stats
@@ -5,7 +5,11 @@ from fastapi import FastAPI
 # Load environment variables
 load_dotenv()
 
+# Imported after load_dotenv so the SIS_* database settings from .env apply
+from enhanced_features import add_enhanced_endpoints
+
 app = FastAPI()
+add_enhanced_endpoints(app)
 
 # Get API key from environment
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
@@ -0,0 +1,92 @@
+# benchmarks/bench_ann.py
+"""
+Benchmark: recall@k and latency of IVF search against exact search.
+
+Run from the rag-system directory:
+    python -m benchmarks.bench_ann --rows 100000 --nprobe 1,4,16,64
+
+Synthetic requirement texts are embedded with the hashing embedder and
+searched one query at a time. recall@k is the share of the exact top-k
+that IVF also returns; a hit tied on score with the exact k-th result
+counts as found, since either is a correct answer.
+"""
+
+import argparse
+import random
+import time
+
+from ann_index import IVFIndex
+from benchmarks.bench_search import QUALITIES, SUBJECTS, VERBS
+from vector_index import HashingEmbedder, VectorIndex
+
+TOPICS = ["parking", "housing", "library", "dining", "athletics", "payroll",
+          "alumni", "admissions", "financial aid", "research grants",
+          "accessibility", "wifi", "printing", "lab safety", "advising",
+          "scholarships", "attendance", "exams", "graduation", "visas"]
+
+
+def texts(count, rng):
+    for _ in range(count):
+        subject, verb = rng.choice(SUBJECTS), rng.choice(VERBS)
+        yield (f"The {rng.choice(TOPICS)} system shall let the {subject} "
+               f"{verb} {rng.choice(TOPICS)} records {rng.choice(QUALITIES)}")
+
+
+def per_query(search, queries, k):
+    results, start = [], time.perf_counter()
+    for query in queries:
+        results.extend(search(query[None, :], k))
+    return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def recall(exact, approx, k):
+    found = 0
+    for (_, exact_scores), (keys, scores) in zip(exact, approx):
+        if not exact_scores:
+            continue
+        kth = exact_scores[-1] - 1e-6
+        found += min(k, sum(score >= kth for score in scores))
+    return found / (k * len(exact))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32,64")
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    embedder = HashingEmbedder()
+    start = time.perf_counter()
+    base = VectorIndex(embedder.dim, capacity=args.rows)
+    batch = 10000
+    for first in range(0, args.rows, batch):
+        count = min(batch, args.rows - first)
+        base.add(range(first + 1, first + count + 1),
+                 embedder.embed(texts(count, rng)))
+    queries = embedder.embed(texts(args.queries, rng))
+    print(f"{args.rows:,} rows embedded in {time.perf_counter() - start:.1f}s")
+
+    ivf = IVFIndex(base, nlist=args.nlist, min_rows=0)
+    start = time.perf_counter()
+    stats = ivf.train()["ann"]
+    print(f"IVF trained in {time.perf_counter() - start:.1f}s "
+          f"(nlist {stats['nlist']})")
+
+    exact, exact_ms = per_query(base.search, queries, args.k)
+    print(f"\n  {'search':<12} {'recall@' + str(args.k):>10} "
+          f"{'ms/query':>9} {'speedup':>8}")
+    print(f"  {'exact':<12} {1.0:>10.3f} {exact_ms:>9.2f} {1.0:>8.1f}")
+    for nprobe in map(int, args.nprobe.split(",")):
+        approx, ms = per_query(
+            lambda q, k: ivf.search(q, k, nprobe=nprobe), queries, args.k)
+        print(f"  {'nprobe ' + str(nprobe):<12} "
+              f"{recall(exact, approx, args.k):>10.3f} {ms:>9.2f} "
+              f"{exact_ms / ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
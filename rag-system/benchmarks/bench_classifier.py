@@ -0,0 +1,101 @@
+# benchmarks/bench_classifier.py
+"""
+Micro-benchmark: per-keyword substring scans vs the compiled KeywordMatcher.
+
+Run from the rag-system directory:
+    python -m benchmarks.bench_classifier
+
+Tables below pegs_matcher.SCAN_THRESHOLD use per-keyword substring checks
+by design; the single-pass pattern pays off for larger tables. Scores are
+checked for equality against the old PEGSClassifier loop for
+every document size and keyword-table size before timing is reported.
+"""
+
+import argparse
+import random
+import string
+import time
+
+from pegs_matcher import KeywordMatcher
+
+DEFAULT_TABLE = {
+    "Project": ["timeline", "schedule", "milestone", "budget", "resource", "deadline"],
+    "Environment": ["compliance", "regulation", "integration", "ferpa", "gdpr", "policy"],
+    "Goals": ["objective", "target", "metric", "kpi", "roi", "efficiency"],
+    "System": ["architecture", "database", "api", "security", "performance", "authentication"]
+}
+
+
+def naive_scores(table, text):
+    """The pre-matcher PEGSClassifier.classify loop"""
+    scores = {}
+    text_lower = text.lower()
+    for category, keywords in table.items():
+        score = sum(1 for keyword in keywords if keyword in text_lower)
+        scores[category] = score / len(keywords) if keywords else 0
+    total = sum(scores.values())
+    if total > 0:
+        return {k: v / total for k, v in scores.items()}
+    return {"System": 1.0}
+
+
+def synthetic_table(size, rng):
+    if size <= 24:
+        return DEFAULT_TABLE
+    words = {"".join(rng.choice(string.ascii_lowercase)
+                     for _ in range(rng.randint(4, 12)))
+             for _ in range(size)}
+    table = {category: list(kws) for category, kws in DEFAULT_TABLE.items()}
+    for i, word in enumerate(sorted(words)):
+        table[list(table)[i % 4]].append(word)
+    return table
+
+
+def synthetic_text(size, table, rng):
+    vocabulary = [kw for kws in table.values() for kw in kws]
+    filler = ["the", "system", "shall", "provide", "students", "with",
+              "access", "records", "and", "reports", "during", "term"]
+    words, length = [], 0
+    while length < size:
+        word = rng.choice(vocabulary) if rng.random() < 0.02 else rng.choice(filler)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--doc-sizes", default="1000,10000,100000,500000")
+    parser.add_argument("--keyword-sizes", default="24,1000,5000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    print(f"{'keywords':>8} {'doc bytes':>10} {'naive ms':>10} "
+          f"{'build ms':>9} {'matcher ms':>11} {'speedup':>8}")
+    for keyword_size in map(int, args.keyword_sizes.split(",")):
+        table = synthetic_table(keyword_size, rng)
+        start = time.perf_counter()
+        matcher = KeywordMatcher(table)
+        build = time.perf_counter() - start
+        for doc_size in map(int, args.doc_sizes.split(",")):
+            text = synthetic_text(doc_size, table, rng)
+            assert matcher.scores(text) == naive_scores(table, text)
+            naive = best_of(lambda: naive_scores(table, text), args.repeat)
+            fast = best_of(lambda: matcher.scores(text), args.repeat)
+            print(f"{len(matcher.keywords):>8} {doc_size:>10} "
+                  f"{naive * 1000:>10.2f} {build * 1000:>9.1f} "
+                  f"{fast * 1000:>11.2f} {naive / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/bench_document_ingest.py
+"""
+Benchmark: peak memory of whole-file vs streaming document extraction.
+
+Run from the rag-system directory:
+    python -m benchmarks.bench_document_ingest --pages 100,500
+
+A synthetic spec of --pages pages is written to a temp file, then:
+
+  whole   every page's text joined into one string (one ``content`` row)
+  stream  pages -> overlapping chunks -> classified batches, as
+          /api/documents does, holding one batch at a time
+
+Peak Python heap is measured with tracemalloc, after an untraced
+read has imported PyPDF2 so its module tables are not counted.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_search import QUALITIES, SUBJECTS, VERBS
+from benchmarks.fixtures import make_pdf
+from document_ingest import CHUNK_BATCH, chunk_text, next_batch, pdf_pages
+
+
+def spec_pages(pages, rng):
+    for page in range(pages):
+        yield [f"{page + 1}.{line} The {rng.choice(SUBJECTS)} shall "
+               f"{rng.choice(VERBS)} records {rng.choice(QUALITIES)}."
+               for line in range(50)]
+
+
+def classify(texts):
+    return ["System"] * len(texts)
+
+
+def whole(path):
+    with open(path, "rb") as f:
+        content = "\n".join(text for _, text in pdf_pages(f))
+    return len(content)
+
+
+def stream(path):
+    chunks = 0
+    with open(path, "rb") as f:
+        pieces = chunk_text(pdf_pages(f))
+        while True:
+            batch = next_batch(pieces, CHUNK_BATCH, classify)
+            if not batch:
+                break
+            chunks += len(batch)
+    return chunks
+
+
+def measure(fn, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(path)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", default="100,500")
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    print(f"{'pages':>6} {'file MB':>8} {'whole MB':>9} {'stream MB':>10} "
+          f"{'chunks':>7} {'stream s':>9}")
+    for pages in map(int, args.pages.split(",")):
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(make_pdf(spec_pages(pages, rng)))
+        # Untraced pass, so PyPDF2's import and caches are not counted
+        whole(path)
+        _, _, whole_mb = measure(whole, path)
+        chunks, seconds, stream_mb = measure(stream, path)
+        print(f"{pages:>6} {os.path.getsize(path) / 1024 / 1024:>8.1f} "
+              f"{whole_mb:>9.1f} {stream_mb:>10.1f} {chunks:>7} "
+              f"{seconds:>9.2f}")
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
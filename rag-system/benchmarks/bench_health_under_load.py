@@ -0,0 +1,152 @@
+# benchmarks/bench_health_under_load.py
+"""
+Load test: /health latency while /api/requirements/store is saturated.
+
+Run from the rag-system directory:
+    python -m benchmarks.bench_health_under_load --writers 64 --seconds 10
+
+The app is served by a separate uvicorn process against a scratch
+database, so the load generator does not share its GIL. The same load is
+replayed against a copy of the old inline-sqlite3 store
+handler (/bench/store-inline) so the before/after p99 can be compared.
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRATCH = tempfile.mkdtemp(prefix="sis-bench-")
+# Everything the app writes goes to the scratch directory: importing it
+# with the default SIS_VECTOR_DIR would reset the live vector store
+os.environ.setdefault("SIS_DB_PATH", os.path.join(SCRATCH, "bench.db"))
+os.environ.setdefault("SIS_VECTOR_DIR", os.path.join(SCRATCH, "vector_store"))
+os.environ.setdefault("SIS_JOB_DIR", os.path.join(SCRATCH, "job_files"))
+
+import httpx  # noqa: E402
+
+from app import app  # noqa: E402
+from enhanced_features import classify_pegs  # noqa: E402
+
+
+@app.post("/bench/store-inline")
+async def store_inline(data: dict):
+    """Pre-pool store handler: blocking sqlite3 calls on the event loop"""
+    conn = sqlite3.connect(os.environ["SIS_DB_PATH"])
+    c = conn.cursor()
+    category = classify_pegs(data.get("description", ""))
+    c.execute(
+        """INSERT INTO requirements (title, description, pegs_category, priority)
+                 VALUES (?, ?, ?, ?)""",
+        (data.get("title", ""), data.get("description", ""), category,
+         data.get("priority", "Medium")))
+    conn.commit()
+    req_id = c.lastrowid
+    conn.close()
+    return {"id": req_id, "category": category, "status": "stored"}
+
+
+def start_server(port: int) -> subprocess.Popen:
+    server = subprocess.Popen([
+        sys.executable, "-m", "uvicorn",
+        "benchmarks.bench_health_under_load:app", "--host", "127.0.0.1",
+        "--port", str(port), "--log-level", "warning"
+    ])
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health")
+            return server
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("uvicorn did not start")
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+async def probe_health(client, stop, interval):
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/health")
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def writer(client, path, stop, counter):
+    n = 0
+    while not stop.is_set():
+        await client.post(path, json={
+            "title": f"Load requirement {n}",
+            "description": "System shall meet the budget and schedule",
+            "priority": "High"
+        })
+        n += 1
+    counter.append(n)
+
+
+async def run_phase(base_url, store_path, writers, seconds, interval):
+    limits = httpx.Limits(max_connections=writers)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits,
+                                 timeout=60) as client, \
+            httpx.AsyncClient(base_url=base_url, timeout=60) as prober:
+        stop = asyncio.Event()
+        counts = []
+        tasks = [asyncio.create_task(writer(client, store_path, stop, counts))
+                 for _ in range(writers if store_path else 0)]
+        probe = asyncio.create_task(probe_health(prober, stop, interval))
+        await asyncio.sleep(seconds)
+        stop.set()
+        latencies = await probe
+        await asyncio.gather(*tasks)
+    return latencies, sum(counts)
+
+
+def report(label, latencies, stored, seconds):
+    print(f"{label:<28} health n={len(latencies):<5} "
+          f"p50={statistics.median(latencies):7.2f}ms "
+          f"p99={percentile(latencies, 0.99):7.2f}ms "
+          f"max={max(latencies):7.2f}ms   stores/s={stored / seconds:8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--writers", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--interval", type=float, default=0.01,
+                        help="pause between /health probes (seconds)")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = start_server(args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(f"Scratch database: {os.environ['SIS_DB_PATH']}")
+
+    phases = [
+        ("idle", None),
+        ("store (db executor)", "/api/requirements/store"),
+        ("store (inline sqlite3)", "/bench/store-inline"),
+    ]
+    try:
+        for label, path in phases:
+            latencies, stored = asyncio.run(
+                run_phase(base_url, path, args.writers, args.seconds,
+                          args.interval))
+            report(label, latencies, stored, args.seconds)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
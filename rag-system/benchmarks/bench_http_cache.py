@@ -0,0 +1,101 @@
+# benchmarks/bench_http_cache.py
+"""
+Benchmark: server cost of a dashboard poll with conditional caching.
+
+Run from the rag-system directory:
+    python -m benchmarks.bench_http_cache --rows 100000 --limit 1000
+
+A scratch database gets --rows synthetic requirements. Each poll of a
+--limit row /api/requirements/list page (gzip accepted) and of
+/api/pegs/stats runs through http_cache.cached_json() as:
+
+  render   no usable cache entry: query, encode and compress
+  cached   same URL at the same table version: the stored body
+  304      the client sends the current ETag
+
+Times are the mean of --polls calls, excluding HTTP transport.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from starlette.requests import Request
+
+from benchmarks.bench_search import populate
+from fast_json import dumps
+from http_cache import RenderedCache, cached_json, ensure_version_table
+from pegs_stats import ensure_counters, read_stats
+from requirements_list import fetch_page_json
+
+
+def request(path: str, query: str, headers: dict) -> Request:
+    return Request({
+        "type": "http", "method": "GET", "path": path,
+        "query_string": query.encode(), "scheme": "http",
+        "server": ("bench", 80),
+        "headers": [(k.lower().encode(), v.encode())
+                    for k, v in headers.items()]})
+
+
+def mean_ms(fn, polls):
+    start = time.perf_counter()
+    for _ in range(polls):
+        fn()
+    return (time.perf_counter() - start) * 1000 / polls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--polls", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = populate(os.path.join(tmp, "http.db"), args.rows,
+                        random.Random(25))
+        ensure_counters(conn)
+        ensure_version_table(conn)
+        endpoints = [
+            (f"list {args.limit}", "/api/requirements/list",
+             f"limit={args.limit}",
+             lambda: fetch_page_json(conn, "id", False, None, {},
+                                     args.limit)),
+            ("pegs stats", "/api/pegs/stats", "",
+             lambda: dumps(read_stats(conn))),
+        ]
+        print(f"{args.rows:,} requirements, mean of {args.polls} polls\n")
+        print(f"  {'endpoint':<12} {'render':>9} {'cached':>9} {'304':>9}"
+              f"   body")
+        for label, path, query, render in endpoints:
+            headers = {"Accept-Encoding": "gzip"}
+            cache = RenderedCache()
+            first = cached_json(request(path, query, headers), conn, render,
+                                cache)
+            etag = first.headers["etag"]
+
+            def uncached():
+                cache.clear()
+                cached_json(request(path, query, headers), conn, render,
+                            cache)
+
+            timings = [
+                mean_ms(uncached, args.polls),
+                mean_ms(lambda: cached_json(request(path, query, headers),
+                                            conn, render, cache),
+                        args.polls),
+                mean_ms(lambda: cached_json(
+                    request(path, query, {**headers, "If-None-Match": etag}),
+                    conn, render, cache), args.polls),
+            ]
+            print(f"  {label:<12} " +
+                  " ".join(f"{t:>7.3f}ms" for t in timings) +
+                  f"   {len(first.body):,} bytes")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
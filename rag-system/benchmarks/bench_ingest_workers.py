@@ -0,0 +1,88 @@
+# benchmarks/bench_ingest_workers.py
+"""
+Benchmark: PDF extraction throughput against the number of worker processes.
+
+Run from the rag-system directory:
+    python -m benchmarks.bench_ingest_workers --pdfs 100 --workers 1,2,4
+
+--pdfs synthetic specs of --pages pages each are written to a temp
+directory, then every page of every file is extracted:
+
+  in-process  one PdfReader per file, page after page (SIS_INGEST_WORKERS=0)
+  N workers   page ranges of SIS_INGEST_PAGES_PER_TASK spread over a pool
+              of N processes, as concurrent /api/documents uploads are
+
+Speedup is relative to in-process and cannot exceed the machine's core
+count (printed first).
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.bench_document_ingest import spec_pages
+from benchmarks.fixtures import make_pdf
+from document_ingest import pdf_pages
+from ingest_workers import PAGES_PER_TASK, extract_pdf_range, pdf_page_count
+
+
+def in_process(paths):
+    pages = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            pages += sum(1 for _ in pdf_pages(f))
+    return pages
+
+
+def pooled(paths, workers):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        counts = list(executor.map(pdf_page_count, paths))
+        futures = [executor.submit(extract_pdf_range, path, start,
+                                   min(start + PAGES_PER_TASK, count))
+                   for path, count in zip(paths, counts)
+                   for start in range(0, count, PAGES_PER_TASK)]
+        return sum(len(future.result()) for future in futures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pdfs", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--workers", default="1,2,4")
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    folder = tempfile.mkdtemp()
+    try:
+        paths = []
+        for number in range(args.pdfs):
+            path = os.path.join(folder, f"spec{number}.pdf")
+            with open(path, "wb") as f:
+                f.write(make_pdf(spec_pages(args.pages, rng)))
+            paths.append(path)
+        print(f"{args.pdfs} PDFs x {args.pages} pages, "
+              f"{os.cpu_count()} cores\n")
+
+        print(f"  {'extraction':<12} {'seconds':>8} {'pages/s':>8} "
+              f"{'speedup':>8}")
+        start = time.perf_counter()
+        pages = in_process(paths)
+        baseline = time.perf_counter() - start
+        print(f"  {'in-process':<12} {baseline:>8.2f} "
+              f"{pages / baseline:>8.0f} {1.0:>8.2f}")
+        for workers in map(int, args.workers.split(",")):
+            start = time.perf_counter()
+            pages = pooled(paths, workers)
+            seconds = time.perf_counter() - start
+            print(f"  {str(workers) + ' workers':<12} {seconds:>8.2f} "
+                  f"{pages / seconds:>8.0f} {baseline / seconds:>8.2f}")
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_llm_cache.py
+"""
+Benchmark: lookup cost of the two-tier LLM response cache.
+
+Run from the rag-system directory:
+    python -m benchmarks.bench_llm_cache --entries 1024
+
+The cache is filled with --entries synthetic prompts, then looked up with
+the same prompts re-cased (exact tier), slightly reworded (semantic
+tier) and with unseen prompts, which should all miss: a semantic match
+there is a wrong answer, so raise --threshold until there are none.
+Every lookup is far below one hosted-LLM round trip (~1-5 s).
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks.bench_ann import TOPICS
+from benchmarks.bench_search import QUALITIES, SUBJECTS, VERBS
+from llm_cache import CACHE_THRESHOLD, ResponseCache
+
+
+def prompt(rng):
+    return (f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} "
+            f"{rng.choice(TOPICS)} records {rng.choice(QUALITIES)} "
+            f"{rng.randrange(10 ** 6)}")
+
+
+def timed(cache, prompts):
+    hits, start = {}, time.perf_counter()
+    for text in prompts:
+        _, match = cache.get(text, "groq")
+        hits[match] = hits.get(match, 0) + 1
+    return hits, (time.perf_counter() - start) * 1000 / len(prompts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=1024)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--threshold", type=float, default=CACHE_THRESHOLD)
+    args = parser.parse_args()
+
+    rng = random.Random(13)
+    cache = ResponseCache(size=args.entries, threshold=args.threshold)
+    stored = [prompt(rng) for _ in range(args.entries)]
+    start = time.perf_counter()
+    for text in stored:
+        cache.put(text, "groq", {"requirements": [], "provider": "groq"})
+    put_ms = (time.perf_counter() - start) * 1000 / len(stored)
+    print(f"{args.entries} entries, put {put_ms:.3f} ms each\n")
+
+    sample = rng.sample(stored, min(args.lookups, len(stored)))
+    cases = {
+        "exact": [text.upper() + "?" for text in sample],
+        "reworded": [text.rsplit(" ", 1)[1] + " " + text.rsplit(" ", 1)[0]
+                     + " please" for text in sample],
+        "unseen": [prompt(rng) for _ in sample],
+    }
+    print(f"  {'lookup':<10} {'ms/lookup':>10}  matches")
+    for name, prompts in cases.items():
+        hits, ms = timed(cache, prompts)
+        print(f"  {name:<10} {ms:>10.3f}  {hits}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/bench_llm_client.py
+"""
+Benchmark: shared, limited, coalescing LLM client against the mock server.
+
+Run from the rag-system directory:
+    python -m benchmarks.bench_llm_client --requests 200 --latency 0.05
+
+benchmarks/mock_llm.py is started on a local port, then --requests calls
+are made concurrently:
+
+  per-call client  a new httpx.AsyncClient per call (no keep-alive)
+  shared client    LLMClient: one pooled client, per-provider semaphore
+  duplicates       LLMClient with every caller sending the same prompt
+
+For each run the table shows wall time, the calls the server received
+and the peak concurrency it saw (bounded by SIS_LLM_CONCURRENCY).
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from benchmarks import mock_llm
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_mock(port: int, latency: float) -> uvicorn.Server:
+    mock_llm.LATENCY = latency
+    server = uvicorn.Server(uvicorn.Config(mock_llm.app, host="127.0.0.1",
+                                           port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def per_call_client(url, prompts, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(prompt):
+        async with limit, httpx.AsyncClient() as client:
+            response = await client.post(url, json={
+                "model": "mock", "messages": [{"role": "user",
+                                               "content": prompt}]})
+            return response.json()["choices"][0]["message"]["content"]
+
+    return await asyncio.gather(*(one(p) for p in prompts))
+
+
+async def shared_client(prompts):
+    from llm_providers import LLMClient
+
+    client = LLMClient()
+    try:
+        return await asyncio.gather(*(client.complete("openai", p)
+                                      for p in prompts))
+    finally:
+        await client.aclose()
+
+
+def run(label, coroutine_factory, base):
+    httpx.post(base + "/stats/reset")
+    start = time.perf_counter()
+    answers = asyncio.run(coroutine_factory())
+    seconds = time.perf_counter() - start
+    stats = httpx.get(base + "/stats").json()
+    print(f"  {label:<16} {seconds:>8.2f} {len(answers):>8} "
+          f"{stats['calls']:>8} {stats['peak']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    # Read by llm_providers at import
+    os.environ["SIS_LLM_BASE_URL"] = base
+    from llm_providers import LLM_CONCURRENCY
+
+    server = start_mock(port, args.latency)
+    prompts = [f"Requirements for module {n}" for n in range(args.requests)]
+    print(f"{args.requests} calls, {args.latency * 1000:.0f} ms mock "
+          f"latency, concurrency {LLM_CONCURRENCY}\n")
+    print(f"  {'client':<16} {'seconds':>8} {'answers':>8} {'upstream':>8} "
+          f"{'peak':>6}")
+    run("per-call client", lambda: per_call_client(
+        base + "/v1/chat/completions", prompts, LLM_CONCURRENCY), base)
+    run("shared client", lambda: shared_client(prompts), base)
+    run("duplicates", lambda: shared_client([prompts[0]] * len(prompts)),
+        base)
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
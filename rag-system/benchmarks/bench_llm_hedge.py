@@ -0,0 +1,118 @@
+# benchmarks/bench_llm_hedge.py
+"""
+Benchmark: hedged LLM requests and circuit breakers against the mock server.
+
+Run from the rag-system directory:
+    python -m benchmarks.bench_llm_hedge --requests 300 --tail 0.04
+
+benchmarks/mock_llm.py plays three providers through query parameters:
+
+  primary    --latency seconds, but a --tail fraction of calls takes 2 s
+  secondary  1.5x --latency, no tail
+  down       answers 503 to everything
+
+and --requests prompts are answered (8 at a time) by:
+
+  primary only  LLMClient.complete() on the primary
+  hedged        LLMClient.hedged() primary -> secondary: the secondary is
+                asked when the primary has not answered within its p95
+  outage        hedged() down -> secondary: after SIS_LLM_BREAKER_FAILURES
+                errors the breaker opens and "down" is no longer called
+
+The table shows latency percentiles and the upstream calls per provider.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.bench_llm_client import free_port, start_mock
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run(client, call, prompts):
+    limit = asyncio.Semaphore(8)
+    latencies = []
+
+    async def one(prompt):
+        async with limit:
+            start = time.perf_counter()
+            await call(prompt)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(p) for p in prompts))
+    return latencies
+
+
+async def scenarios(base, args):
+    from llm_providers import LLMClient, Provider
+
+    path = "/v1/chat/completions?latency="
+    providers = {
+        "primary": Provider("primary", base, f"{path}{args.latency}&tail="
+                            f"{args.tail}&tail_latency=2", "", "mock"),
+        "secondary": Provider("secondary", base,
+                              f"{path}{args.latency * 1.5}", "", "mock"),
+        "down": Provider("down", base, f"{path}{args.latency}&error_rate=1",
+                         "", "mock"),
+    }
+    for spec in providers.values():
+        spec.concurrency = 32
+    client = LLMClient(providers)
+
+    async def primary(prompt):
+        return await client.complete("primary", prompt)
+
+    async def hedged(prompt):
+        return await client.hedged(["primary", "secondary"], prompt)
+
+    async def outage(prompt):
+        return await client.hedged(["down", "secondary"], prompt)
+
+    print(f"  {'run':<13} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7}  "
+          f"upstream calls")
+    try:
+        for label, call in [("primary only", primary), ("hedged", hedged),
+                            ("outage", outage)]:
+            before = {n: s["requests"] for n, s in client._stats.items()}
+            latencies = await run(client, call, [
+                f"{label} prompt {n}" for n in range(args.requests)])
+            calls = {n: s["requests"] - before[n]
+                     for n, s in client._stats.items()
+                     if s["requests"] > before[n]}
+            print(f"  {label:<13} " + " ".join(
+                f"{percentile(latencies, q) * 1000:>5.0f}ms"
+                for q in (0.5, 0.95, 0.99, 1.0)) + f"  {calls}")
+        stats = client.stats()
+        print(f"\n  primary p95 {stats['primary']['p95_ms']} ms, hedge wins "
+              f"{stats['secondary']['hedge_wins']}/"
+              f"{stats['secondary']['hedged']}; down breaker "
+              f"{stats['down']['breaker']}")
+    finally:
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--tail", type=float, default=0.04)
+    args = parser.parse_args()
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    os.environ["SIS_LLM_BASE_URL"] = base
+    server = start_mock(port, args.latency)
+    print(f"{args.requests} prompts, {args.latency * 1000:.0f} ms latency, "
+          f"{args.tail:.0%} of primary calls take 2 s\n")
+    asyncio.run(scenarios(base, args))
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
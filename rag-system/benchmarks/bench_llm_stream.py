@@ -0,0 +1,75 @@
+# benchmarks/bench_llm_stream.py
+"""
+Benchmark: time to first token / requirement when streaming from the LLM.
+
+Run from the rag-system directory:
+    python -m benchmarks.bench_llm_stream --latency 0.3 --token-delay 0.01
+
+benchmarks/mock_llm.py is started on a local port and each provider is
+asked for the same answer twice: once with LLMClient.complete(), where
+nothing can be shown before the whole completion arrives, and once with
+LLMClient.stream() fed through RequirementParser.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks import mock_llm
+from benchmarks.bench_llm_client import free_port, start_mock
+
+PROMPT = "Requirements for student records FERPA compliance"
+
+
+async def measure(provider: str) -> dict:
+    from llm_providers import LLMClient
+    from requirement_parser import RequirementParser, parse_requirements
+
+    client = LLMClient()
+    try:
+        start = time.perf_counter()
+        text = await client.complete(provider, PROMPT)
+        complete_ms = (time.perf_counter() - start) * 1000
+        count = len(parse_requirements(text))
+
+        parser, first = RequirementParser(), {}
+        start = time.perf_counter()
+        async for piece in client.stream(provider, PROMPT):
+            first.setdefault("token", (time.perf_counter() - start) * 1000)
+            if parser.feed(piece):
+                first.setdefault("requirement",
+                                 (time.perf_counter() - start) * 1000)
+        parser.close()
+        return {"complete": complete_ms, "count": count,
+                "streamed": parser.count,
+                "stream": (time.perf_counter() - start) * 1000, **first}
+    finally:
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    port = free_port()
+    # Read by llm_providers at import
+    os.environ["SIS_LLM_BASE_URL"] = f"http://127.0.0.1:{port}"
+    mock_llm.TOKEN_DELAY = args.token_delay
+    server = start_mock(port, args.latency)
+    print(f"{args.latency * 1000:.0f} ms mock latency, "
+          f"{args.token_delay * 1000:.0f} ms per streamed word\n")
+    print(f"  {'provider':<10} {'complete':>9} {'1st token':>10} "
+          f"{'1st req':>8} {'stream':>8}  requirements")
+    for provider in ("openai", "anthropic"):
+        r = asyncio.run(measure(provider))
+        print(f"  {provider:<10} {r['complete']:>7.0f}ms "
+              f"{r['token']:>8.0f}ms {r['requirement']:>6.0f}ms "
+              f"{r['stream']:>6.0f}ms  {r['streamed']}/{r['count']}")
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/bench_local_generator.py
+"""
+Benchmark: throughput of the local rule-based requirement generator.
+
+Run from the rag-system directory:
+    python -m benchmarks.bench_local_generator --prompts 20000
+
+Synthetic stakeholder statements (a fraction --repeat of them verbatim
+repeats, as pasted survey answers are) go through:
+
+  chained   one ``any(trigger in prompt)`` test per template, the shape
+            of the old hard-coded _generate_local
+  generate  LocalGenerator.generate() per prompt
+  batch     LocalGenerator.generate_batch() over all prompts at once
+
+with the default templates and with --templates synthetic ones (beyond
+pegs_matcher.SCAN_THRESHOLD triggers the matcher switches to a single
+regex pass). Results are checked for equality before timings are shown.
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks.bench_search import QUALITIES, SUBJECTS, VERBS
+from local_generator import DEFAULT_TEMPLATES, COLUMNS, LocalGenerator
+
+
+def templates(count: int, rng) -> list:
+    rows = [dict(zip(COLUMNS, (i, *row, i, 1)))
+            for i, row in enumerate(DEFAULT_TEMPLATES)]
+    for i in range(len(rows), count):
+        word = "".join(rng.choice("bcdfghklmnprstvz") + rng.choice("aeiou")
+                       for _ in range(4))
+        rows.append(dict(zip(COLUMNS, (
+            i, f"{word},{word}s module", f"Template {i}",
+            f"System shall support {word}", "System", "Medium", 0.7, i, 1))))
+    return rows
+
+
+def chained(rows):
+    compiled = [([t.strip().lower() for t in row["triggers"].split(",")],
+                 row) for row in rows]
+
+    def generate(prompt):
+        lower = prompt.lower()
+        requirements = [
+            {"title": row["title"], "description": row["description"],
+             "pegs_category": row["pegs_category"],
+             "priority": row["priority"], "confidence": row["confidence"]}
+            for triggers, row in compiled if any(t in lower for t in triggers)]
+        if not requirements:
+            requirements.append({"title": f"Requirement: {prompt[:50]}",
+                                 "description": prompt,
+                                 "pegs_category": "System",
+                                 "priority": "Medium", "confidence": 0.7})
+        return {"requirements": requirements, "provider": "local",
+                "count": len(requirements)}
+
+    return generate
+
+
+def statements(count: int, rows, repeat: float, rng) -> list:
+    words = [t.strip() for row in rows for t in row["triggers"].split(",")]
+    out = []
+    for _ in range(count):
+        if out and rng.random() < repeat:
+            out.append(rng.choice(out))
+            continue
+        topic = rng.choice(words) if rng.random() < 0.7 else "records"
+        out.append(f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {topic} "
+                   f"{rng.choice(QUALITIES)} for student services")
+    return out
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--prompts", type=int, default=20000)
+    parser.add_argument("--templates", type=int, default=500)
+    parser.add_argument("--repeat", type=float, default=0.3)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    print(f"{args.prompts} prompts, {args.repeat:.0%} repeated\n")
+    print(f"  {'templates':>9} {'method':<9} {'prompts/s':>10}")
+    for count in (len(DEFAULT_TEMPLATES), args.templates):
+        rows = templates(count, rng)
+        prompts = statements(args.prompts, rows, args.repeat, rng)
+        generator = LocalGenerator(rows)
+        naive = chained(rows)
+        runs = {
+            "chained": lambda: [naive(p) for p in prompts],
+            "generate": lambda: [generator.generate(p) for p in prompts],
+            "batch": lambda: generator.generate_batch(prompts),
+        }
+        expected = None
+        for name, run in runs.items():
+            results, seconds = timed(run)
+            if expected is None:
+                expected = results
+            assert results == expected, f"{name} differs from chained"
+            print(f"  {count:>9} {name:<9} {len(prompts) / seconds:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
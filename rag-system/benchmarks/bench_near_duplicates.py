@@ -0,0 +1,137 @@
+# benchmarks/bench_near_duplicates.py
+"""
+Benchmark: MinHash/LSH near-duplicate lookup vs a linear signature scan.
+
+Run from the rag-system directory:
+    python -m benchmarks.bench_near_duplicates --rows 50000
+
+A scratch database gets --rows synthetic requirements, a --dupes
+fraction of them light rewrites of earlier ones (re-cased, re-punctuated,
+a word added or dropped). It reports:
+
+  signing    index_missing() throughput
+  lookup     find_similar() through the LSH buckets vs comparing the
+             query with every stored signature, per query
+  report     duplicate_clusters() time, and how many of the planted
+             duplicates it grouped with their original
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_ann import TOPICS
+from benchmarks.bench_search import QUALITIES, SUBJECTS, VERBS
+from near_duplicates import (THRESHOLD, duplicate_clusters,
+                             ensure_dedup_tables, find_similar,
+                             index_missing, signature, similarity)
+
+
+def requirement(rng) -> str:
+    return (f"The {rng.choice(SUBJECTS)} shall {rng.choice(VERBS)} "
+            f"{rng.choice(TOPICS)} records {rng.choice(QUALITIES)} for "
+            f"{rng.choice(TOPICS)} within {rng.randrange(2, 60)} seconds")
+
+
+def rewrite(text: str, rng) -> str:
+    words = text.split()
+    choice = rng.randrange(4)
+    if choice == 0:
+        return text.upper() + "."
+    if choice == 1:
+        return text.replace("The ", "", 1) + "!"
+    if choice == 2:
+        words.insert(rng.randrange(len(words)), "always")
+    else:
+        del words[rng.randrange(1, len(words))]
+    return " ".join(words)
+
+
+def build(path: str, rows: int, dupes: float, rng):
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE requirements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, description TEXT,
+        pegs_category TEXT, priority TEXT, status TEXT,
+        created_at TIMESTAMP)""")
+    texts, planted = [], {}
+    for i in range(rows):
+        if texts and rng.random() < dupes:
+            original = rng.randrange(len(texts))
+            texts.append(rewrite(texts[original], rng))
+            planted[i + 1] = original + 1
+        else:
+            texts.append(requirement(rng))
+    conn.executemany("INSERT INTO requirements (title, description) "
+                     "VALUES (?, ?)", [(f"R{i}", t) for i, t in
+                                       enumerate(texts)])
+    conn.commit()
+    ensure_dedup_tables(conn)
+    return conn, texts, planted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dupes", type=float, default=0.1)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    with tempfile.TemporaryDirectory() as tmp:
+        conn, texts, planted = build(os.path.join(tmp, "dedup.db"),
+                                     args.rows, args.dupes, rng)
+        start = time.perf_counter()
+        while index_missing(conn):
+            pass
+        seconds = time.perf_counter() - start
+        print(f"{args.rows} requirements, {len(planted)} planted "
+              f"near-duplicates, threshold {THRESHOLD}\n")
+        print(f"  signing   {args.rows / seconds:,.0f} rows/s")
+
+        matrix = np.vstack([np.frombuffer(blob, dtype=np.uint32) for (blob,)
+                            in conn.execute("SELECT signature FROM "
+                                            "requirement_minhash ORDER BY "
+                                            "requirement_id")])
+        queries = [rewrite(rng.choice(texts), rng)
+                   for _ in range(args.queries)]
+        sigs = [signature(q) for q in queries]
+
+        start = time.perf_counter()
+        found = [find_similar(conn, sig) for sig in sigs]
+        lsh_ms = (time.perf_counter() - start) * 1000 / len(sigs)
+        start = time.perf_counter()
+        scanned = [np.flatnonzero((matrix == sig).mean(axis=1) >= THRESHOLD)
+                   for sig in sigs]
+        scan_ms = (time.perf_counter() - start) * 1000 / len(sigs)
+        agree = sum(bool(f) == bool(len(s)) for f, s in zip(found, scanned))
+        print(f"  lookup    LSH {lsh_ms:.2f} ms, linear scan {scan_ms:.2f} ms "
+              f"per query ({agree}/{len(sigs)} agree on a match)")
+
+        start = time.perf_counter()
+        report = duplicate_clusters(conn, max_clusters=args.rows)
+        seconds = time.perf_counter() - start
+        cluster_of = {}
+        for group in report["groups"]:
+            for rid in [group["keep"]] + group["duplicates"]:
+                cluster_of[rid] = group["keep"]
+        caught = sum(1 for dup, original in planted.items()
+                     if dup in cluster_of and
+                     cluster_of[dup] == cluster_of.get(original))
+        print(f"  report    {seconds:.2f} s, {report['clusters']} clusters, "
+              f"{report['compared']} comparisons; {caught}/{len(planted)} "
+              f"planted duplicates grouped with their original")
+        below = sum(similarity(signature(texts[d - 1]),
+                               signature(texts[o - 1])) < THRESHOLD
+                    for d, o in planted.items())
+        print(f"            ({below} planted rewrites estimate below the "
+              f"threshold)")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_pegs_analysis.py
+"""
+Benchmark: incremental PEGS completeness scores vs recomputing them.
+
+Run from the rag-system directory:
+    python -m benchmarks.bench_pegs_analysis --rows 10000,100000,1000000
+
+Each size gets a scratch database of synthetic requirements spread over
+--projects projects. Timings are the best of --repeat runs:
+
+  read      read_scores() for one project, from its counter rows
+  rescan    the same numbers by GROUP BY over the requirements table
+  snapshot  snapshot() of every project
+  insert    per-row cost of single-row inserts with and without the
+            counter triggers
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from benchmarks.bench_search import best_of
+from pegs_analysis import (CATEGORIES, ensure_analysis_tables, read_scores,
+                           snapshot)
+
+PRIORITIES = ["Critical", "High", "Medium", "Low"]
+STATUSES = ["Draft", "Approved", "Implemented"]
+
+
+def populate(path, rows, projects, rng):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("""CREATE TABLE requirements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT, description TEXT, pegs_category TEXT,
+        priority TEXT DEFAULT 'Medium', status TEXT DEFAULT 'Draft',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        project_id INTEGER)""")
+    conn.executemany(
+        "INSERT INTO requirements (title, description, pegs_category, "
+        "priority, status, project_id) VALUES (?, ?, ?, ?, ?, ?)",
+        ((f"R{i}", "The system shall ...", rng.choice(CATEGORIES),
+          rng.choice(PRIORITIES), rng.choice(STATUSES),
+          rng.randrange(1, projects + 1)) for i in range(rows)))
+    conn.commit()
+    return conn
+
+
+def rescan(conn, project_id):
+    return [conn.execute(
+        f"SELECT COALESCE({column}, ''), COUNT(*) FROM requirements "
+        f"WHERE COALESCE(project_id, 1) = ? GROUP BY 1",
+        (project_id,)).fetchall()
+        for column in ("pegs_category", "priority", "status")]
+
+
+def insert_ms(conn, count, rng):
+    start = time.perf_counter()
+    for _ in range(count):
+        conn.execute("INSERT INTO requirements (title, pegs_category, "
+                     "project_id) VALUES ('x', ?, 1)",
+                     (rng.choice(CATEGORIES),))
+        conn.commit()
+    return (time.perf_counter() - start) * 1000 / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", default="10000,100000,1000000")
+    parser.add_argument("--projects", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--inserts", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'read':>9} {'rescan':>10} {'snapshot':>10} "
+          f"{'insert':>9} {'+triggers':>10}")
+    for rows in (int(r) for r in args.rows.split(",")):
+        rng = random.Random(rows)
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = populate(os.path.join(tmp, "analysis.db"), rows,
+                            args.projects, rng)
+            plain = insert_ms(conn, args.inserts, rng)
+            ensure_analysis_tables(conn)
+            triggered = insert_ms(conn, args.inserts, rng)
+            read = best_of(lambda: read_scores(conn, 1), args.repeat)
+            scan = best_of(lambda: rescan(conn, 1), args.repeat)
+            snap = best_of(lambda: snapshot(conn, force=True), args.repeat)
+            print(f"{rows:>9,} {read:>7.3f}ms {scan:>8.1f}ms "
+                  f"{snap:>8.2f}ms {plain:>7.3f}ms {triggered:>8.3f}ms")
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# benchmarks/bench_search.py
+"""
+Benchmark: FTS5 search vs LIKE scans over the requirements table.
+
+Run from the rag-system directory:
+    python -m benchmarks.bench_search --rows 10000,100000,1000000
+
+Each size gets its own scratch database filled with synthetic
+requirements. Timings are the best of --repeat runs per query:
+
+  LIKE 20   first 20 unranked LIKE matches (stops early on common words)
+  LIKE all  every LIKE match, which is what ranking them would need
+  FTS 20    first page of 20 BM25-ranked, highlighted hits
+  FTS all   every FTS match (count only)
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from requirements_search import SEARCH_SQL, ensure_fts, to_match_query
+
+SUBJECTS = ["student", "faculty", "registrar", "advisor", "course",
+            "transcript", "enrollment", "grade", "tuition", "schedule"]
+VERBS = ["view", "update", "export", "approve", "archive", "audit",
+         "search", "notify", "import", "validate"]
+QUALITIES = ["within two seconds", "with multi-factor authentication",
+             "in compliance with FERPA", "under the project budget",
+             "with an audit trail", "for every academic term",
+             "using the reporting API", "without data loss"]
+QUERIES = ["authentication", "ferpa compliance", "transcript export",
+           "audit trail registrar", "grade 4242", "zzzznomatch"]
+
+
+def populate(path, rows, rng):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("""CREATE TABLE requirements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT, description TEXT, pegs_category TEXT,
+        priority TEXT DEFAULT 'Medium', status TEXT DEFAULT 'Draft',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""")
+
+    def generate():
+        for i in range(rows):
+            subject, verb = rng.choice(SUBJECTS), rng.choice(VERBS)
+            yield (f"{subject.title()} {verb} #{i}",
+                   f"The system shall let the {subject} {verb} records "
+                   f"{rng.choice(QUALITIES)} and {rng.choice(QUALITIES)}.",
+                   "System")
+
+    conn.executemany("INSERT INTO requirements (title, description, "
+                     "pegs_category) VALUES (?, ?, ?)", generate())
+    conn.commit()
+    return conn
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def like_search(conn, query, limit=-1):
+    clauses, params = [], []
+    for word in query.split():
+        clauses.append("(title LIKE ? OR description LIKE ?)")
+        params += [f"%{word}%", f"%{word}%"]
+    return conn.execute(
+        f"SELECT id, title, description FROM requirements "
+        f"WHERE {' AND '.join(clauses)} LIMIT ?", params + [limit]).fetchall()
+
+
+def fts_search(conn, query):
+    sql = SEARCH_SQL.format(category="")
+    return conn.execute(sql, ["<b>", "</b>", "<b>", "</b>",
+                              to_match_query(query), 20, 0]).fetchall()
+
+
+def fts_count(conn, query):
+    return conn.execute(
+        "SELECT COUNT(*) FROM requirements_fts WHERE requirements_fts MATCH ?",
+        [to_match_query(query)]).fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", default="10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    scratch = tempfile.mkdtemp(prefix="sis-bench-")
+    for rows in map(int, args.rows.split(",")):
+        conn = populate(os.path.join(scratch, f"search_{rows}.db"), rows, rng)
+        start = time.perf_counter()
+        ensure_fts(conn)
+        build = time.perf_counter() - start
+        print(f"\n{rows:,} rows (FTS index build {build:.1f}s)")
+        print(f"  {'query':<24} {'hits':>8} {'LIKE 20':>9} {'LIKE all':>9} "
+              f"{'FTS 20':>9} {'FTS all':>9}   (ms)")
+        for query in QUERIES:
+            timings = [
+                best_of(lambda: like_search(conn, query, 20), args.repeat),
+                best_of(lambda: like_search(conn, query), args.repeat),
+                best_of(lambda: fts_search(conn, query), args.repeat),
+                best_of(lambda: fts_count(conn, query), args.repeat),
+            ]
+            print(f"  {query:<24} {fts_count(conn, query):>8} " +
+                  " ".join(f"{t:>9.2f}" for t in timings))
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/bench_serialization.py
+"""
+Benchmark: JSON serialization cost of requirement lists, per 10k rows.
+
+Run from the rag-system directory:
+    python -m benchmarks.bench_serialization --rows 10000,100000
+
+Each size gets a scratch database of synthetic requirements. Every path
+starts from the query and ends with the response body bytes; timings
+are the best of --repeat runs, scaled to 10k rows:
+
+  orm + dicts      the old /api/requirements: ORM objects -> dicts ->
+                   jsonable_encoder -> json (skipped without SQLAlchemy)
+  dicts            the old /api/requirements/list: tuples -> dicts ->
+                   jsonable_encoder -> json
+  dicts + orjson   tuples -> dicts -> FastJSONResponse
+  sqlite json      fetch_page_json(): SQLite encodes each row with
+                   json_object(), Python joins the strings
+
+and the cost and size of compressing the body with gzip (and brotli
+when it is installed).
+"""
+
+import argparse
+import gzip
+import os
+import random
+import tempfile
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from benchmarks.bench_search import best_of, populate
+from fast_json import BROTLI_QUALITY, FastJSONResponse, orjson
+from requirements_list import COLUMNS, build_query, fetch_page_json
+
+ORM_COLUMNS = ("id", "title", "description", "pegs_category", "priority",
+               "status")
+
+
+def row_to_dict(row) -> dict:
+    return dict(zip(COLUMNS, row))
+
+
+def orm_path(path):
+    """Callable running the old ORM endpoint body, or None"""
+    try:
+        from sqlalchemy import Column, Integer, String, Text, create_engine
+        from sqlalchemy.orm import declarative_base, sessionmaker
+    except ImportError:
+        return None
+    Base = declarative_base()
+
+    class Requirement(Base):
+        __tablename__ = "requirements"
+        id = Column(Integer, primary_key=True)
+        title = Column(String)
+        description = Column(Text)
+        pegs_category = Column(String)
+        priority = Column(String)
+        status = Column(String)
+
+    session = sessionmaker(bind=create_engine(f"sqlite:///{path}"))()
+
+    def run():
+        session.expunge_all()
+        requirements = session.query(Requirement).all()
+        return JSONResponse(jsonable_encoder({
+            "count": len(requirements),
+            "requirements": [{c: getattr(r, c) for c in ORM_COLUMNS}
+                             for r in requirements]})).body
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", default="10000,100000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(24)
+    print(f"orjson {'installed' if orjson else 'missing (stdlib json)'}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in map(int, args.rows.split(",")):
+            path = os.path.join(tmp, f"serialize_{rows}.db")
+            conn = populate(path, rows, rng)
+            sql, params = build_query(limit=rows + 1)
+
+            def dicts():
+                page = [row_to_dict(r) for r in conn.execute(sql, params)]
+                return JSONResponse(jsonable_encoder({
+                    "count": len(page), "requirements": page,
+                    "next_cursor": None})).body
+
+            def dicts_orjson():
+                page = [row_to_dict(r) for r in conn.execute(sql, params)]
+                return FastJSONResponse({
+                    "count": len(page), "requirements": page,
+                    "next_cursor": None}).body
+
+            def sqlite_json():
+                return fetch_page_json(conn, "id", False, None, {}, rows)
+
+            scale = 10000 / rows
+            paths = [("orm + dicts", orm_path(path)), ("dicts", dicts),
+                     ("dicts + orjson", dicts_orjson),
+                     ("sqlite json", sqlite_json)]
+            print(f"\n{rows:,} rows ({len(sqlite_json()) / rows:.0f} "
+                  f"bytes/row), ms per 10k rows")
+            for label, run in paths:
+                if run is None:
+                    print(f"  {label:<16} skipped (needs SQLAlchemy)")
+                    continue
+                print(f"  {label:<16} "
+                      f"{best_of(run, args.repeat) * scale:>8.1f}")
+
+            body = sqlite_json()
+            codecs = [(f"gzip {level}", lambda level=level: gzip.compress(
+                body, compresslevel=level, mtime=0)) for level in (1, 5, 9)]
+            try:
+                import brotli
+                codecs.append((f"brotli {BROTLI_QUALITY}",
+                               lambda: brotli.compress(
+                                   body, quality=BROTLI_QUALITY)))
+            except ImportError:
+                pass
+            for label, run in codecs:
+                print(f"  {label:<16} {best_of(run, args.repeat) * scale:>8.1f}"
+                      f"   {len(body) / len(run()):.1f}x smaller")
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_store_throughput.py
+"""
+Sustained requirement inserts per second: per-row commits vs group commit.
+
+Run from the rag-system directory:
+    python -m benchmarks.bench_store_throughput --clients 64 --seconds 5
+
+Each client coroutine stores requirements back to back, the same way
+concurrent /api/requirements/store requests do. "per-row" commits every
+INSERT on its own (the pre-batcher store path); "batched" goes through
+WriteBatcher. All durability modes run one after another against the
+same scratch database, so later modes insert into a larger table.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+SCRATCH = tempfile.mkdtemp(prefix="sis-bench-")
+# Everything the app writes goes to the scratch directory: importing it
+# with the default SIS_VECTOR_DIR would reset the live vector store
+os.environ.setdefault("SIS_DB_PATH", os.path.join(SCRATCH, "bench.db"))
+os.environ.setdefault("SIS_VECTOR_DIR", os.path.join(SCRATCH, "vector_store"))
+os.environ.setdefault("SIS_JOB_DIR", os.path.join(SCRATCH, "job_files"))
+
+from db_pool import db  # noqa: E402
+from enhanced_features import INSERT_REQUIREMENT  # noqa: E402
+from write_batcher import DURABILITY_MODES, WriteBatcher  # noqa: E402
+
+ROW = ("Load requirement", "System shall meet the budget and schedule",
+       "Project", "High")
+
+
+def insert_one(conn, durability):
+    conn.execute(f"PRAGMA synchronous={DURABILITY_MODES[durability]}")
+    c = conn.cursor()
+    c.execute(INSERT_REQUIREMENT, ROW)
+    conn.commit()
+    return c.lastrowid
+
+
+async def run(store, clients, seconds):
+    stop = time.perf_counter() + seconds
+    counts = [0] * clients
+
+    async def client(i):
+        while time.perf_counter() < stop:
+            await store()
+            counts[i] += 1
+
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    return sum(counts) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--batch-rows", type=int, default=256)
+    parser.add_argument("--batch-delay-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(f"Scratch database: {os.environ['SIS_DB_PATH']}")
+    print(f"{'durability':<10} {'per-row/s':>12} {'batched/s':>12} {'speedup':>8}")
+    for durability in DURABILITY_MODES:
+        per_row = asyncio.run(run(
+            lambda: db.write(insert_one, durability), args.clients,
+            args.seconds))
+
+        batcher = WriteBatcher(INSERT_REQUIREMENT, max_rows=args.batch_rows,
+                               max_delay_ms=args.batch_delay_ms,
+                               durability=durability)
+        batched = asyncio.run(run(lambda: batcher.submit(ROW), args.clients,
+                                  args.seconds))
+        stats = batcher.stats()
+        print(f"{durability:<10} {per_row:>12.0f} {batched:>12.0f} "
+              f"{batched / per_row:>7.1f}x   (avg batch {stats['avg_batch']})")
+
+
+if __name__ == "__main__":
+    main()
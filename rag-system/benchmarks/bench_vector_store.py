@@ -0,0 +1,82 @@
+# benchmarks/bench_vector_store.py
+"""
+Benchmark: retrieval startup from the database vs the mmap vector store.
+
+Run from the rag-system directory:
+    python -m benchmarks.bench_vector_store --rows 10000,100000
+
+For each size a scratch database of synthetic requirements is indexed:
+
+  rebuild   in-memory index embedded from the table (every restart before)
+  first     persistent store written for the first time
+  warm      reopening the store and catching up with the table
+  query     first search after the warm start (pages the matrix in)
+  compact   background compaction after deleting 30% of the rows
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.bench_search import populate
+from retrieval import Retriever
+from vector_index import (KIND_REQUIREMENT, HashingEmbedder, VectorIndex,
+                          make_key)
+import vector_store
+from vector_store import VectorStore
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", default="10000,100000")
+    args = parser.parse_args()
+
+    # Compaction is timed explicitly below rather than in the background
+    vector_store.COMPACT_RATIO = 1.0
+
+    rng = random.Random(7)
+    embedder = HashingEmbedder()
+    scratch = tempfile.mkdtemp(prefix="sis-bench-")
+    print(f"{'rows':>9} {'rebuild':>9} {'first':>9} {'warm':>9} "
+          f"{'query':>9} {'compact':>9}   (seconds)")
+    for rows in map(int, args.rows.split(",")):
+        conn = populate(os.path.join(scratch, f"vectors_{rows}.db"), rows, rng)
+        path = os.path.join(scratch, f"store_{rows}")
+
+        def store():
+            return VectorStore(path, embedder.dim, embedder.name)
+
+        memory = Retriever(embedder, VectorIndex(embedder.dim))
+        _, rebuild = timed(lambda: memory.build(conn))
+        _, first = timed(lambda: Retriever(embedder, store()).build(conn))
+
+        warm_retriever = Retriever(embedder, store())
+        count, warm = timed(lambda: warm_retriever.build(conn))
+        assert count == rows, (count, rows)
+        _, query = timed(lambda: warm_retriever.retrieve(
+            conn, "transcript export with an audit trail"))
+
+        doomed = rng.sample(range(1, rows + 1), int(rows * 0.3))
+        warm_retriever.index.remove(
+            make_key(KIND_REQUIREMENT, i) for i in doomed)
+        stats, compact = timed(warm_retriever.index.compact)
+        assert stats["rows"] == rows - len(doomed)
+        print(f"{rows:>9,} {rebuild:>9.2f} {first:>9.2f} {warm:>9.3f} "
+              f"{query:>9.3f} {compact:>9.2f}")
+
+        conn.close()
+        shutil.rmtree(path)
+    shutil.rmtree(scratch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# benchmarks/mock_llm.py
+"""
+Offline stand-in for the OpenAI, Groq and Anthropic HTTP APIs.
+
+Run from the rag-system directory and point the app at it:
+    python -m benchmarks.mock_llm --port 8001 --latency 0.5
+    SIS_LLM_BASE_URL=http://127.0.0.1:8001 uvicorn app:app
+
+POST /v1/chat/completions (OpenAI, Groq) and /v1/messages (Anthropic)
+answer after --latency seconds with a JSON list of requirements derived
+from the prompt; with "stream": true the answer is sent as server-sent
+events in each API's format, a word every --token-delay seconds (a
+plain answer waits as long, the model generates it either way). A
+fraction --tail of calls takes ten times --latency and a fraction
+--error-rate answers 503 instead; the latency, tail, tail_latency and
+error_rate query parameters override them per URL, so one server can
+play several providers.
+GET /stats reports the calls received and the peak concurrency seen.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY = float(os.getenv("MOCK_LLM_LATENCY", "0.2"))
+ERROR_RATE = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+TOKEN_DELAY = float(os.getenv("MOCK_LLM_TOKEN_DELAY", "0"))
+TAIL_RATE = float(os.getenv("MOCK_LLM_TAIL", "0"))
+
+app = FastAPI()
+counters = {"calls": 0, "errors": 0, "active": 0, "peak": 0}
+
+
+def requirements_text(prompt: str) -> str:
+    """A deterministic JSON answer, one requirement per prompt line"""
+    lines = [line.strip() for line in prompt.splitlines() if line.strip()]
+    topic = lines[-1] if lines else "the system"
+    return json.dumps([
+        {"title": f"Requirement {n}: {topic[:40]}",
+         "description": f"The system shall support {topic} ({aspect}).",
+         "pegs_category": category,
+         "priority": priority}
+        for n, (aspect, category, priority) in enumerate([
+            ("core function", "System", "High"),
+            ("audit trail", "Environment", "Medium"),
+            ("delivery schedule", "Project", "Low")], 1)])
+
+
+async def answer(request: Request, build, event):
+    body = await request.json()
+    counters["calls"] += 1
+    counters["active"] += 1
+    counters["peak"] = max(counters["peak"], counters["active"])
+    try:
+        query = request.query_params
+        latency = float(query.get("latency", LATENCY))
+        if random.random() < float(query.get("tail", TAIL_RATE)):
+            latency = float(query.get("tail_latency", latency * 10))
+        await asyncio.sleep(latency)
+        if random.random() < float(query.get("error_rate", ERROR_RATE)):
+            counters["errors"] += 1
+            return JSONResponse(status_code=503,
+                                content={"error": "overloaded"})
+        text = requirements_text(body["messages"][-1]["content"])
+        pieces = re.findall(r"\S+\s*|\s+", text)
+        if body.get("stream"):
+            counters["active"] += 1  # until the stream ends
+            return StreamingResponse(stream(pieces, event),
+                                     media_type="text/event-stream")
+        await asyncio.sleep(TOKEN_DELAY * len(pieces))
+        return build(body["model"], text)
+    finally:
+        counters["active"] -= 1
+
+
+async def stream(pieces: list, event):
+    try:
+        for piece in pieces:
+            yield event(piece)
+            await asyncio.sleep(TOKEN_DELAY)
+        yield event(None)
+    finally:
+        counters["active"] -= 1
+
+
+def openai_event(piece):
+    if piece is None:
+        return "data: [DONE]\n\n"
+    return "data: " + json.dumps({"object": "chat.completion.chunk",
+                                  "choices": [{"index": 0, "delta": {
+                                      "content": piece}}]}) + "\n\n"
+
+
+def anthropic_event(piece):
+    if piece is None:
+        return ("event: message_stop\n"
+                'data: {"type": "message_stop"}\n\n')
+    return ("event: content_block_delta\ndata: " + json.dumps({
+        "type": "content_block_delta", "index": 0,
+        "delta": {"type": "text_delta", "text": piece}}) + "\n\n")
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    return await answer(request, lambda model, text: {
+        "object": "chat.completion", "model": model,
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": text}}]},
+        openai_event)
+
+
+@app.post("/v1/messages")
+async def messages(request: Request):
+    return await answer(request, lambda model, text: {
+        "type": "message", "role": "assistant", "model": model,
+        "stop_reason": "end_turn",
+        "content": [{"type": "text", "text": text}]}, anthropic_event)
+
+
+@app.get("/stats")
+def stats():
+    return counters
+
+
+@app.post("/stats/reset")
+def reset():
+    counters.update(calls=0, errors=0, active=0, peak=0)
+    return counters
+
+
+def main():
+    global LATENCY, ERROR_RATE, TOKEN_DELAY, TAIL_RATE
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=LATENCY)
+    parser.add_argument("--error-rate", type=float, default=ERROR_RATE)
+    parser.add_argument("--token-delay", type=float, default=TOKEN_DELAY)
+    parser.add_argument("--tail", type=float, default=TAIL_RATE)
+    args = parser.parse_args()
+    LATENCY, ERROR_RATE = args.latency, args.error_rate
+    TOKEN_DELAY, TAIL_RATE = args.token_delay, args.tail
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# bulk_ingest.py
+"""Streaming bulk ingest of requirements from NDJSON or CSV uploads"""
+
+import codecs
+import csv
+import json
+import os
+import tempfile
+import time
+from functools import partial
+from itertools import islice
+
+from starlette.concurrency import run_in_threadpool
+
+from db_pool import db
+
+# Ingest settings (override through environment variables)
+CHUNK_ROWS = int(os.getenv("SIS_BULK_CHUNK_ROWS", "1000"))
+MAX_LINE_BYTES = int(os.getenv("SIS_BULK_MAX_LINE_BYTES", str(1024 * 1024)))
+MAX_ERRORS_PER_CHUNK = 20
+
+INSERT_MANY = """INSERT INTO requirements (title, description, pegs_category, priority, status)
+                 VALUES (?, ?, ?, ?, ?)"""
+
+FORMATS = {
+    "ndjson": "ndjson",
+    "jsonl": "ndjson",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json-lines": "ndjson",
+    "csv": "csv",
+    "text/csv": "csv",
+}
+
+
+class BulkFormatError(ValueError):
+    """Raised when the upload format cannot be determined"""
+
+
+def detect_format(fmt: str = None, content_type: str = None) -> str:
+    """Pick ndjson or csv from an explicit ?format= or the Content-Type"""
+    for hint in (fmt, (content_type or "").split(";")[0].strip()):
+        if hint and hint.lower() in FORMATS:
+            return FORMATS[hint.lower()]
+    raise BulkFormatError(
+        "send ?format=ndjson|csv or a Content-Type of "
+        "application/x-ndjson or text/csv")
+
+
+async def spool_upload(request, spool=None):
+    """Copy the request body to a temp file chunk by chunk.
+
+    The body is spooled before processing starts because a streaming
+    response cannot reliably read the request body at the same time.
+    ``spool`` defaults to a SpooledTemporaryFile that stays in memory up
+    to 1 MB.
+    """
+    if spool is None:
+        spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def _lines(binary_file):
+    """Yield decoded lines (with line numbers) without reading it all"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    number = 0
+    while True:
+        raw = binary_file.readline(MAX_LINE_BYTES + 1)
+        if not raw:
+            break
+        number += 1
+        if len(raw) > MAX_LINE_BYTES and not raw.endswith(b"\n"):
+            raise ValueError(f"line {number} is longer than "
+                             f"{MAX_LINE_BYTES} bytes")
+        yield number, decoder.decode(raw).rstrip("\r\n")
+
+
+FIELDS = ("title", "description", "priority", "status")
+
+
+def _row(record: dict):
+    for name in FIELDS:
+        value = record.get(name)
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"{name} must be a string, "
+                             f"not {type(value).__name__}")
+    description = (record.get("description") or "").strip()
+    if not description:
+        raise ValueError("missing description")
+    return (
+        record.get("title") or "",
+        description,
+        record.get("priority") or "Medium",
+        record.get("status") or "Draft",
+    )
+
+
+def ndjson_rows(binary_file):
+    """Yield (line, row or error) for every non-blank NDJSON line"""
+    for number, line in _lines(binary_file):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("expected a JSON object")
+            yield number, _row(record)
+        except ValueError as e:
+            yield number, e
+
+
+def csv_rows(binary_file):
+    """Yield (line, row or error) for every CSV record after the header.
+
+    Lines are grouped into records by quote parity so quoted fields can
+    span lines without handing the whole file to csv.reader at once.
+    """
+    header = None
+    pending, start = [], 0
+    for number, line in _lines(binary_file):
+        if not pending:
+            start = number
+        pending.append(line)
+        if sum(part.count('"') for part in pending) % 2:
+            continue
+        text, pending = "\n".join(pending), []
+        if not text.strip():
+            continue
+        fields = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip().lower() for name in fields]
+            continue
+        try:
+            yield start, _row(dict(zip(header, fields)))
+        except ValueError as e:
+            yield start, e
+    if pending:
+        yield start, ValueError("unterminated quoted field")
+
+
+def next_chunk(rows, size: int, classify):
+    """Pull up to ``size`` parsed rows and classify them in one pass"""
+    good, errors, seen = [], [], 0
+    for number, row in rows:
+        seen += 1
+        if isinstance(row, Exception):
+            errors.append({"line": number, "error": str(row)})
+        else:
+            good.append(row)
+        if seen >= size:
+            break
+    categories = classify([row[1] for row in good])
+    params = [(title, description, category, priority, status)
+              for (title, description, priority, status), category
+              in zip(good, categories)]
+    return seen, params, errors
+
+
+def insert_chunk(conn, params, checkpoint=None):
+    """Insert one chunk in a single transaction and return its last id.
+
+    ``checkpoint(conn)`` runs in the same transaction.
+    """
+    c = conn.cursor()
+    c.execute("BEGIN")
+    try:
+        c.executemany(INSERT_MANY, params)
+        c.execute("SELECT last_insert_rowid()")
+        last_id = c.fetchone()[0]
+        if checkpoint is not None:
+            checkpoint(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return last_id
+
+
+def save_checkpoint(conn, checkpoint):
+    """Commit ``checkpoint(conn)`` for a chunk with nothing to insert"""
+    checkpoint(conn)
+    conn.commit()
+
+
+async def ingest(spool, fmt: str, classify, chunk_rows: int = CHUNK_ROWS,
+                 on_insert=None, skip: int = 0, checkpoint=None):
+    """Parse, classify and insert a spooled upload, yielding NDJSON progress.
+
+    ``on_insert(first_id, params)`` is called in a worker thread after
+    each chunk commits, e.g. to index the new rows. ``skip`` passes over
+    that many records first, to resume an interrupted ingest.
+    ``checkpoint(conn, records, params, errors)`` runs on the writer
+    connection in the transaction that inserts each chunk, so progress
+    saved there never disagrees with the committed rows.
+    """
+    rows = ndjson_rows(spool) if fmt == "ndjson" else csv_rows(spool)
+    rows = islice(rows, skip, None)
+    started = time.perf_counter()
+    chunk = inserted = rejected = 0
+    try:
+        while True:
+            try:
+                seen, params, errors = await run_in_threadpool(
+                    next_chunk, rows, chunk_rows, classify)
+            except ValueError as e:
+                yield json.dumps({"error": str(e), "inserted": inserted}) + "\n"
+                return
+            if not seen:
+                break
+            chunk += 1
+            last_id = None
+            saved = None if checkpoint is None else \
+                partial(checkpoint, records=seen, params=params, errors=errors)
+            if params:
+                last_id = await db.write(insert_chunk, params, saved)
+                if on_insert is not None:
+                    await run_in_threadpool(on_insert,
+                                            last_id - len(params) + 1, params)
+            elif saved is not None:
+                await db.write(save_checkpoint, saved)
+            inserted += len(params)
+            rejected += len(errors)
+            yield json.dumps({
+                "chunk": chunk,
+                "inserted": len(params),
+                "rejected": len(errors),
+                "first_id": last_id - len(params) + 1 if params else None,
+                "last_id": last_id,
+                "total_inserted": inserted,
+                "errors": errors[:MAX_ERRORS_PER_CHUNK]
+            }) + "\n"
+    finally:
+        spool.close()
+
+    elapsed = time.perf_counter() - started
+    yield json.dumps({
+        "done": True,
+        "chunks": chunk,
+        "inserted": inserted,
+        "rejected": rejected,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(inserted / elapsed, 1) if elapsed else None
+    }) + "\n"
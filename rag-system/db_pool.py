@@ -0,0 +1,272 @@
+# db_pool.py
+"""Pooled SQLite connections for the SIS endpoints"""
+
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from fastapi import HTTPException
+
+# Pool settings (override through environment variables)
+DB_PATH = os.getenv("SIS_DB_PATH", "sis_requirements.db")
+POOL_SIZE = int(os.getenv("SIS_DB_POOL_SIZE", "4"))
+ACQUIRE_TIMEOUT = float(os.getenv("SIS_DB_ACQUIRE_TIMEOUT", "5.0"))
+STATEMENT_CACHE = int(os.getenv("SIS_DB_STATEMENT_CACHE", "256"))
+CACHE_SIZE_KB = int(os.getenv("SIS_DB_CACHE_KB", "16384"))
+MMAP_SIZE = int(os.getenv("SIS_DB_MMAP_BYTES", str(256 * 1024 * 1024)))
+
+# Applied once to every connection when it is opened
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -CACHE_SIZE_KB),
+    ("mmap_size", MMAP_SIZE),
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", 5000),
+)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within the acquire timeout"""
+
+
+class PoolMetrics:
+    """Acquire wait and hold times over a sliding window of samples"""
+
+    def __init__(self, window: int = 2048):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)
+        self._holds = deque(maxlen=window)
+        self.acquired = 0
+        self.timeouts = 0
+
+    def record_acquire(self, seconds: float):
+        with self._lock:
+            self.acquired += 1
+            self._waits.append(seconds)
+
+    def record_release(self, seconds: float):
+        with self._lock:
+            self._holds.append(seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    @staticmethod
+    def _summary(samples) -> dict:
+        if not samples:
+            return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(samples)
+        last = len(ordered) - 1
+
+        def pct(p):
+            return round(ordered[min(last, int(p * len(ordered)))] * 1000, 3)
+
+        return {
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": round(ordered[-1] * 1000, 3)
+        }
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits, holds = list(self._waits), list(self._holds)
+            acquired, timeouts = self.acquired, self.timeouts
+        return {
+            "acquired": acquired,
+            "timeouts": timeouts,
+            "acquire_wait": self._summary(waits),
+            "hold_time": self._summary(holds)
+        }
+
+
+class ConnectionPool:
+    """Fixed-size pool of long-lived SQLite connections.
+
+    Connections are opened lazily up to ``size`` and then reused for the
+    life of the process, so the connect and schema-load cost is paid once
+    per connection instead of once per request.
+    """
+
+    def __init__(self, path: str = DB_PATH, size: int = POOL_SIZE,
+                 timeout: float = ACQUIRE_TIMEOUT,
+                 cached_statements: int = STATEMENT_CACHE):
+        self.path = path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.metrics = PoolMetrics()
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._in_use = 0
+        self._checked_out = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path,
+                               timeout=self.timeout,
+                               check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        for name, value in PRAGMAS:
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """Check out a connection, opening a new one while below ``size``"""
+        start = time.perf_counter()
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._opened < self.size
+                if grow:
+                    self._opened += 1
+            if grow:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    self.metrics.record_timeout()
+                    raise PoolTimeout(
+                        f"no SQLite connection free after {self.timeout}s "
+                        f"(pool size {self.size})")
+
+        with self._lock:
+            self._in_use += 1
+            self._checked_out[id(conn)] = time.perf_counter()
+        self.metrics.record_acquire(time.perf_counter() - start)
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection, rolling back anything left uncommitted"""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._in_use -= 1
+            checked_out = self._checked_out.pop(id(conn), None)
+        if checked_out is not None:
+            self.metrics.record_release(time.perf_counter() - checked_out)
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close the idle connections; the pool reopens them on demand"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            state = {
+                "size": self.size,
+                "opened": self._opened,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize()
+            }
+        state.update(self.metrics.snapshot())
+        return state
+
+
+# Shared pool for the whole app
+pool = ConnectionPool()
+
+
+def get_conn():
+    """FastAPI dependency that lends a pooled connection for one request"""
+    try:
+        conn = pool.acquire()
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+class AsyncDatabase:
+    """Async front end that runs blocking SQLite work on dedicated DB threads.
+
+    ``await db.run(fn, *args)`` calls ``fn(conn, *args)`` with a pooled
+    connection on one of the reader threads; ``await db.write(...)`` does
+    the same on a single writer thread. SQLite allows one writer at a
+    time, so funnelling writes through one thread avoids connections
+    sleeping in the busy handler while they fight over the write lock.
+
+    The writer keeps its own connection outside the pool, so writes never
+    queue behind readers or time out waiting for a pooled connection.
+    """
+
+    def __init__(self, pool: ConnectionPool, readers: int = None):
+        self.pool = pool
+        self._readers = ThreadPoolExecutor(max_workers=readers or pool.size,
+                                           thread_name_prefix="sis-db-read")
+        self._writer = ThreadPoolExecutor(max_workers=1,
+                                          thread_name_prefix="sis-db-write")
+        self._writer_conn = None  # only touched on the writer thread
+
+    def _call(self, fn, args):
+        with self.pool.connection() as conn:
+            return fn(conn, *args)
+
+    def _write_call(self, fn, args):
+        if self._writer_conn is None:
+            self._writer_conn = self.pool._connect()
+        conn = self._writer_conn
+        try:
+            return fn(conn, *args)
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+
+    async def run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._readers, self._call,
+                                              fn, args)
+        except PoolTimeout as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+    async def write(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self._write_call,
+                                          fn, args)
+
+    def close(self):
+        """Close the writer connection; the next write reopens it"""
+        self._writer.submit(self._close_writer).result()
+
+    def _close_writer(self):
+        if self._writer_conn is not None:
+            self._writer_conn.close()
+            self._writer_conn = None
+
+
+# Async access to the shared pool
+db = AsyncDatabase(pool)
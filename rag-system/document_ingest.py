@@ -0,0 +1,376 @@
+# document_ingest.py
+"""Streaming ingestion of PDF, DOCX and text documents into chunks"""
+
+import asyncio
+import codecs
+import json
+import os
+import time
+import zipfile
+from itertools import islice
+from xml.etree.ElementTree import iterparse
+
+from starlette.concurrency import run_in_threadpool
+
+from db_pool import db
+
+# Chunking settings (override through environment variables)
+CHUNK_CHARS = int(os.getenv("SIS_CHUNK_CHARS", "1200"))
+CHUNK_OVERLAP = int(os.getenv("SIS_CHUNK_OVERLAP", "200"))
+CHUNK_BATCH = int(os.getenv("SIS_CHUNK_BATCH", "64"))
+MAX_LINE_BYTES = 64 * 1024
+# Segments (pages, paragraphs, lines) read per worker-thread call
+SEGMENT_GROUP = 64
+
+FORMATS = {
+    "pdf": "pdf",
+    "application/pdf": "pdf",
+    "docx": "docx",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+        "docx",
+    "txt": "text",
+    "md": "text",
+    "text/plain": "text",
+    "text/markdown": "text",
+}
+
+# Same columns as database_models.Document, so either side may create it.
+# Chunked uploads leave ``content`` empty and keep per-category chunk
+# counts in ``pegs_analysis``.
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS documents (
+        id INTEGER PRIMARY KEY,
+        project_id INTEGER REFERENCES projects (id),
+        filename VARCHAR,
+        content TEXT,
+        extracted_requirements JSON,
+        pegs_analysis JSON,
+        uploaded_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )""",
+    # location_* is the page for PDFs, the paragraph for DOCX and the
+    # line for text files
+    """CREATE TABLE IF NOT EXISTS document_chunks (
+        id INTEGER PRIMARY KEY,
+        document_id INTEGER NOT NULL REFERENCES documents (id),
+        ordinal INTEGER NOT NULL,
+        location_start INTEGER,
+        location_end INTEGER,
+        text TEXT NOT NULL,
+        pegs_category TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE UNIQUE INDEX IF NOT EXISTS idx_document_chunks_document
+        ON document_chunks (document_id, ordinal)""",
+)
+
+INSERT_CHUNK = """INSERT INTO document_chunks
+    (document_id, ordinal, location_start, location_end, text, pegs_category)
+    VALUES (?, ?, ?, ?, ?, ?)"""
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+class DocumentFormatError(ValueError):
+    """Raised for an unsupported or unreadable document"""
+
+
+class IngestCancelled(Exception):
+    """Raised inside an ingest whose job was cancelled"""
+
+
+def ensure_document_tables(conn):
+    for ddl in SCHEMA:
+        conn.execute(ddl)
+    conn.commit()
+
+
+def detect_format(filename: str = None, content_type: str = None) -> str:
+    """Pick pdf, docx or text from the file extension or Content-Type"""
+    extension = os.path.splitext(filename or "")[1].lstrip(".").lower()
+    for hint in (extension, (content_type or "").split(";")[0].strip()):
+        if hint and hint.lower() in FORMATS:
+            return FORMATS[hint.lower()]
+    raise DocumentFormatError(
+        "send a .pdf, .docx, .txt or .md filename or a matching "
+        "Content-Type")
+
+
+def open_pdf(binary_file):
+    try:
+        from PyPDF2 import PdfReader
+        from PyPDF2.errors import PdfReadError
+    except ImportError:
+        raise DocumentFormatError("PDF support needs PyPDF2")
+    try:
+        return PdfReader(binary_file)
+    except PdfReadError as e:
+        raise DocumentFormatError(f"unreadable PDF: {e}")
+
+
+def pdf_page_text(reader, index: int) -> str:
+    """Text of one page (0-based); raises DocumentFormatError"""
+    from PyPDF2.errors import PdfReadError
+
+    try:
+        text = reader.pages[index].extract_text() or ""
+    except PdfReadError as e:
+        raise DocumentFormatError(f"unreadable PDF: {e}")
+    # PyPDF2 caches every object it parses; dropping the cache after each
+    # page keeps memory flat (objects are re-read from the file if needed
+    # again)
+    getattr(reader, "resolved_objects", {}).clear()
+    return text
+
+
+def pdf_pages(binary_file):
+    """Yield (page number, text) one page at a time"""
+    reader = open_pdf(binary_file)
+    for index in range(len(reader.pages)):
+        yield index + 1, pdf_page_text(reader, index)
+
+
+def docx_paragraphs(binary_file):
+    """Yield (paragraph number, text) straight from word/document.xml.
+
+    The XML is parsed incrementally and each paragraph is discarded once
+    read; python-docx would build the whole document tree first.
+    """
+    try:
+        archive = zipfile.ZipFile(binary_file)
+        xml = archive.open("word/document.xml")
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise DocumentFormatError(f"unreadable DOCX: {e}")
+
+    number = 0
+    with archive, xml:
+        for _, element in iterparse(xml, events=("end",)):
+            if element.tag != WORD_NS + "p":
+                continue
+            text = "".join(
+                (node.text or "") if node.tag == WORD_NS + "t" else " "
+                for node in element.iter()
+                if node.tag in (WORD_NS + "t", WORD_NS + "tab",
+                                WORD_NS + "br"))
+            element.clear()
+            number += 1
+            if text.strip():
+                yield number, text
+
+
+def text_lines(binary_file):
+    """Yield (line number, text), splitting overlong lines"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    number = 0
+    while True:
+        raw = binary_file.readline(MAX_LINE_BYTES)
+        if not raw:
+            break
+        number += 1
+        yield number, decoder.decode(raw)
+
+
+SEGMENTERS = {"pdf": pdf_pages, "docx": docx_paragraphs, "text": text_lines}
+
+
+class Chunker:
+    """Cuts a stream of segments into windows of ~``size`` characters.
+
+    Each window starts with the last ~``overlap`` characters of the one
+    before, so a requirement split across two windows is whole in one of
+    them. Windows are (text, first location, last location); only the
+    current window is held in memory.
+    """
+
+    def __init__(self, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP):
+        self.size = size
+        self.overlap = overlap
+        self._words, self._length, self._fresh = [], 0, 0
+
+    def _window(self):
+        words = self._words
+        return " ".join(w for w, _ in words), words[0][1], words[-1][1]
+
+    def feed(self, location, text: str) -> list:
+        """Add one segment and return the windows it completed"""
+        windows = []
+        for word in text.split():
+            self._words.append((word, location))
+            self._length += len(word) + 1
+            self._fresh += 1
+            if self._length < self.size:
+                continue
+            windows.append(self._window())
+            # Carry the tail over as the start of the next window
+            words, kept, keep = self._words, 0, 0
+            while keep < len(words) and \
+                    kept + len(words[-1 - keep][0]) + 1 <= self.overlap:
+                kept += len(words[-1 - keep][0]) + 1
+                keep += 1
+            self._words = words[len(words) - keep:]
+            self._length, self._fresh = kept, 0
+        return windows
+
+    def feed_all(self, segments) -> list:
+        windows = []
+        for location, text in segments:
+            windows.extend(self.feed(location, text))
+        return windows
+
+    def flush(self) -> list:
+        """The final, partly filled window (if it has any new words)"""
+        if not self._fresh:
+            return []
+        self._fresh = 0
+        return [self._window()]
+
+
+def chunk_text(segments, size: int = CHUNK_CHARS,
+               overlap: int = CHUNK_OVERLAP):
+    """Yield the Chunker windows of an iterable of (location, text)"""
+    chunker = Chunker(size, overlap)
+    for location, text in segments:
+        yield from chunker.feed(location, text)
+    yield from chunker.flush()
+
+
+def label(windows: list, classify) -> list:
+    """Classify a list of windows in one pass"""
+    categories = classify([text for text, _, _ in windows]) if windows else []
+    return [(text, start, end, category)
+            for (text, start, end), category in zip(windows, categories)]
+
+
+def next_batch(chunks, size: int, classify) -> list:
+    """Pull up to ``size`` chunks and classify them in one pass"""
+    return label(list(islice(chunks, size)), classify)
+
+
+async def read_segments(binary_file, fmt: str, group: int = SEGMENT_GROUP):
+    """Lists of up to ``group`` (location, text) segments, read in a
+    worker thread"""
+    segments = SEGMENTERS[fmt](binary_file)
+    while True:
+        block = await run_in_threadpool(list, islice(segments, group))
+        if not block:
+            break
+        yield block
+
+
+def create_document(conn, filename: str, project_id=None) -> int:
+    c = conn.cursor()
+    c.execute("INSERT INTO documents (project_id, filename) VALUES (?, ?)",
+              (project_id, filename))
+    conn.commit()
+    return c.lastrowid
+
+
+def insert_chunks(conn, document_id: int, first_ordinal: int,
+                  batch: list) -> int:
+    """Insert one batch in a single transaction and return its first id"""
+    c = conn.cursor()
+    c.execute("BEGIN")
+    try:
+        c.executemany(INSERT_CHUNK, [
+            (document_id, first_ordinal + i, start, end, text, category)
+            for i, (text, start, end, category) in enumerate(batch)])
+        c.execute("SELECT last_insert_rowid()")
+        last_id = c.fetchone()[0]
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return last_id - len(batch) + 1
+
+
+def finish_document(conn, document_id: int, by_category: dict):
+    conn.execute("UPDATE documents SET pegs_analysis = ? WHERE id = ?",
+                 (json.dumps(by_category), document_id))
+    conn.commit()
+
+
+def delete_document(conn, document_id: int) -> list:
+    """Remove a document and its chunks; returns the chunk ids removed"""
+    ids = [row[0] for row in conn.execute(
+        "SELECT id FROM document_chunks WHERE document_id = ?",
+        (document_id,))]
+    conn.execute("DELETE FROM document_chunks WHERE document_id = ?",
+                 (document_id,))
+    conn.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+    conn.commit()
+    return ids
+
+
+async def discard_document(document_id: int, on_delete=None):
+    removed = await db.write(delete_document, document_id)
+    if on_delete is not None:
+        await run_in_threadpool(on_delete, removed)
+
+
+async def ingest_document(spool, filename: str, fmt: str, classify,
+                          project_id=None, batch_size: int = CHUNK_BATCH,
+                          on_insert=None, on_delete=None, segments=None,
+                          job=None) -> dict:
+    """Extract, chunk, classify and store a spooled upload batch by batch.
+
+    ``segments`` is an async iterator of (location, text) lists in
+    document order; by default the file is read in a worker thread.
+    ``on_insert(first_id, batch)`` runs in a worker thread after each
+    batch commits (e.g. to embed it). ``job`` (see ingest_workers) gets
+    progress updates and is checked for cancellation between batches.
+    If anything fails part-way, including a cancelled or disconnected
+    upload, the document and its chunks are removed again and
+    ``on_delete(ids)`` is called before the error is re-raised.
+    """
+    started = time.perf_counter()
+    if segments is None:
+        segments = read_segments(spool, fmt)
+    chunker = Chunker()
+    document_id = await db.write(create_document, filename, project_id)
+    stored, last_location, by_category = 0, None, {}
+    if job is not None:
+        job.document_id = document_id
+
+    async def store(windows):
+        nonlocal stored, last_location
+        batch = await run_in_threadpool(label, windows, classify)
+        first_id = await db.write(insert_chunks, document_id, stored, batch)
+        if on_insert is not None:
+            await run_in_threadpool(on_insert, first_id, batch)
+        stored += len(batch)
+        last_location = batch[-1][2]
+        for _, _, _, category in batch:
+            by_category[category] = by_category.get(category, 0) + 1
+        if job is not None:
+            job.chunks = stored
+
+    try:
+        pending = []
+        async for block in segments:
+            if job is not None:
+                job.check()
+                job.location = block[-1][0]
+            pending += await run_in_threadpool(chunker.feed_all, block)
+            while len(pending) >= batch_size:
+                await store(pending[:batch_size])
+                del pending[:batch_size]
+        pending += chunker.flush()
+        for start in range(0, len(pending), batch_size):
+            await store(pending[start:start + batch_size])
+        await db.write(finish_document, document_id, by_category)
+    except BaseException:
+        # Shielded so the cleanup finishes even when the upload task is
+        # being cancelled
+        await asyncio.shield(discard_document(document_id, on_delete))
+        raise
+    finally:
+        spool.close()
+
+    return {
+        "document_id": document_id,
+        "filename": filename,
+        "format": fmt,
+        "chunks": stored,
+        "last_location": last_location,
+        "by_category": by_category,
+        "seconds": round(time.perf_counter() - started, 3)
+    }
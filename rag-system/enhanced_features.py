@@ -1,16 +1,65 @@
 # enhanced_features.py
 """Enhanced features for SIS Dashboard"""
 
+import asyncio
+import json
+import os
 import sqlite3
+import tempfile
+import time
+from contextlib import aclosing
 from datetime import datetime
+from functools import partial
 from typing import Optional
 
+from fastapi import Depends, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+
+from bulk_ingest import BulkFormatError, detect_format, ingest, spool_upload
+from db_pool import db, get_conn, pool
+from document_ingest import (DocumentFormatError, IngestCancelled,
+                             discard_document, ensure_document_tables,
+                             detect_format as detect_document_format)
+from fast_json import FastJSONResponse, dumps, json_response
+from http_cache import cached_json, ensure_version_table, rendered
+from ingest_workers import (jobs as ingest_jobs, start_document_job,
+                            shutdown as stop_ingest_workers)
+from job_queue import (JobCancelled, JobError, ensure_jobs_table, jobs,
+                       save_progress, upload_path)
+from llm_cache import response_cache
+from llm_providers import llm
+from local_generator import (ensure_template_table, get_generator,
+                             load_templates, reload_templates)
+from near_duplicates import (DEDUP_ON_WRITE, THRESHOLD as DEDUP_THRESHOLD,
+                             add_signatures, dedup_text, duplicate_clusters,
+                             ensure_dedup_tables, find_similar,
+                             index_missing, signature)
+from pegs_analysis import (DEFAULT_PROJECT, ensure_analysis_tables,
+                           history as analysis_history, read_scores,
+                           snapshot as analysis_snapshot, snapshots)
+from pegs_matcher import KeywordMatcher
+from pegs_stats import (check as check_counters, ensure_counters, read_stats,
+                        rebuild as rebuild_counters)
+from requirements_list import (INDEXES, ListQueryError, build_query,
+                               clamp_limit, fetch_page_json, stream_rows)
+from requirements_search import (SearchQueryError, SearchUnavailable,
+                                 ensure_fts, search)
+from retrieval import RETRIEVAL_BUDGET_MS, retriever
+from vector_index import KIND_CHUNK
+from write_batcher import WriteBatcher
+
 print("Loading enhanced features...")
 
 
 # Create database
 def init_db():
-    conn = sqlite3.connect('sis_requirements.db')
+    with pool.connection() as conn:
+        _create_schema(conn)
+
+
+def _create_schema(conn):
     c = conn.cursor()
 
     c.execute('''CREATE TABLE IF NOT EXISTS requirements (
@@ -20,7 +69,8 @@ def init_db():
         pegs_category TEXT,
         priority TEXT DEFAULT 'Medium',
         status TEXT DEFAULT 'Draft',
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        project_id INTEGER
     )''')
 
     c.execute('''CREATE TABLE IF NOT EXISTS projects (
@@ -38,6 +88,9 @@ def init_db():
         created_at TIMESTAMP
     )''')
 
+    for ddl in INDEXES:
+        c.execute(ddl)
+
     # Add default project
     c.execute("SELECT COUNT(*) FROM projects")
     if c.fetchone()[0] == 0:
@@ -45,24 +98,278 @@ def init_db():
                      VALUES ('SIS Project', 2500000, 29)""")
 
     conn.commit()
-    conn.close()
+    ensure_counters(conn)
+    ensure_fts(conn)
+    ensure_document_tables(conn)
+    ensure_jobs_table(conn)
+    ensure_template_table(conn)
+    ensure_dedup_tables(conn)
+    ensure_analysis_tables(conn)
+    ensure_version_table(conn)
 
 
 # Initialize database
 init_db()
 
 
-# PEGS classifier
+# PEGS classifier: categories are tried in this order, System is the
+# fallback. SIS_PEGS_KEYWORDS can point at a JSON file with another table.
+PEGS_KEYWORDS = {
+    "Project": ["timeline", "budget", "schedule"],
+    "Environment": ["compliance", "ferpa", "gdpr"],
+    "Goals": ["goal", "objective", "roi"],
+}
+PEGS_WORD_BOUNDARY = os.getenv("SIS_PEGS_WORD_BOUNDARY", "0") == "1"
+
+if os.getenv("SIS_PEGS_KEYWORDS"):
+    pegs_matcher = KeywordMatcher.from_json(os.getenv("SIS_PEGS_KEYWORDS"),
+                                            word_boundary=PEGS_WORD_BOUNDARY)
+else:
+    pegs_matcher = KeywordMatcher(PEGS_KEYWORDS,
+                                  word_boundary=PEGS_WORD_BOUNDARY)
+
+
 def classify_pegs(text):
-    text_lower = text.lower()
-    if any(w in text_lower for w in ["timeline", "budget", "schedule"]):
-        return "Project"
-    elif any(w in text_lower for w in ["compliance", "ferpa", "gdpr"]):
-        return "Environment"
-    elif any(w in text_lower for w in ["goal", "objective", "roi"]):
-        return "Goals"
-    else:
-        return "System"
+    return pegs_matcher.first_match(text or "", "System")
+
+
+def classify_pegs_batch(texts):
+    """Classify many texts at once with one vectorized scoring step"""
+    return pegs_matcher.first_match_batch([text or "" for text in texts],
+                                          "System")
+
+
+RECLASSIFY_CHUNK = 2000
+
+
+def reclassify_chunk(conn, after_id, size=RECLASSIFY_CHUNK):
+    """Re-score one id range and bulk-UPDATE rows whose category changed"""
+    rows = conn.execute(
+        "SELECT id, description, pegs_category FROM requirements "
+        "WHERE id > ? ORDER BY id LIMIT ?", (after_id, size)).fetchall()
+    if not rows:
+        return None, 0, 0
+    categories = classify_pegs_batch([row[1] for row in rows])
+    changed = [(category, row[0]) for row, category in zip(rows, categories)
+               if category != row[2]]
+    if changed:
+        conn.executemany(
+            "UPDATE requirements SET pegs_category = ? WHERE id = ?", changed)
+        conn.commit()
+    return rows[-1][0], len(rows), len(changed)
+
+
+INSERT_REQUIREMENT = """INSERT INTO requirements (title, description, pegs_category, priority)
+                        VALUES (?, ?, ?, ?)"""
+
+
+def store_requirement(c, params):
+    """Write one /api/requirements/store row with its MinHash signature.
+
+    With dedupe set, a stored near-duplicate (including one earlier in
+    the same batch) is returned as {"duplicate_of", "similarity"}
+    instead of inserting.
+    """
+    *row, sig, dedupe = params
+    if dedupe:
+        match = find_similar(c, sig, limit=1)
+        if match:
+            return {"duplicate_of": match[0][0], "similarity": match[0][1]}
+    c.execute(INSERT_REQUIREMENT, row)
+    req_id = c.lastrowid
+    add_signatures(c, [(req_id, sig)])
+    return req_id
+
+
+# Concurrent /api/requirements/store calls share one commit
+store_batcher = WriteBatcher(INSERT_REQUIREMENT, writer=store_requirement)
+
+
+def _index_bulk_chunk(first_id, params):
+    retriever.add_requirements(
+        (first_id + i, title, description)
+        for i, (title, description, *_) in enumerate(params))
+
+
+def _index_document_chunks(filename, first_id, batch):
+    retriever.add_chunks((first_id + i, filename, text)
+                         for i, (text, *_) in enumerate(batch))
+
+
+def _unindex_document_chunks(chunk_ids):
+    retriever.remove(KIND_CHUNK, chunk_ids)
+
+
+# Background jobs (see job_queue.py); each resumes from its last
+# checkpoint when retried or restarted
+
+@jobs.handler("pegs.reclassify")
+async def _reclassify_job(job):
+    """Re-score every stored requirement and update changed categories"""
+    progress = job.progress or {"after_id": 0, "scanned": 0, "updated": 0}
+    while True:
+        # One chunk per writer-thread call so stores can interleave
+        after_id, seen, changed = await db.write(reclassify_chunk,
+                                                 progress["after_id"])
+        if after_id is None:
+            break
+        progress = {"after_id": after_id,
+                    "scanned": progress["scanned"] + seen,
+                    "updated": progress["updated"] + changed}
+        await job.checkpoint(progress)
+    return {"scanned": progress["scanned"], "updated": progress["updated"]}
+
+
+@jobs.handler("requirements.bulk")
+async def _bulk_job(job):
+    """Ingest a saved NDJSON or CSV upload (payload: file, format).
+
+    The checkpoint commits with each chunk's rows, so a resumed job
+    skips exactly the records already stored.
+    """
+    job.progress = job.progress or {"records": 0, "inserted": 0,
+                                    "rejected": 0, "errors": []}
+
+    def checkpoint(conn, records, params, errors):
+        progress = job.progress
+        job.checkpoint_in(conn, {
+            "records": progress["records"] + records,
+            "inserted": progress["inserted"] + len(params),
+            "rejected": progress["rejected"] + len(errors),
+            "errors": (progress["errors"] + errors)[:100]
+        })
+
+    spool = open(job.payload["file"], "rb")
+    async with aclosing(ingest(spool, job.payload["format"],
+                               classify_pegs_batch,
+                               on_insert=_index_bulk_chunk,
+                               skip=job.progress["records"],
+                               checkpoint=checkpoint)) as reports:
+        async for line in reports:
+            report = json.loads(line)
+            if "error" in report:
+                raise JobError(report["error"])
+            if report.get("done"):
+                break
+            await job.check()
+    await _sign_new_rows()
+    return job.progress
+
+
+@jobs.handler("requirements.dedupe_report")
+async def _dedupe_report_job(job):
+    """Sign unsigned requirements, then group the near-duplicates"""
+    progress = job.progress or {"signed": 0}
+    while True:
+        signed = await db.write(index_missing)
+        if not signed:
+            break
+        progress = {"signed": progress["signed"] + signed}
+        await job.checkpoint(progress)
+    threshold = float(job.payload.get("threshold", DEDUP_THRESHOLD))
+    report = await db.run(duplicate_clusters, threshold)
+    return {**report, "signed": progress["signed"]}
+
+
+@jobs.handler("retrieval.build")
+async def _build_index_job(job):
+    """Embed every stored passage that is not in the index yet"""
+    started = time.perf_counter()
+    count = await db.run(retriever.build)
+    return {"passages": count,
+            "seconds": round(time.perf_counter() - started, 3)}
+
+
+@jobs.handler("documents.ingest")
+async def _document_job(job):
+    """Ingest a saved document upload (payload: file, filename, format,
+    project_id), checkpointing the IngestJob's progress every second.
+
+    A document left half-stored by an interrupted attempt is removed
+    before the upload is read again from the start.
+    """
+    payload = job.payload
+    if job.progress and job.progress.get("document_id"):
+        await discard_document(job.progress["document_id"],
+                               _unindex_document_chunks)
+    ingest_job = start_document_job(
+        open(payload["file"], "rb"), payload["filename"], payload["format"],
+        classify_pegs_batch, payload.get("project_id"),
+        on_insert=partial(_index_document_chunks, payload["filename"]),
+        on_delete=_unindex_document_chunks)
+    try:
+        while not ingest_job.task.done():
+            await asyncio.wait({ingest_job.task}, timeout=1.0)
+            status = ingest_job.status()
+            await job.checkpoint({key: status[key] for key in (
+                "job_id", "document_id", "pages", "location", "chunks")})
+        return await ingest_job.wait()
+    except JobCancelled:
+        # Stop the ingest and let it remove what it stored
+        ingest_job.cancel()
+        await asyncio.wait({ingest_job.task})
+        raise
+    except DocumentFormatError as e:
+        raise JobError(str(e))
+    except IngestCancelled as e:
+        raise JobCancelled(str(e))
+    finally:
+        if ingest_job.task.done() and ingest_job.state != "done":
+            # The ingest removed its document itself; a retry must not
+            # delete whatever later reuses the id
+            await db.write(save_progress, job.id,
+                           {**(job.progress or {}), "document_id": None})
+
+
+TEMPLATE_FIELDS = ("triggers", "title", "description", "pegs_category",
+                   "priority", "confidence", "position", "enabled")
+
+
+def add_template(conn, template):
+    """Insert a local-generator template and recompile the generator"""
+    fields = [f for f in TEMPLATE_FIELDS if template.get(f) is not None]
+    c = conn.execute(
+        f"INSERT INTO requirement_templates ({', '.join(fields)}) "
+        f"VALUES ({', '.join('?' * len(fields))})",
+        [template[f] for f in fields])
+    conn.commit()
+    reload_templates(conn)
+    return c.lastrowid
+
+
+def delete_template(conn, template_id):
+    deleted = conn.execute("DELETE FROM requirement_templates WHERE id = ?",
+                           (template_id,)).rowcount
+    conn.commit()
+    if deleted:
+        reload_templates(conn)
+    return deleted
+
+
+def triage(statements):
+    """Local-generator requirements for every statement, plus hit counts"""
+    results = get_generator().generate_batch(statements)
+    hits = {}
+    for result in results:
+        for req in result["requirements"]:
+            hits[req["title"]] = hits.get(req["title"], 0) + 1
+    return {"count": len(statements),
+            "results": [{"statement": statement,
+                         "requirements": result["requirements"]}
+                        for statement, result in zip(statements, results)],
+            "templates": hits}
+
+
+async def _sign_new_rows():
+    """MinHash every requirement stored without one (bulk, ORM inserts)"""
+    while await db.write(index_missing):
+        pass
+
+
+def _accepted(job: dict) -> JSONResponse:
+    """202 with the queued job; poll the Location for its state"""
+    return JSONResponse(status_code=202, content=job,
+                        headers={"Location": f"/api/jobs/{job['id']}"})
 
 
 # Main function to add endpoints
@@ -74,74 +381,400 @@ def add_enhanced_endpoints(app):
         return {"status": "Enhanced features active!", "version": "3.0"}
 
     @app.get("/api/db/status")
-    def db_status():
+    def db_status(conn: sqlite3.Connection = Depends(get_conn)):
         try:
-            conn = sqlite3.connect('sis_requirements.db')
-            c = conn.cursor()
-            c.execute("SELECT COUNT(*) FROM requirements")
-            count = c.fetchone()[0]
-            conn.close()
+            count = read_stats(conn)["total"]
             return {"status": "connected", "requirements": count}
         except:
             return {"status": "error"}
 
+    @app.get("/api/db/pool")
+    def db_pool_stats():
+        stats = pool.stats()
+        stats["write_batcher"] = store_batcher.stats()
+        return stats
+
+    @app.get("/api/llm/stats")
+    def llm_stats():
+        return {**llm.stats(), "cache": response_cache.stats()}
+
+    @app.delete("/api/llm/cache")
+    def llm_cache_clear():
+        response_cache.clear()
+        return response_cache.stats()
+
+    @app.get("/api/http/cache")
+    def http_cache_stats():
+        return rendered.stats()
+
     @app.post("/api/requirements/store")
     async def store_req(data: dict):
-        conn = sqlite3.connect('sis_requirements.db')
-        c = conn.cursor()
+        """Store one requirement.
 
+        "dedupe": true (default SIS_DEDUP_ON_WRITE) answers with the
+        stored near-duplicate instead of inserting another copy.
+        """
         category = classify_pegs(data.get("description", ""))
+        sig = signature(dedup_text(data.get("title"), data.get("description")))
+
+        req_id = await store_batcher.submit(
+            (data.get("title", ""), data.get("description", ""), category,
+             data.get("priority", "Medium"), sig,
+             bool(data.get("dedupe", DEDUP_ON_WRITE))))
+        if isinstance(req_id, dict):
+            return {"id": req_id["duplicate_of"], "category": category,
+                    "status": "duplicate",
+                    "similarity": req_id["similarity"]}
+        await run_in_threadpool(
+            retriever.add_requirements,
+            [(req_id, data.get("title", ""), data.get("description", ""))])
 
-        c.execute(
-            """INSERT INTO requirements (title, description, pegs_category, priority)
-                     VALUES (?, ?, ?, ?)""",
-            (data.get("title", ""), data.get(
-                "description", ""), category, data.get("priority", "Medium")))
+        return {"id": req_id, "category": category, "status": "stored"}
 
-        conn.commit()
-        req_id = c.lastrowid
-        conn.close()
+    @app.post("/api/requirements/bulk")
+    async def bulk_reqs(request: Request, format: Optional[str] = None,
+                        background: bool = False):
+        """Ingest a streamed NDJSON or CSV body, reporting progress per chunk.
 
-        return {"id": req_id, "category": category, "status": "stored"}
+        background=true saves the body and answers 202 with a job that
+        survives restarts; poll /api/jobs/{id} for its progress.
+        """
+        try:
+            fmt = detect_format(format, request.headers.get("content-type"))
+        except BulkFormatError as e:
+            raise HTTPException(status_code=415, detail=str(e))
+
+        if background:
+            path = upload_path(f".{fmt}")
+            with open(path, "w+b") as saved:
+                await spool_upload(request, saved)
+            return _accepted(await jobs.enqueue(
+                "requirements.bulk", {"file": path, "format": fmt},
+                idempotency_key=request.headers.get("Idempotency-Key")))
+
+        spool = await spool_upload(request)
+        # The new rows are signed for duplicate detection once all are in
+        return StreamingResponse(ingest(spool, fmt, classify_pegs_batch,
+                                        on_insert=_index_bulk_chunk),
+                                 media_type="application/x-ndjson",
+                                 background=BackgroundTask(_sign_new_rows))
+
+    @app.post("/api/documents")
+    async def upload_document(request: Request,
+                              filename: str,
+                              project_id: Optional[int] = None,
+                              background: bool = False):
+        """Chunk, classify and index a PDF, DOCX or text file sent as the body.
+
+        background=true saves the body and answers 202 with a job that
+        survives restarts; poll /api/jobs/{id} for its progress.
+        """
+        try:
+            fmt = detect_document_format(filename,
+                                         request.headers.get("content-type"))
+        except DocumentFormatError as e:
+            raise HTTPException(status_code=415, detail=str(e))
+
+        if background:
+            path = upload_path(f".{fmt}")
+            with open(path, "w+b") as saved:
+                await spool_upload(request, saved)
+            return _accepted(await jobs.enqueue(
+                "documents.ingest",
+                {"file": path, "filename": filename, "format": fmt,
+                 "project_id": project_id},
+                idempotency_key=request.headers.get("Idempotency-Key")))
+
+        # A named file, so the PDF worker processes can open it
+        spool = await spool_upload(
+            request, tempfile.NamedTemporaryFile(suffix=f".{fmt}"))
+        job = start_document_job(
+            spool, filename, fmt, classify_pegs_batch, project_id,
+            on_insert=partial(_index_document_chunks, filename),
+            on_delete=_unindex_document_chunks)
+        try:
+            return {"job_id": job.id, **await job.wait()}
+        except DocumentFormatError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except IngestCancelled as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+    # Registered before /api/documents/{document_id}, which would match
+    # "jobs" as an id
+    @app.get("/api/documents/jobs")
+    def list_document_jobs():
+        return {"jobs": [job.status() for job in ingest_jobs.active()]}
+
+    @app.get("/api/documents/jobs/{job_id}")
+    def document_job_status(job_id: str):
+        job = ingest_jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="job not found")
+        return job.status()
+
+    @app.delete("/api/documents/jobs/{job_id}")
+    def cancel_document_job(job_id: str):
+        """Stop a running upload and remove what it stored so far"""
+        job = ingest_jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="job not found")
+        if not job.cancel():
+            raise HTTPException(status_code=409,
+                                detail=f"job already {job.state}")
+        return job.status()
+
+    @app.get("/api/documents/{document_id}")
+    def get_document(document_id: int,
+                     conn: sqlite3.Connection = Depends(get_conn)):
+        row = conn.execute(
+            "SELECT d.id, d.filename, d.pegs_analysis, d.uploaded_at, "
+            "COUNT(c.id), MAX(c.location_end) FROM documents d "
+            "LEFT JOIN document_chunks c ON c.document_id = d.id "
+            "WHERE d.id = ? GROUP BY d.id", (document_id,)).fetchone()
+        if row is None:
+            raise HTTPException(status_code=404, detail="document not found")
+        return {
+            "id": row[0],
+            "filename": row[1],
+            "by_category": json.loads(row[2]) if row[2] else {},
+            "uploaded_at": row[3],
+            "chunks": row[4],
+            "last_location": row[5]
+        }
 
     @app.get("/api/requirements/list")
-    def list_reqs():
-        conn = sqlite3.connect('sis_requirements.db')
-        c = conn.cursor()
-        c.execute("SELECT * FROM requirements")
-
-        reqs = []
-        for row in c.fetchall():
-            reqs.append({
-                "id": row[0],
-                "title": row[1],
-                "description": row[2],
-                "pegs_category": row[3],
-                "priority": row[4],
-                "status": row[5]
-            })
-
-        conn.close()
-        return {"count": len(reqs), "requirements": reqs}
+    def list_reqs(request: Request,
+                  cursor: Optional[str] = None,
+                  limit: Optional[int] = None,
+                  order_by: str = "id",
+                  order: str = "asc",
+                  pegs_category: Optional[str] = None,
+                  priority: Optional[str] = None,
+                  status: Optional[str] = None,
+                  stream: Optional[str] = None):
+        """Keyset-paginated list; ?stream=ndjson|json streams rows instead"""
+        filters = {
+            "pegs_category": pegs_category,
+            "priority": priority,
+            "status": status
+        }
+        descending = order.lower() == "desc"
+        try:
+            if stream in ("ndjson", "json"):
+                if limit is not None and limit < 1:
+                    raise ListQueryError("limit must be positive")
+                # Validate up front so bad input is a 400, not a broken
+                # stream
+                build_query(order_by, descending, cursor, filters, limit)
+                media = ("application/x-ndjson"
+                         if stream == "ndjson" else "application/json")
+                return StreamingResponse(
+                    stream_rows(stream, order_by, descending, cursor,
+                                filters, limit),
+                    media_type=media)
+            limit = clamp_limit(limit)
+            # A bad cursor is a 400 even for a client holding an ETag
+            build_query(order_by, descending, cursor, filters, limit)
+            with pool.connection() as conn:
+                return cached_json(request, conn, partial(
+                    fetch_page_json, conn, order_by, descending, cursor,
+                    filters, limit))
+        except ListQueryError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    @app.get("/api/requirements/similar")
+    async def similar_reqs(text: str, threshold: float = DEDUP_THRESHOLD,
+                           limit: int = 5):
+        """Stored requirements whose text is a near-duplicate of ``text``"""
+        matches = await db.run(find_similar, signature(text),
+                               threshold, max(1, min(limit, 100)))
+        return {"matches": [{"id": rid, "similarity": score}
+                            for rid, score in matches]}
+
+    @app.post("/api/requirements/duplicates/report")
+    async def duplicate_report(request: Request,
+                               threshold: float = DEDUP_THRESHOLD):
+        """Queue a near-duplicate report over every requirement (202 + job)"""
+        return _accepted(await jobs.enqueue(
+            "requirements.dedupe_report", {"threshold": threshold},
+            idempotency_key=request.headers.get("Idempotency-Key")))
+
+    @app.get("/api/requirements/search")
+    def search_reqs(q: str,
+                    limit: int = 20,
+                    offset: int = 0,
+                    match: str = "all",
+                    pegs_category: Optional[str] = None,
+                    conn: sqlite3.Connection = Depends(get_conn)):
+        """BM25-ranked full-text search over title and description.
+
+        title_highlight and snippet are HTML-escaped with <mark> tags
+        around the matches.
+        """
+        try:
+            return FastJSONResponse(
+                search(conn, q, limit, offset, match, pegs_category))
+        except SearchQueryError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except SearchUnavailable as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+    @app.get("/api/retrieve")
+    async def retrieve_context(q: str,
+                               k: int = 5,
+                               mode: str = "hybrid",
+                               pegs_category: Optional[str] = None,
+                               budget_ms: int = RETRIEVAL_BUDGET_MS):
+        """Top-k stored passages for the query.
+
+        mode=hybrid fuses FTS and vector results (pegs_category=auto
+        boosts the query's own category); mode=vector is similarity only.
+        """
+        k = max(1, min(k, 50))
+        if mode == "vector":
+            passages = await db.run(retriever.retrieve, q, k)
+            return {"query": q, "count": len(passages), "passages": passages}
+        if mode != "hybrid":
+            raise HTTPException(status_code=400,
+                                detail="mode must be hybrid or vector")
+
+        if pegs_category == "auto":
+            pegs_category = classify_pegs(q)
+        result = await retriever.hybrid(q, k, pegs_category,
+                                        max(1, min(budget_ms, 10000)))
+        return {"query": q, "count": len(result["passages"]),
+                "pegs_category": pegs_category, **result}
+
+    @app.get("/api/retrieve/index")
+    def retrieval_index_stats():
+        return retriever.index.stats()
+
+    @app.post("/api/retrieve/index/build")
+    async def retrieval_index_build(request: Request):
+        """Queue embedding of passages missing from the index (202 + job)"""
+        return _accepted(await jobs.enqueue(
+            "retrieval.build", priority=-1,
+            idempotency_key=request.headers.get("Idempotency-Key")))
+
+    @app.get("/api/jobs")
+    async def list_jobs(state: Optional[str] = None,
+                        kind: Optional[str] = None,
+                        limit: int = 50):
+        return {"jobs": await jobs.recent(state, kind,
+                                          max(1, min(limit, 500)))}
+
+    @app.get("/api/jobs/{job_id}")
+    async def job_status(job_id: int):
+        job = await jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="job not found")
+        return job
+
+    @app.delete("/api/jobs/{job_id}")
+    async def cancel_job(job_id: int):
+        """Cancel a queued job, or stop a running one at its next checkpoint"""
+        job = await jobs.cancel(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="job not found")
+        if job["state"] not in ("cancelled", "cancelling"):
+            raise HTTPException(status_code=409,
+                                detail=f"job already {job['state']}")
+        return job
+
+    @app.get("/api/templates")
+    def list_templates(all: bool = False,
+                       conn: sqlite3.Connection = Depends(get_conn)):
+        """Local-generator templates; all=true includes disabled ones"""
+        return {"templates": load_templates(conn, enabled_only=not all)}
+
+    @app.post("/api/templates")
+    async def create_template(template: dict):
+        missing = [f for f in ("triggers", "title", "description")
+                   if not str(template.get(f) or "").strip()]
+        if missing:
+            raise HTTPException(status_code=422,
+                                detail=f"missing {', '.join(missing)}")
+        template_id = await db.write(add_template, template)
+        return {"id": template_id, "status": "created"}
+
+    @app.delete("/api/templates/{template_id}")
+    async def remove_template(template_id: int):
+        if not await db.write(delete_template, template_id):
+            raise HTTPException(status_code=404, detail="template not found")
+        return {"id": template_id, "status": "deleted"}
+
+    @app.post("/api/requirements/triage")
+    async def triage_statements(data: dict, request: Request):
+        """Run many stakeholder statements through the local generator.
+
+        Nothing is stored; the answer pairs each statement with its
+        requirements and counts how often each one was produced.
+        """
+        statements = data.get("statements")
+        if not isinstance(statements, list):
+            raise HTTPException(status_code=422,
+                                detail="statements must be a list")
+        started = time.perf_counter()
+        result = await run_in_threadpool(
+            triage, [str(s) if s is not None else "" for s in statements])
+        result["elapsed_ms"] = round(
+            (time.perf_counter() - started) * 1000, 1)
+        return json_response(dumps(result), request)
 
     @app.get("/api/pegs/stats")
-    def pegs_stats():
-        conn = sqlite3.connect('sis_requirements.db')
-        c = conn.cursor()
-
-        c.execute("SELECT COUNT(*) FROM requirements")
-        total = c.fetchone()[0]
-
-        c.execute(
-            "SELECT pegs_category, COUNT(*) FROM requirements GROUP BY pegs_category"
-        )
-        by_category = {}
-        for row in c.fetchall():
-            if row[0]:
-                by_category[row[0]] = row[1]
-
-        conn.close()
-        return {"total": total, "by_category": by_category}
+    def pegs_stats(request: Request,
+                   conn: sqlite3.Connection = Depends(get_conn)):
+        return cached_json(request, conn, lambda: dumps(read_stats(conn)))
+
+    @app.post("/api/pegs/reclassify")
+    async def pegs_reclassify(request: Request):
+        """Queue a re-score of every stored requirement (202 + job)"""
+        return _accepted(await jobs.enqueue(
+            "pegs.reclassify",
+            idempotency_key=request.headers.get("Idempotency-Key")))
+
+    @app.get("/api/pegs/stats/check")
+    def pegs_stats_check(conn: sqlite3.Connection = Depends(get_conn)):
+        return check_counters(conn)
+
+    @app.post("/api/pegs/stats/rebuild")
+    async def pegs_stats_rebuild():
+        return await db.write(rebuild_counters)
+
+    @app.get("/api/pegs/analysis")
+    def pegs_analysis(project_id: int = DEFAULT_PROJECT,
+                      conn: sqlite3.Connection = Depends(get_conn)):
+        """Current completeness scores, from the running counters"""
+        return read_scores(conn, project_id)
+
+    @app.get("/api/pegs/analysis/history")
+    def pegs_analysis_history(project_id: int = DEFAULT_PROJECT,
+                              limit: int = 50,
+                              conn: sqlite3.Connection = Depends(get_conn)):
+        return {"project_id": project_id,
+                "snapshots": analysis_history(conn, project_id,
+                                              max(1, min(limit, 1000)))}
+
+    @app.post("/api/pegs/analysis/snapshot")
+    async def pegs_analysis_snapshot():
+        """Write a snapshot now instead of waiting for the schedule"""
+        return {"written": await db.write(analysis_snapshot, True)}
+
+    @app.on_event("startup")
+    async def build_retrieval_index():
+        started = time.perf_counter()
+        count = await db.run(retriever.build)
+        print(f"✅ Retrieval index ready ({count} passages, "
+              f"{time.perf_counter() - started:.2f}s)")
+
+    app.on_event("startup")(jobs.start)
+    app.on_event("startup")(snapshots.start)
+    app.on_event("shutdown")(snapshots.stop)
+    app.on_event("shutdown")(jobs.stop)
+    app.on_event("shutdown")(stop_ingest_workers)
+    app.on_event("shutdown")(llm.aclose)
+    app.on_event("shutdown")(pool.close)
+    app.on_event("shutdown")(db.close)
 
     print("✅ Enhanced endpoints added!")
     return app
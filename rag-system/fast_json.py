@@ -0,0 +1,109 @@
+# fast_json.py
+"""
+Fast JSON responses for the large read endpoints.
+
+A dict returned from an endpoint goes through FastAPI's
+``jsonable_encoder`` and then ``json.dumps``; for a page of
+requirements that walk costs far more than the query. Endpoints here
+return a Response themselves instead, which skips the encoder:
+
+  FastJSONResponse  renders plain dicts and lists with orjson (stdlib
+                    json when orjson is not installed)
+  json_response     sends bytes that are already JSON, e.g. rows that
+                    SQLite encoded with json_object() (see
+                    ``json_object_sql``), so no per-row Python objects
+                    are built at all
+
+``json_response`` also compresses bodies of SIS_COMPRESS_MIN_BYTES or
+more, with brotli when the client accepts it and the ``brotli`` package
+is installed, gzip otherwise. See benchmarks/bench_serialization.py.
+"""
+
+import gzip
+import json
+import os
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used instead
+    orjson = None
+
+# Compression settings (override through environment variables)
+COMPRESS_MIN_BYTES = int(os.getenv("SIS_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("SIS_GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("SIS_BROTLI_QUALITY", "4"))
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(content) -> bytes:
+        return orjson.dumps(content, option=_OPTIONS)
+else:
+    def dumps(content) -> bytes:
+        return json.dumps(content, ensure_ascii=False, default=str,
+                          separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson; return it from the endpoint"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def json_object_sql(columns) -> str:
+    """SQL expression encoding a row's ``columns`` as a JSON object"""
+    return "json_object(" + ", ".join(
+        f"'{column}', {column}" for column in columns) + ")"
+
+
+def join_objects(encoded) -> bytes:
+    """A JSON array of already-encoded objects (str), as bytes"""
+    return ("[" + ",".join(encoded) + "]").encode()
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() != coding:
+            continue
+        params = params.replace(" ", "")
+        if not params.startswith("q="):
+            return True
+        try:
+            return float(params[2:]) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def compress(body: bytes, accept_encoding: str):
+    """(body, Content-Encoding or None) for a client's Accept-Encoding"""
+    if len(body) < COMPRESS_MIN_BYTES or not accept_encoding:
+        return body, None
+    if _accepts(accept_encoding, "br"):
+        try:
+            import brotli
+        except ImportError:
+            pass
+        else:
+            return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if _accepts(accept_encoding, "gzip"):
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), "gzip"
+    return body, None
+
+
+def json_response(body: bytes, request=None, status_code: int = 200,
+                  headers: dict = None) -> Response:
+    """Response for an encoded JSON body, compressed when worthwhile"""
+    headers = dict(headers or {})
+    if request is not None:
+        body, encoding = compress(
+            body, request.headers.get("accept-encoding", ""))
+        headers["Vary"] = "Accept-Encoding"
+        if encoding:
+            headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, headers=headers,
+                    media_type="application/json")
@@ -0,0 +1,183 @@
+# http_cache.py
+"""
+Conditional GETs and rendered-response caching for read endpoints.
+
+Triggers on ``requirements`` bump a version counter (and its time) in
+``table_versions`` on every insert, update and delete, including writes
+that bypass the API such as the ORM or the sqlite3 shell. Writes to
+tables derived from it (pegs_stats.rebuild) call ``bump_version``. A
+cached endpoint reads that one row and answers:
+
+  304            when If-None-Match has the current ETag (W/"<version>"),
+                 or If-Modified-Since is not older than the last write
+  cached body    when the same URL was rendered at the current version
+                 (kept already compressed, per Accept-Encoding)
+  fresh body     otherwise, rendered and stored for the next poll
+
+Responses say ``Cache-Control: no-cache``, so clients keep the body but
+revalidate on every poll. Last-Modified has one-second resolution;
+clients that send the ETag as well are exact.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi.responses import Response
+
+from fast_json import compress
+
+# Cache settings (override through environment variables)
+CACHE_ENTRIES = int(os.getenv("SIS_HTTP_CACHE_ENTRIES", "256"))
+CACHE_BYTES = int(os.getenv("SIS_HTTP_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+TABLE = "requirements"
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS table_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 1,
+        modified_at INTEGER NOT NULL
+    ) WITHOUT ROWID""",
+    f"""INSERT OR IGNORE INTO table_versions (name, version, modified_at)
+    VALUES ('{TABLE}', 1, CAST(strftime('%s', 'now') AS INTEGER))""",
+)
+
+_BUMP = (f"    UPDATE table_versions SET version = version + 1, "
+         f"modified_at = CAST(strftime('%s', 'now') AS INTEGER) "
+         f"WHERE name = '{TABLE}';")
+
+TRIGGERS = tuple(
+    f"""CREATE TRIGGER IF NOT EXISTS trg_{TABLE}_version_{event.lower()}
+AFTER {event} ON {TABLE}
+BEGIN
+{_BUMP}
+END""" for event in ("INSERT", "UPDATE", "DELETE"))
+
+
+def ensure_version_table(conn):
+    for ddl in SCHEMA + TRIGGERS:
+        conn.execute(ddl)
+    conn.commit()
+
+
+def bump_version(conn, table: str = TABLE):
+    """Mark responses cached on ``table`` stale after a write its
+    triggers do not see, such as rebuilding derived counters. Runs in
+    the caller's transaction; a no-op before ensure_version_table."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                    "AND name = 'table_versions'").fetchone():
+        conn.execute(
+            "UPDATE table_versions SET version = version + 1, "
+            "modified_at = CAST(strftime('%s', 'now') AS INTEGER) "
+            "WHERE name = ?", (table,))
+
+
+def read_version(conn, table: str = TABLE):
+    """(version, modified_at epoch seconds) of ``table``"""
+    row = conn.execute(
+        "SELECT version, modified_at FROM table_versions WHERE name = ?",
+        (table,)).fetchone()
+    return row if row is not None else (0, 0)
+
+
+def not_modified(request, etag: str, modified: int) -> bool:
+    """Whether the client's copy is current (If-None-Match wins)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison: W/"7" matches "7"
+        tags = {tag.strip().removeprefix("W/")
+                for tag in if_none_match.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return modified <= since
+    return False
+
+
+class RenderedCache:
+    """LRU of rendered bodies, each valid for one table version"""
+
+    def __init__(self, entries: int = CACHE_ENTRIES,
+                 max_bytes: int = CACHE_BYTES):
+        self.entries = entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._items = OrderedDict()  # key -> (version, body, encoding)
+        self._bytes = 0
+        self._metrics = {"hits": 0, "misses": 0, "not_modified": 0,
+                         "stores": 0, "evictions": 0}
+
+    def get(self, key, version: int):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and entry[0] == version:
+                self._items.move_to_end(key)
+                self._metrics["hits"] += 1
+                return entry[1], entry[2]
+            self._metrics["misses"] += 1
+            return None
+
+    def put(self, key, version: int, body: bytes, encoding):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._items[key] = (version, body, encoding)
+            self._bytes += len(body)
+            self._metrics["stores"] += 1
+            while len(self._items) > self.entries or \
+                    self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted[1])
+                self._metrics["evictions"] += 1
+
+    def count_not_modified(self):
+        with self._lock:
+            self._metrics["not_modified"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._metrics, "entries": len(self._items),
+                    "bytes": self._bytes}
+
+
+rendered = RenderedCache()
+
+
+def cached_json(request, conn, render, cache: RenderedCache = rendered):
+    """Conditional, cached response for a JSON body that only depends on
+    the URL and the requirements table; ``render()`` returns the bytes"""
+    version, modified = read_version(conn)
+    etag = f'W/"{version}"'
+    headers = {"ETag": etag,
+               "Last-Modified": formatdate(modified, usegmt=True),
+               "Cache-Control": "no-cache",
+               "Vary": "Accept-Encoding"}
+    if not_modified(request, etag, modified):
+        cache.count_not_modified()
+        return Response(status_code=304, headers=headers)
+
+    accept_encoding = request.headers.get("accept-encoding", "")
+    key = (request.url.path, request.url.query, accept_encoding)
+    entry = cache.get(key, version)
+    if entry is None:
+        entry = compress(render(), accept_encoding)
+        cache.put(key, version, *entry)
+    body, encoding = entry
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, headers=headers,
+                    media_type="application/json")
@@ -0,0 +1,241 @@
+# ingest_workers.py
+"""
+Document ingest jobs and the process pool that extracts PDF text.
+
+PDF text extraction is pure Python and holds the GIL for the whole page,
+so on the request's own process one large upload stalls every other
+request. PDFs are split into page ranges of SIS_INGEST_PAGES_PER_TASK
+that SIS_INGEST_WORKERS worker processes extract in parallel; the
+ranges are merged back in page order, so chunks, ordinals and locations
+come out exactly as a sequential read would produce them. Only a few
+ranges per worker are queued ahead of the merge point, which keeps the
+memory bound of the streaming path. SIS_INGEST_WORKERS=0 extracts in a
+thread of the server process as before.
+
+Every upload runs as an IngestJob: it can be polled through
+``/api/documents/jobs/{id}`` and cancelled, which drops its queued page
+ranges and removes the partly stored document.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import aclosing
+
+from document_ingest import (DocumentFormatError, IngestCancelled,
+                             ingest_document, open_pdf, pdf_page_text)
+
+# Worker settings (override through environment variables)
+INGEST_WORKERS = int(os.getenv("SIS_INGEST_WORKERS",
+                               str(os.cpu_count() or 1)))
+PAGES_PER_TASK = int(os.getenv("SIS_INGEST_PAGES_PER_TASK", "8"))
+# Page ranges in flight per worker ahead of the in-order merge
+PREFETCH = 2
+# Finished jobs kept for status polling
+JOB_HISTORY = 256
+
+_executor = None
+# Per worker process: (path, stat key, open file, PdfReader) of the last PDF
+_reader = None
+
+
+def _open_reader(path: str):
+    """The worker's PdfReader for ``path``, reused across its page ranges"""
+    global _reader
+    stat = os.stat(path)
+    key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    if _reader is None or _reader[:2] != (path, key):
+        if _reader is not None:
+            _reader[2].close()
+            _reader = None
+        handle = open(path, "rb")
+        try:
+            _reader = (path, key, handle, open_pdf(handle))
+        except Exception:
+            handle.close()
+            raise
+    return _reader[3]
+
+
+def pdf_page_count(path: str) -> int:
+    return len(_open_reader(path).pages)
+
+
+def extract_pdf_range(path: str, start: int, stop: int) -> list:
+    """(page number, text) for pages ``start`` to ``stop`` (0-based,
+    exclusive); runs in a worker process"""
+    reader = _open_reader(path)
+    return [(index + 1, pdf_page_text(reader, index))
+            for index in range(start, stop)]
+
+
+def get_executor():
+    """The shared process pool, started on first use (None if disabled)"""
+    global _executor
+    if _executor is None and INGEST_WORKERS > 0:
+        _executor = ProcessPoolExecutor(max_workers=INGEST_WORKERS)
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def pdf_segments(path: str, job, executor):
+    """Page-range lists of (page, text) extracted in the pool, in order"""
+    loop = asyncio.get_running_loop()
+    job.pages = await loop.run_in_executor(executor, pdf_page_count, path)
+    starts = iter(range(0, job.pages, PAGES_PER_TASK))
+    pending = deque()
+
+    def submit(count):
+        for start in itertools.islice(starts, count):
+            pending.append(loop.run_in_executor(
+                executor, extract_pdf_range, path, start,
+                min(start + PAGES_PER_TASK, job.pages)))
+
+    submit(max(1, INGEST_WORKERS) * PREFETCH)
+    try:
+        while pending:
+            job.check()
+            block = await pending.popleft()
+            submit(1)
+            yield block
+    finally:
+        # Ranges not yet started are dropped; running ones are discarded
+        for future in pending:
+            future.cancel()
+
+
+class IngestJob:
+    """State of one document upload, readable while it runs"""
+
+    def __init__(self, filename: str, fmt: str):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.format = fmt
+        self.state = "queued"
+        self.created = time.time()
+        self.finished = None
+        self.document_id = None
+        self.pages = None  # PDFs only, once counted
+        self.location = None  # last page / paragraph / line read
+        self.chunks = 0
+        self.result = None
+        self.error = None
+        self.task = None
+        self._cancelled = False
+
+    def check(self):
+        """Called between steps of the ingest; raises once cancelled"""
+        if self._cancelled:
+            raise IngestCancelled(f"job {self.id} was cancelled")
+
+    def cancel(self) -> bool:
+        if self.state not in ("queued", "running"):
+            return False
+        self._cancelled = True
+        return True
+
+    async def wait(self) -> dict:
+        """The job's result; raises what the ingest raised.
+
+        Shielded, so a client that disconnects does not stop the job.
+        """
+        await asyncio.shield(self.task)
+        if self.state == "done":
+            return self.result
+        raise self.error
+
+    def status(self) -> dict:
+        finished = self.finished or time.time()
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "format": self.format,
+            "state": "cancelling" if self._cancelled and not self.finished
+                     else self.state,
+            "document_id": self.document_id,
+            "pages": self.pages,
+            "location": self.location,
+            "chunks": self.chunks,
+            "seconds": round(finished - self.created, 3),
+            "result": self.result,
+            "error": None if self.error is None else str(self.error)
+        }
+
+
+class JobRegistry:
+    """Running jobs plus the most recent ``history`` finished ones"""
+
+    def __init__(self, history: int = JOB_HISTORY):
+        self.history = history
+        self._jobs = OrderedDict()
+
+    def add(self, job: IngestJob):
+        self._jobs[job.id] = job
+        finished = [job_id for job_id, j in self._jobs.items()
+                    if j.finished is not None]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def active(self) -> list:
+        return [job for job in self._jobs.values() if job.finished is None]
+
+
+jobs = JobRegistry()
+
+
+async def _run(job: IngestJob, spool, classify, project_id, hooks):
+    job.state = "running"
+    executor = get_executor() if job.format == "pdf" else None
+    segments = pdf_segments(spool.name, job, executor) if executor else None
+    try:
+        if segments is None:
+            job.result = await ingest_document(
+                spool, job.filename, job.format, classify, project_id,
+                job=job, **hooks)
+        else:
+            async with aclosing(segments):
+                job.result = await ingest_document(
+                    spool, job.filename, job.format, classify, project_id,
+                    segments=segments, job=job, **hooks)
+        job.state = "done"
+    except IngestCancelled as e:
+        job.state, job.error = "cancelled", e
+    except BrokenProcessPool as e:
+        # A worker died (e.g. killed for memory); start a fresh pool next time
+        shutdown()
+        job.state, job.error = "failed", e
+    except Exception as e:
+        job.state, job.error = "failed", e
+        if not isinstance(e, DocumentFormatError):
+            print(f"❌ Document job {job.id} ({job.filename}) failed: {e!r}")
+    finally:
+        job.finished = time.time()
+
+
+def start_document_job(spool, filename: str, fmt: str, classify,
+                       project_id=None, **hooks) -> IngestJob:
+    """Start ingesting a spooled upload in the background.
+
+    PDFs are extracted in the process pool, which needs the spool to be
+    a named file (``spool.name``); other formats are read in a thread.
+    ``hooks`` are passed on to ingest_document (on_insert, on_delete).
+    """
+    job = IngestJob(filename, fmt)
+    jobs.add(job)
+    job.task = asyncio.get_running_loop().create_task(
+        _run(job, spool, classify, project_id, hooks))
+    return job
@@ -0,0 +1,453 @@
+# job_queue.py
+"""
+Persistent background jobs for work too slow to finish inside a request.
+
+Jobs are rows of the ``jobs`` table, so queued and interrupted work
+survives a restart. SIS_JOB_WORKERS asyncio tasks in the app process
+claim the highest-priority due job, run the handler registered for its
+kind and store the result or the error. A failed attempt is retried
+after an exponential backoff (SIS_JOB_BACKOFF seconds, doubling each
+attempt, with jitter) until max_attempts; handlers raise JobError for
+failures a retry cannot fix.
+
+A claimed job is leased to the claiming process for SIS_JOB_LEASE
+seconds and the lease is renewed while it runs. Any process requeues
+running jobs whose lease has lapsed, so several app processes can share
+the table and a crashed one's jobs are picked up again, while jobs a
+live process is still running are left alone.
+
+Enqueueing with an idempotency key is safe to repeat: the same key and
+kind return the job created first. Long handlers call
+``job.checkpoint(progress)``; a retried or restarted job resumes from the
+last checkpoint, and a cancel request takes effect there.
+"""
+
+import asyncio
+import json
+import os
+import random
+import socket
+import time
+import uuid
+
+from db_pool import db
+
+# Queue settings (override through environment variables)
+JOB_WORKERS = int(os.getenv("SIS_JOB_WORKERS", "2"))
+MAX_ATTEMPTS = int(os.getenv("SIS_JOB_MAX_ATTEMPTS", "3"))
+BACKOFF = float(os.getenv("SIS_JOB_BACKOFF", "2.0"))
+JOB_DIR = os.getenv("SIS_JOB_DIR", "job_files")
+KEEP_DAYS = int(os.getenv("SIS_JOB_KEEP_DAYS", "7"))
+LEASE_SECONDS = float(os.getenv("SIS_JOB_LEASE", "60"))
+MAX_BACKOFF = 300.0
+# Idle workers look for due retries at least this often
+POLL_SECONDS = 5.0
+
+SCHEMA = (
+    # run_after is epoch seconds; the other times are SQLite timestamps
+    """CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        payload JSON,
+        state TEXT NOT NULL DEFAULT 'queued',
+        priority INTEGER NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 3,
+        run_after REAL NOT NULL DEFAULT 0,
+        idempotency_key TEXT,
+        progress JSON,
+        result JSON,
+        error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP,
+        owner TEXT,
+        lease_until REAL
+    )""",
+    """CREATE INDEX IF NOT EXISTS idx_jobs_due
+        ON jobs (state, priority DESC, run_after, id)""",
+    """CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_idempotency
+        ON jobs (kind, idempotency_key)""",
+)
+
+COLUMNS = ("id", "kind", "payload", "state", "priority", "attempts",
+           "max_attempts", "run_after", "idempotency_key", "progress",
+           "result", "error", "created_at", "started_at", "finished_at")
+SELECT_JOB = f"SELECT {', '.join(COLUMNS)} FROM jobs"
+JSON_COLUMNS = ("payload", "progress", "result")
+FINAL_STATES = ("done", "failed", "cancelled")
+
+
+class JobError(Exception):
+    """Raised by a handler for a failure that retrying will not fix"""
+
+
+class JobCancelled(Exception):
+    """Raised from checkpoint() once the job has been cancelled"""
+
+
+def ensure_jobs_table(conn):
+    conn.execute(SCHEMA[0])
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+    # Tables created before leases
+    for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+    for ddl in SCHEMA[1:]:
+        conn.execute(ddl)
+    conn.commit()
+
+
+def _job(row) -> dict:
+    job = dict(zip(COLUMNS, row))
+    for column in JSON_COLUMNS:
+        if job[column] is not None:
+            job[column] = json.loads(job[column])
+    return job
+
+
+def fetch_job(conn, job_id: int):
+    row = conn.execute(SELECT_JOB + " WHERE id = ?", (job_id,)).fetchone()
+    return None if row is None else _job(row)
+
+
+def list_jobs(conn, state: str = None, kind: str = None,
+              limit: int = 50) -> list:
+    where, params = [], []
+    if state:
+        where.append("state = ?")
+        params.append(state)
+    if kind:
+        where.append("kind = ?")
+        params.append(kind)
+    sql = SELECT_JOB + (" WHERE " + " AND ".join(where) if where else "")
+    rows = conn.execute(sql + " ORDER BY id DESC LIMIT ?", (*params, limit))
+    return [_job(row) for row in rows]
+
+
+def insert_job(conn, kind: str, payload, priority: int, key, max_attempts):
+    """Add a job, or return the existing one with the same key and kind"""
+    if key is not None:
+        row = conn.execute(
+            SELECT_JOB + " WHERE kind = ? AND idempotency_key = ?",
+            (kind, key)).fetchone()
+        if row is not None:
+            return _job(row), False
+    c = conn.cursor()
+    c.execute("""INSERT INTO jobs (kind, payload, priority, max_attempts,
+                                   idempotency_key)
+                 VALUES (?, ?, ?, ?, ?)""",
+              (kind, json.dumps(payload), priority, max_attempts, key))
+    conn.commit()
+    return fetch_job(conn, c.lastrowid), True
+
+
+def claim_job(conn, now: float, owner: str = None,
+              lease: float = LEASE_SECONDS):
+    """Mark the next due job running, leased to ``owner``; returns
+    (job, None) or (None, when the next queued job is due).
+
+    Selecting and claiming is one statement, so workers in other
+    processes cannot claim the same job.
+    """
+    row = conn.execute(
+        """UPDATE jobs SET state = 'running',
+               attempts = attempts + 1,
+               started_at = CURRENT_TIMESTAMP,
+               owner = ?, lease_until = ?
+           WHERE id = (SELECT id FROM jobs
+                       WHERE state = 'queued' AND run_after <= ?
+                       ORDER BY priority DESC, run_after, id LIMIT 1)
+             AND state = 'queued'
+           RETURNING id""", (owner, now + lease, now)).fetchone()
+    conn.commit()
+    if row is None:
+        due = conn.execute("SELECT MIN(run_after) FROM jobs "
+                           "WHERE state = 'queued'").fetchone()[0]
+        return None, due
+    return fetch_job(conn, row[0]), None
+
+
+def write_progress(conn, job_id: int, progress):
+    """Store a checkpoint in the caller's transaction (not committed)"""
+    conn.execute("UPDATE jobs SET progress = ? WHERE id = ?",
+                 (json.dumps(progress), job_id))
+
+
+def job_state(conn, job_id: int) -> str:
+    return conn.execute("SELECT state FROM jobs WHERE id = ?",
+                        (job_id,)).fetchone()[0]
+
+
+def save_progress(conn, job_id: int, progress) -> str:
+    """Store a checkpoint and return the job's state"""
+    write_progress(conn, job_id, progress)
+    conn.commit()
+    return job_state(conn, job_id)
+
+
+def finish_job(conn, job_id: int, state: str, result=None, error=None):
+    conn.execute("""UPDATE jobs SET state = ?, result = ?, error = ?,
+                        finished_at = CURRENT_TIMESTAMP
+                    WHERE id = ?""",
+                 (state, None if result is None else json.dumps(result),
+                  error, job_id))
+    conn.commit()
+
+
+def retry_job(conn, job_id: int, error: str, run_after: float) -> str:
+    """Queue the job again after a failed attempt; returns its state.
+
+    A cancel that arrived during the attempt wins over the retry.
+    """
+    conn.execute("""UPDATE jobs SET error = ?, run_after = ?,
+                        state = CASE state WHEN 'cancelling' THEN 'cancelled'
+                                           ELSE 'queued' END,
+                        finished_at = CASE state WHEN 'cancelling'
+                                           THEN CURRENT_TIMESTAMP END
+                    WHERE id = ?""", (error, run_after, job_id))
+    conn.commit()
+    return conn.execute("SELECT state FROM jobs WHERE id = ?",
+                        (job_id,)).fetchone()[0]
+
+
+def cancel_job(conn, job_id: int):
+    """Cancel a queued job now, or ask a running one to stop at its next
+    checkpoint; returns the job (None if unknown)"""
+    conn.execute("""UPDATE jobs SET state = 'cancelled',
+                        finished_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND state = 'queued'""", (job_id,))
+    conn.execute("""UPDATE jobs SET state = 'cancelling'
+                    WHERE id = ? AND state = 'running'""", (job_id,))
+    conn.commit()
+    return fetch_job(conn, job_id)
+
+
+def renew_leases(conn, owner: str, now: float,
+                 lease: float = LEASE_SECONDS):
+    """Extend the leases of the jobs ``owner`` is running"""
+    conn.execute("""UPDATE jobs SET lease_until = ?
+                    WHERE owner = ? AND state IN ('running', 'cancelling')""",
+                 (now + lease, owner))
+    conn.commit()
+
+
+def requeue_lapsed(conn, now: float, owner: str = None) -> int:
+    """Requeue running jobs whose lease has lapsed (all of ``owner``'s
+    if given, e.g. on shutdown); a pending cancel completes instead"""
+    if owner is None:
+        where, params = "(lease_until IS NULL OR lease_until < ?)", (now,)
+    else:
+        where, params = "owner = ?", (owner,)
+    c = conn.cursor()
+    c.execute(f"""UPDATE jobs SET state = 'queued', owner = NULL,
+                      lease_until = NULL
+                  WHERE state = 'running' AND {where}""", params)
+    requeued = c.rowcount
+    c.execute(f"""UPDATE jobs SET state = 'cancelled', owner = NULL,
+                      lease_until = NULL, finished_at = CURRENT_TIMESTAMP
+                  WHERE state = 'cancelling' AND {where}""", params)
+    conn.commit()
+    return requeued
+
+
+def recover_jobs(conn, now: float = None, keep_days: int = KEEP_DAYS) -> int:
+    """Requeue jobs whose process died holding them and drop old ones"""
+    requeued = requeue_lapsed(conn, time.time() if now is None else now)
+    conn.execute(f"""DELETE FROM jobs WHERE state IN {FINAL_STATES}
+                     AND finished_at < datetime('now', ?)""",
+                 (f"-{keep_days} days",))
+    conn.commit()
+    return requeued
+
+
+class RunningJob:
+    """What a handler gets: the job's payload and last checkpoint"""
+
+    def __init__(self, row: dict):
+        self.id = row["id"]
+        self.kind = row["kind"]
+        self.payload = row["payload"] or {}
+        self.progress = row["progress"]
+        self.attempts = row["attempts"]
+
+    async def checkpoint(self, progress):
+        """Save progress to resume from; raises JobCancelled if cancelled"""
+        self.progress = progress
+        if await db.write(save_progress, self.id, progress) == "cancelling":
+            raise JobCancelled(f"job {self.id} was cancelled")
+
+    def checkpoint_in(self, conn, progress):
+        """Save progress in the caller's transaction on ``conn``, so it
+        commits together with the work it accounts for"""
+        write_progress(conn, self.id, progress)
+        self.progress = progress
+
+    async def check(self):
+        """Raise JobCancelled if the job has been cancelled"""
+        if await db.run(job_state, self.id) == "cancelling":
+            raise JobCancelled(f"job {self.id} was cancelled")
+
+
+class JobQueue:
+    """Handlers by job kind plus the worker tasks that run them"""
+
+    def __init__(self, workers: int = JOB_WORKERS,
+                 lease: float = LEASE_SECONDS):
+        self.workers = workers
+        self.lease = lease
+        # Lease holder name, unique per process and queue
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:" \
+                     f"{uuid.uuid4().hex[:8]}"
+        self.handlers = {}
+        self._tasks = []
+        self._wakeup = None
+
+    def handler(self, kind: str):
+        """Decorator registering ``async fn(job: RunningJob) -> result``"""
+        def register(fn):
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    async def enqueue(self, kind: str, payload=None, priority: int = 0,
+                      idempotency_key: str = None,
+                      max_attempts: int = MAX_ATTEMPTS) -> dict:
+        """Queue a job (higher priority runs first) and return it"""
+        job, created = await db.write(insert_job, kind, payload, priority,
+                                      idempotency_key, max_attempts)
+        if created and self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: int):
+        return await db.run(fetch_job, job_id)
+
+    async def recent(self, state: str = None, kind: str = None,
+                     limit: int = 50) -> list:
+        return await db.run(list_jobs, state, kind, limit)
+
+    async def cancel(self, job_id: int):
+        job = await db.write(cancel_job, job_id)
+        if job is not None and job["state"] == "cancelled":
+            self._release(job["payload"])
+        return job
+
+    async def start(self):
+        """Requeue interrupted jobs and start the workers (app startup)"""
+        requeued = await db.write(recover_jobs)
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._work())
+                       for _ in range(self.workers)]
+        self._tasks.append(loop.create_task(self._heartbeat()))
+        print(f"✅ Job queue started ({self.workers} workers, "
+              f"{requeued} interrupted jobs requeued)")
+
+    async def stop(self):
+        """Stop the workers and requeue the jobs they were running"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await db.write(requeue_lapsed, time.time(), self.owner)
+
+    async def _heartbeat(self):
+        """Renew this queue's leases and pick up lapsed ones of others"""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                now = time.time()
+                await db.write(renew_leases, self.owner, now, self.lease)
+                if await db.write(requeue_lapsed, now):
+                    self._wakeup.set()
+            except Exception as e:
+                print(f"❌ Job lease renewal failed: {e}")
+
+    async def _work(self):
+        while True:
+            self._wakeup.clear()
+            job = None
+            try:
+                job, due = await db.write(claim_job, time.time(),
+                                          self.owner, self.lease)
+                if job is not None:
+                    await self._execute(job)
+                    continue
+            except Exception as e:
+                # A failed claim or bookkeeping write must not end the
+                # worker; the job it held is failed rather than left running
+                error = f"{type(e).__name__}: {e}"
+                where = f" on job {job['id']}" if job is not None else ""
+                print(f"❌ Job worker error{where}: {error}")
+                if job is not None:
+                    await self._abandon(job, error)
+                due = None
+            wait = POLL_SECONDS if due is None else \
+                min(POLL_SECONDS, max(0.0, due - time.time()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute(self, row: dict):
+        job = RunningJob(row)
+        handler = self.handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise JobError(f"no handler for job kind {job.kind!r}")
+            result = await handler(job)
+        except JobCancelled as e:
+            await self._finish(job, "cancelled", error=str(e))
+        except JobError as e:
+            await self._finish(job, "failed", error=str(e))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if job.attempts >= row["max_attempts"]:
+                print(f"❌ Job {job.id} ({job.kind}) failed: {error}")
+                await self._finish(job, "failed", error=error)
+            else:
+                delay = min(MAX_BACKOFF, BACKOFF * 2 ** (job.attempts - 1))
+                state = await db.write(retry_job, job.id, error, time.time() +
+                                       delay * random.uniform(0.5, 1.0))
+                if state == "cancelled":
+                    self._release(job.payload)
+        else:
+            await self._finish(job, "done", result=result)
+
+    async def _finish(self, job: RunningJob, state: str, result=None,
+                      error=None):
+        await db.write(finish_job, job.id, state, result, error)
+        self._release(job.payload)
+
+    async def _abandon(self, row: dict, error: str):
+        """Fail a job whose run broke outside its handler"""
+        try:
+            await db.write(finish_job, row["id"], "failed", None, error)
+        except Exception as e:
+            print(f"❌ Could not mark job {row['id']} failed: {e}")
+            return
+        self._release(row["payload"])
+
+    @staticmethod
+    def _release(payload):
+        # Uploads saved for a job (see upload_path) are only needed until
+        # it ends
+        upload = payload.get("file") if isinstance(payload, dict) else None
+        if upload:
+            try:
+                os.remove(upload)
+            except FileNotFoundError:
+                pass
+
+
+def upload_path(suffix: str) -> str:
+    """A new file under SIS_JOB_DIR for a request body a job will read.
+
+    Pass it as the payload's ``file``; it is deleted when the job ends.
+    """
+    os.makedirs(JOB_DIR, exist_ok=True)
+    return os.path.join(JOB_DIR, uuid.uuid4().hex + suffix)
+
+
+jobs = JobQueue()
@@ -0,0 +1,192 @@
+# llm_cache.py
+"""
+Two-tier cache of generated requirements, in front of the LLM providers.
+
+Tier one is an exact-match LRU keyed on the normalized prompt, the
+provider and the request context. Tier two compares the prompt's
+embedding with those of cached prompts of the same provider and context,
+and reuses an answer when the cosine similarity reaches
+SIS_LLM_CACHE_THRESHOLD. The embedder is the retrieval one: the hashing
+fallback only scores reworded prompts with the same words highly
+("student records FERPA compliance" vs "FERPA compliance for student
+records" is 0.82), while SIS_EMBEDDING_MODEL also matches paraphrases.
+Keep the threshold high; a false match answers the wrong question.
+
+Entries expire after SIS_LLM_CACHE_TTL seconds; each tier holds at most
+SIS_LLM_CACHE_SIZE entries and drops the least recently used one when
+full.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Cache settings (override through environment variables)
+CACHE_SIZE = int(os.getenv("SIS_LLM_CACHE_SIZE", "1024"))
+CACHE_TTL = float(os.getenv("SIS_LLM_CACHE_TTL", str(24 * 3600)))
+CACHE_THRESHOLD = float(os.getenv("SIS_LLM_CACHE_THRESHOLD", "0.92"))
+
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lower-case, single-spaced, without trailing punctuation"""
+    return _SPACE.sub(" ", (prompt or "").lower()).strip().rstrip("?.!")
+
+
+def scope_key(provider: str, context=None) -> str:
+    """Answers are only shared between requests with the same scope"""
+    return json.dumps([provider, context], sort_keys=True, default=str)
+
+
+class ResponseCache:
+    """Exact LRU plus embedding-similarity lookup with TTL and metrics.
+
+    ``get`` and ``put`` are thread-safe and may block on the embedder,
+    so async callers run them in a worker thread. Cached results are
+    copied in and out, so callers may modify what they get.
+    """
+
+    def __init__(self, embedder=None, size: int = CACHE_SIZE,
+                 ttl: float = CACHE_TTL, threshold: float = CACHE_THRESHOLD):
+        self._embedder = embedder
+        self.size = size
+        self.ttl = ttl
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._exact = OrderedDict()  # key -> (expires, result)
+        # Semantic tier: one row per entry, slots reused once evicted
+        self._vectors = None
+        self._scopes = [None] * size
+        self._prompts = [None] * size
+        self._expires = np.zeros(size)
+        self._used = np.zeros(size)  # last hit or insert, for LRU
+        self._results = [None] * size
+        self._metrics = {"exact_hits": 0, "semantic_hits": 0, "misses": 0,
+                         "bypassed": 0, "stores": 0, "evictions": 0,
+                         "expired": 0}
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            from vector_index import get_embedder
+            self._embedder = get_embedder()
+        return self._embedder
+
+    @staticmethod
+    def _key(normalized: str, scope: str) -> str:
+        return hashlib.sha256(f"{scope}\n{normalized}".encode()).hexdigest()
+
+    def get(self, prompt: str, provider: str, context=None):
+        """The cached result and how it matched ("exact"/"semantic"),
+        or (None, None)"""
+        normalized = normalize_prompt(prompt)
+        scope = scope_key(provider, context)
+        key = self._key(normalized, scope)
+        now = time.time()
+        with self._lock:
+            entry = self._exact.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._exact.move_to_end(key)
+                    self._metrics["exact_hits"] += 1
+                    return copy.deepcopy(entry[1]), "exact"
+                del self._exact[key]
+                self._metrics["expired"] += 1
+            if self._vectors is None or self.threshold > 1:
+                self._metrics["misses"] += 1
+                return None, None
+
+        query = self.embedder.embed([normalized])[0]
+        with self._lock:
+            live = np.array([s == scope for s in self._scopes]) & \
+                (self._expires > now)
+            if live.any():
+                scores = np.where(live, self._vectors @ query, -np.inf)
+                slot = int(np.argmax(scores))
+                if scores[slot] >= self.threshold:
+                    self._used[slot] = now
+                    self._metrics["semantic_hits"] += 1
+                    result = copy.deepcopy(self._results[slot])
+                    result["cache_similarity"] = round(float(scores[slot]),
+                                                       4)
+                    return result, "semantic"
+            self._metrics["misses"] += 1
+        return None, None
+
+    def put(self, prompt: str, provider: str, result: dict, context=None):
+        """Store a fresh result in both tiers"""
+        normalized = normalize_prompt(prompt)
+        scope = scope_key(provider, context)
+        key = self._key(normalized, scope)
+        vector = self.embedder.embed([normalized])[0]
+        now = time.time()
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._metrics["stores"] += 1
+            self._exact[key] = (now + self.ttl, result)
+            self._exact.move_to_end(key)
+            while len(self._exact) > self.size:
+                self._exact.popitem(last=False)
+                self._metrics["evictions"] += 1
+
+            if self._vectors is None:
+                self._vectors = np.zeros((self.size, len(vector)),
+                                         dtype=np.float32)
+            # Reuse the slot of an identical prompt, else an expired or
+            # empty one, else the least recently used
+            same = [i for i, p in enumerate(self._prompts)
+                    if p == normalized and self._scopes[i] == scope]
+            if same:
+                slot = same[0]
+            else:
+                slot = int(np.argmin(np.where(self._expires > now,
+                                              self._used, -1)))
+                if self._expires[slot] > now:
+                    self._metrics["evictions"] += 1
+            self._vectors[slot] = vector
+            self._scopes[slot] = scope
+            self._prompts[slot] = normalized
+            self._expires[slot] = now + self.ttl
+            self._used[slot] = now
+            self._results[slot] = result
+
+    def clear(self):
+        with self._lock:
+            self._exact.clear()
+            self._scopes = [None] * self.size
+            self._prompts = [None] * self.size
+            self._expires[:] = 0
+            self._results = [None] * self.size
+
+    def record_bypass(self):
+        with self._lock:
+            self._metrics["bypassed"] += 1
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            metrics = dict(self._metrics)
+            lookups = (metrics["exact_hits"] + metrics["semantic_hits"] +
+                       metrics["misses"])
+            hits = metrics["exact_hits"] + metrics["semantic_hits"]
+            return {
+                **metrics,
+                "hit_rate": round(hits / lookups, 4) if lookups else None,
+                "exact_entries": len(self._exact),
+                "semantic_entries": int((self._expires > now).sum()),
+                "size": self.size,
+                "ttl_seconds": self.ttl,
+                "threshold": self.threshold
+            }
+
+
+# Shared by LLMService instances and the stats endpoint
+response_cache = ResponseCache()
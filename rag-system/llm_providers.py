@@ -0,0 +1,512 @@
+# llm_providers.py
+"""
+Async clients for the hosted LLM providers (OpenAI, Groq, Anthropic).
+
+Every call goes through one shared httpx.AsyncClient, so connections
+(and their TLS sessions) are kept alive and reused instead of being set
+up per request. Each provider has its own semaphore of
+SIS_LLM_CONCURRENCY calls (SIS_LLM_CONCURRENCY_<PROVIDER> overrides it),
+so a burst of requests queues in the app instead of tripping the
+provider's rate limits. Identical prompts that are already in flight
+share one upstream call.
+
+Every provider keeps a latency histogram and a circuit breaker. After
+SIS_LLM_BREAKER_FAILURES failed (or slower than SIS_LLM_SLOW_SECONDS)
+calls in a row its breaker opens and calls are refused at once for
+SIS_LLM_BREAKER_RESET seconds; then a single probe call decides whether
+it closes again. ``hedged()`` sends a request to the first healthy
+provider and, if no answer arrived within that provider's observed p95
+latency (SIS_LLM_HEDGE_QUANTILE), to the next one too: the first good
+answer wins. Hedging only pays off when the slow calls are rarer than
+that quantile; otherwise the p95 is the slow latency itself.
+
+SIS_LLM_BASE_URL (or SIS_<PROVIDER>_BASE_URL) points the clients at
+another server, e.g. benchmarks/mock_llm.py for offline testing.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+import httpx
+
+# Client settings (override through environment variables)
+LLM_TIMEOUT = float(os.getenv("SIS_LLM_TIMEOUT", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("SIS_LLM_CONNECT_TIMEOUT", "5"))
+LLM_CONCURRENCY = int(os.getenv("SIS_LLM_CONCURRENCY", "4"))
+LLM_MAX_CONNECTIONS = int(os.getenv("SIS_LLM_MAX_CONNECTIONS", "32"))
+LLM_MAX_TOKENS = int(os.getenv("SIS_LLM_MAX_TOKENS", "500"))
+# Health and hedging
+BREAKER_FAILURES = int(os.getenv("SIS_LLM_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("SIS_LLM_BREAKER_RESET", "30"))
+SLOW_SECONDS = float(os.getenv("SIS_LLM_SLOW_SECONDS", "20"))
+HEDGE_DELAY = float(os.getenv("SIS_LLM_HEDGE_DELAY", "2"))  # until p95 is known
+HEDGE_MIN_SAMPLES = int(os.getenv("SIS_LLM_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_QUANTILE = float(os.getenv("SIS_LLM_HEDGE_QUANTILE", "0.95"))
+HEDGE_PROVIDERS = [name.strip() for name in os.getenv(
+    "SIS_LLM_HEDGE_PROVIDERS", "groq,openai,anthropic").split(",")
+    if name.strip()]
+
+SYSTEM_PROMPT = ("You are a requirements engineering expert using PEGS "
+                 "framework.")
+
+
+class LLMError(Exception):
+    """A provider call failed; ``status`` is the HTTP status if any"""
+
+    def __init__(self, provider: str, message: str, status: int = None):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.status = status
+
+
+class Provider:
+    """Endpoint, credentials and wire format of one hosted LLM API"""
+
+    def __init__(self, name: str, base_url: str, path: str, key_env: str,
+                 model: str, style: str = "openai"):
+        self.name = name
+        env = name.upper()
+        self.base_url = (os.getenv(f"SIS_{env}_BASE_URL")
+                         or os.getenv("SIS_LLM_BASE_URL") or base_url)
+        self.url = self.base_url.rstrip("/") + path
+        self.key_env = key_env
+        self.model = os.getenv(f"SIS_{env}_MODEL", model)
+        self.style = style
+        self.concurrency = int(os.getenv(f"SIS_LLM_CONCURRENCY_{env}",
+                                         str(LLM_CONCURRENCY)))
+
+    @property
+    def api_key(self) -> str:
+        return os.environ.get(self.key_env, "")
+
+    def headers(self) -> dict:
+        key = self.api_key
+        if self.style == "anthropic":
+            return {"anthropic-version": "2023-06-01",
+                    **({"x-api-key": key} if key else {})}
+        return {"Authorization": f"Bearer {key}"} if key else {}
+
+    def body(self, model: str, system: str, prompt: str,
+             max_tokens: int) -> dict:
+        if self.style == "anthropic":
+            return {"model": model, "max_tokens": max_tokens,
+                    "system": system,
+                    "messages": [{"role": "user", "content": prompt}]}
+        return {"model": model, "max_tokens": max_tokens,
+                "messages": [{"role": "system", "content": system},
+                             {"role": "user", "content": prompt}]}
+
+    def text(self, data: dict) -> str:
+        if self.style == "anthropic":
+            return "".join(block.get("text", "")
+                           for block in data.get("content", []))
+        return data["choices"][0]["message"]["content"]
+
+    def delta(self, event: dict) -> str:
+        """Text of one streamed event ("" for events without text)"""
+        if self.style == "anthropic":
+            if event.get("type") == "content_block_delta":
+                return event["delta"].get("text", "")
+            return ""
+        choices = event.get("choices") or [{}]
+        return choices[0].get("delta", {}).get("content") or ""
+
+
+PROVIDERS = {
+    "openai": Provider("openai", "https://api.openai.com",
+                       "/v1/chat/completions", "OPENAI_API_KEY",
+                       "gpt-3.5-turbo"),
+    # Groq serves the OpenAI chat-completions format
+    "groq": Provider("groq", "https://api.groq.com/openai",
+                     "/v1/chat/completions", "GROQ_API_KEY",
+                     "llama-3.1-8b-instant"),
+    "anthropic": Provider("anthropic", "https://api.anthropic.com",
+                          "/v1/messages", "ANTHROPIC_API_KEY",
+                          "claude-3-5-haiku-latest", style="anthropic"),
+}
+
+
+class LatencyHistogram:
+    """Call latencies in log-spaced buckets (10 ms to 2 min).
+
+    Counts are halved whenever ``window`` observations have accumulated,
+    so the quantiles follow the provider's recent behaviour.
+    """
+
+    BOUNDS = [0.01 * 1.25 ** i for i in range(43)]  # up to ~146 s
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.total = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.total += 1
+        if self.total >= self.window:
+            self.counts = [count // 2 for count in self.counts]
+            self.total = sum(self.counts)
+
+    def quantile(self, q: float):
+        """Upper bound of the bucket holding quantile ``q`` (seconds)"""
+        if not self.total:
+            return None
+        rank, seen = q * self.total, 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.BOUNDS[min(i, len(self.BOUNDS) - 1)]
+        return self.BOUNDS[-1]
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failures`` in a row -> half-open probe.
+
+    A successful probe closes the breaker, a failed one reopens it.
+    """
+
+    def __init__(self, failures: int = BREAKER_FAILURES,
+                 reset: float = BREAKER_RESET):
+        self.failures = failures
+        self.reset = reset
+        self.state = "closed"
+        self.failed = 0
+        self.opened_at = 0.0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        if self.state != "closed" and \
+                time.monotonic() - self.opened_at >= self.reset:
+            # One probe per reset period, so an abandoned probe is retried
+            self.state = "half-open"
+            self.opened_at = time.monotonic()
+            return True
+        return self.state == "closed"
+
+    def record_success(self):
+        self.state = "closed"
+        self.failed = 0
+
+    def record_failure(self):
+        self.failed += 1
+        if self.state == "half-open" or self.failed >= self.failures:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+def _trips_breaker(error: LLMError) -> bool:
+    """Outages, overload and bad credentials; not rejected prompts"""
+    return error.status is None or error.status >= 500 or \
+        error.status in (401, 403, 429)
+
+
+class LLMClient:
+    """Pooled, rate-limited, coalescing access to the PROVIDERS.
+
+    The httpx client and semaphores are created on first use inside the
+    running event loop; ``aclose()`` releases the connections.
+    """
+
+    def __init__(self, providers: dict = None, transport=None):
+        self.providers = providers or PROVIDERS
+        self._transport = transport
+        self._client = None
+        self._semaphores = {}
+        self._inflight = {}
+        self._stats = {name: {"requests": 0, "coalesced": 0, "errors": 0,
+                              "waiting": 0, "seconds": 0.0, "rejected": 0,
+                              "hedged": 0, "hedge_wins": 0}
+                       for name in self.providers}
+        self.latency = {name: LatencyHistogram() for name in self.providers}
+        self.breakers = {name: CircuitBreaker() for name in self.providers}
+
+    def available(self, provider: str) -> bool:
+        """Known provider with an API key (or a local base URL)"""
+        spec = self.providers.get(provider)
+        return spec is not None and bool(
+            spec.api_key or os.getenv("SIS_LLM_BASE_URL")
+            or os.getenv(f"SIS_{provider.upper()}_BASE_URL"))
+
+    def healthy(self, providers) -> list:
+        """The available ``providers`` whose breaker is not open, in order.
+
+        Does not consume the half-open probe; the call itself does.
+        """
+        result = []
+        for name in dict.fromkeys(providers):
+            breaker = self.breakers.get(name)
+            if breaker is None or not self.available(name):
+                continue
+            if breaker.state == "closed" or \
+                    time.monotonic() - breaker.opened_at >= breaker.reset:
+                result.append(name)
+        return result
+
+    def hedge_delay(self, provider: str) -> float:
+        """Seconds to wait for ``provider`` before asking another one"""
+        latency = self.latency[provider]
+        if latency.total < HEDGE_MIN_SAMPLES:
+            return HEDGE_DELAY
+        return latency.quantile(HEDGE_QUANTILE)
+
+    def _admit(self, provider: str):
+        if not self.breakers[provider].allow():
+            self._stats[provider]["rejected"] += 1
+            raise LLMError(provider, "circuit open")
+
+    def _record(self, provider: str, seconds: float, error=None):
+        breaker = self.breakers[provider]
+        if error is not None:
+            if _trips_breaker(error):
+                breaker.record_failure()
+            return
+        self.latency[provider].observe(seconds)
+        if seconds > SLOW_SECONDS:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                transport=self._transport,
+                timeout=httpx.Timeout(LLM_TIMEOUT,
+                                      connect=LLM_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_CONNECTIONS))
+        return self._client
+
+    def _semaphore(self, provider: str) -> asyncio.Semaphore:
+        if provider not in self._semaphores:
+            self._semaphores[provider] = asyncio.Semaphore(
+                self.providers[provider].concurrency)
+        return self._semaphores[provider]
+
+    async def complete(self, provider: str, prompt: str,
+                       system: str = SYSTEM_PROMPT,
+                       max_tokens: int = LLM_MAX_TOKENS,
+                       model: str = None) -> str:
+        """Completion text for ``prompt``; raises LLMError on failure.
+
+        A caller whose identical request is already in flight waits for
+        that call's answer instead of sending another.
+        """
+        spec = self.providers.get(provider)
+        if spec is None:
+            raise LLMError(provider, "unknown provider")
+        model = model or spec.model
+        key = hashlib.sha256(json.dumps(
+            [provider, model, system, prompt, max_tokens]).encode()).digest()
+
+        call = self._inflight.get(key)
+        if call is not None:
+            self._stats[provider]["coalesced"] += 1
+        else:
+            self._admit(provider)
+            call = asyncio.get_running_loop().create_task(
+                self._call(spec, model, system, prompt, max_tokens))
+            self._inflight[key] = call
+            call.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded: one caller giving up must not cancel the others' call
+        return await asyncio.shield(call)
+
+    async def _call(self, spec: Provider, model: str, system: str,
+                    prompt: str, max_tokens: int) -> str:
+        stats = self._stats[spec.name]
+        stats["waiting"] += 1
+        async with self._semaphore(spec.name):
+            stats["waiting"] -= 1
+            stats["requests"] += 1
+            started = time.perf_counter()
+            try:
+                text = await self._post(spec, model, system, prompt,
+                                        max_tokens)
+            except LLMError as e:
+                stats["errors"] += 1
+                self._record(spec.name, 0, e)
+                raise
+            finally:
+                stats["seconds"] += time.perf_counter() - started
+            self._record(spec.name, time.perf_counter() - started)
+            return text
+
+    async def hedged(self, providers, prompt: str,
+                     system: str = SYSTEM_PROMPT,
+                     max_tokens: int = LLM_MAX_TOKENS) -> tuple:
+        """(provider, text) of the first good answer among ``providers``.
+
+        Providers with an open breaker are skipped. The next one is asked
+        when the current ones have all failed, or when the newest has not
+        answered within its p95 latency. Raises the last LLMError if every
+        provider failed. Calls that lose the race are left to finish (they
+        may be shared with other callers) and still feed the histograms.
+        """
+        queue = self.healthy(providers)
+        if not queue:
+            raise LLMError(",".join(providers), "no healthy provider")
+        pending, hedges, error = {}, set(), None
+        try:
+            while queue or pending:
+                if queue:
+                    name = queue.pop(0)
+                    if pending:
+                        self._stats[name]["hedged"] += 1
+                        hedges.add(name)
+                    pending[asyncio.ensure_future(self.complete(
+                        name, prompt, system, max_tokens))] = name
+                    timeout = self.hedge_delay(name) if queue else None
+                else:
+                    timeout = None
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = pending.pop(task)
+                    try:
+                        text = task.result()
+                    except LLMError as e:
+                        error = e
+                        continue
+                    if name in hedges:
+                        self._stats[name]["hedge_wins"] += 1
+                    return name, text
+        finally:
+            for task in pending:
+                task.cancel()
+        raise error
+
+    async def _post(self, spec: Provider, model: str, system: str,
+                    prompt: str, max_tokens: int) -> str:
+        try:
+            response = await self.client().post(
+                spec.url, headers=spec.headers(),
+                json=spec.body(model, system, prompt, max_tokens))
+        except httpx.TimeoutException:
+            raise LLMError(spec.name, "timed out")
+        except httpx.HTTPError as e:
+            raise LLMError(spec.name, f"{type(e).__name__}: {e}")
+        if response.status_code >= 400:
+            raise LLMError(spec.name, response.text[:200],
+                           response.status_code)
+        try:
+            return spec.text(response.json())
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise LLMError(spec.name, f"unexpected response: {e!r}")
+
+    async def stream(self, provider: str, prompt: str,
+                     system: str = SYSTEM_PROMPT,
+                     max_tokens: int = LLM_MAX_TOKENS, model: str = None):
+        """Yield the completion's text pieces as the provider sends them.
+
+        Streams hold one of the provider's semaphore slots until they end
+        and are never coalesced. Raises LLMError on failure.
+        """
+        spec = self.providers.get(provider)
+        if spec is None:
+            raise LLMError(provider, "unknown provider")
+        body = {**spec.body(model or spec.model, system, prompt, max_tokens),
+                "stream": True}
+        self._admit(provider)
+        stats = self._stats[provider]
+        stats["waiting"] += 1
+        async with self._semaphore(provider):
+            stats["waiting"] -= 1
+            stats["requests"] += 1
+            started = time.perf_counter()
+            error = None
+            try:
+                async with self.client().stream(
+                        "POST", spec.url, headers=spec.headers(),
+                        json=body) as response:
+                    if response.status_code >= 400:
+                        detail = (await response.aread())[:200]
+                        raise LLMError(provider,
+                                       detail.decode(errors="replace"),
+                                       response.status_code)
+                    async for line in response.aiter_lines():
+                        # Server-sent events: only the data lines matter
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        try:
+                            text = spec.delta(json.loads(data))
+                        except (KeyError, IndexError, TypeError,
+                                ValueError) as e:
+                            raise LLMError(provider,
+                                           f"unexpected event: {e!r}")
+                        if text:
+                            yield text
+            except httpx.TimeoutException:
+                error = LLMError(provider, "timed out")
+            except httpx.HTTPError as e:
+                error = LLMError(provider, f"{type(e).__name__}: {e}")
+            except LLMError as e:
+                error = e
+            finally:
+                seconds = time.perf_counter() - started
+                stats["seconds"] += seconds
+                if error is not None:
+                    stats["errors"] += 1
+                    self._record(provider, seconds, error)
+                elif not isinstance(sys.exc_info()[1], GeneratorExit):
+                    self._record(provider, seconds)
+            if error is not None:
+                raise error
+
+    def stats(self) -> dict:
+        def ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 1)
+
+        return {
+            name: {
+                "requests": counts["requests"],
+                "coalesced": counts["coalesced"],
+                "errors": counts["errors"],
+                "rejected": counts["rejected"],
+                "waiting": counts["waiting"],
+                "hedged": counts["hedged"],
+                "hedge_wins": counts["hedge_wins"],
+                "avg_ms": round(counts["seconds"] * 1000 / counts["requests"],
+                                1) if counts["requests"] else None,
+                "p50_ms": ms(self.latency[name].quantile(0.5)),
+                "p95_ms": ms(self.latency[name].quantile(0.95)),
+                "p99_ms": ms(self.latency[name].quantile(0.99)),
+                "breaker": self.breakers[name].state,
+                "breaker_trips": self.breakers[name].trips,
+                "concurrency": self.providers[name].concurrency,
+                "configured": self.available(name)
+            }
+            for name, counts in self._stats.items()
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+async def fake_stream(text: str, delay: float = 0.0):
+    """Yield ``text`` a word at a time like a provider stream would.
+
+    The offline stand-in for the "local" provider, so streaming clients
+    work (and can be tested) without any hosted LLM.
+    """
+    for piece in re.findall(r"\S+\s*|\s+", text):
+        yield piece
+        await asyncio.sleep(delay)
+
+
+# Shared by every caller in the process
+llm = LLMClient()
+
@@ -0,0 +1,197 @@
+# local_generator.py
+"""
+Data-driven rule-based requirement generator (the "local" provider).
+
+Templates are rows of ``requirement_templates``: comma-separated
+triggers plus the requirement to emit when any of them occurs in a
+prompt (case-insensitive substring, like the old ``"x" in prompt``
+checks). Adding a template is an INSERT, not a code change. A prompt
+with no hit gets the generic "Requirement: <prompt>" fallback.
+
+All triggers are compiled into one KeywordMatcher, so the cost per
+prompt barely grows with the number of templates, and
+``generate_batch`` matches a whole list of prompts in one vectorized
+step. Triaging thousands of stakeholder statements this way costs
+nothing but CPU; see benchmarks/bench_local_generator.py.
+"""
+
+import threading
+
+import numpy as np
+
+from db_pool import pool
+from pegs_matcher import KeywordMatcher
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requirement_templates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    triggers TEXT NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    pegs_category TEXT NOT NULL DEFAULT 'System',
+    priority TEXT NOT NULL DEFAULT 'Medium',
+    confidence REAL NOT NULL DEFAULT 0.8,
+    position INTEGER NOT NULL DEFAULT 0,
+    enabled INTEGER NOT NULL DEFAULT 1
+)
+"""
+
+COLUMNS = ("id", "triggers", "title", "description", "pegs_category",
+           "priority", "confidence", "position", "enabled")
+
+# Seeded into an empty table; the first three are the original rules
+DEFAULT_TEMPLATES = [
+    ("authentication", "Multi-Factor Authentication",
+     "System shall implement MFA for all user access points",
+     "System", "Critical", 0.9),
+    ("compliance", "FERPA Compliance",
+     "System shall ensure FERPA compliance for student data",
+     "Environment", "Critical", 0.95),
+    ("performance", "Response Time Requirement",
+     "System shall maintain <2 second response time",
+     "System", "High", 0.85),
+    ("audit,logging", "Audit Trail",
+     "System shall log every change to student records with user and time",
+     "Environment", "High", 0.85),
+    ("backup,disaster recovery", "Backup and Recovery",
+     "System shall back up data daily and restore it within 4 hours",
+     "System", "High", 0.8),
+    ("accessibility,wcag,screen reader", "Accessibility",
+     "System shall meet WCAG 2.1 AA for all user-facing pages",
+     "Environment", "High", 0.85),
+    ("enrollment,registration", "Course Enrollment",
+     "System shall let students enroll in and drop courses online",
+     "Goals", "High", 0.8),
+    ("grades,grading,gpa,transcript", "Grades and Transcripts",
+     "System shall record grades and produce official transcripts",
+     "System", "High", 0.8),
+    ("report,dashboard", "Reporting",
+     "System shall provide reports on enrollment and academic progress",
+     "Goals", "Medium", 0.75),
+    ("notification,email,alert", "Notifications",
+     "System shall notify users of deadlines and status changes by email",
+     "System", "Medium", 0.75),
+    ("integration,interface,learning management", "System Integration",
+     "System shall exchange data with the LMS through a documented API",
+     "Environment", "Medium", 0.75),
+    ("budget,cost", "Budget Constraint",
+     "Project shall be delivered within the approved budget",
+     "Project", "High", 0.8),
+    ("deadline,timeline,schedule", "Delivery Schedule",
+     "Project shall meet the agreed delivery milestones",
+     "Project", "Medium", 0.75),
+]
+
+
+def ensure_template_table(conn):
+    """Create the templates table, seeding the defaults when empty"""
+    conn.execute(SCHEMA)
+    if conn.execute(
+            "SELECT COUNT(*) FROM requirement_templates").fetchone()[0] == 0:
+        conn.executemany(
+            "INSERT INTO requirement_templates (triggers, title, "
+            "description, pegs_category, priority, confidence, position) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [row + (position,)
+             for position, row in enumerate(DEFAULT_TEMPLATES)])
+    conn.commit()
+
+
+def load_templates(conn, enabled_only: bool = True) -> list:
+    sql = f"SELECT {', '.join(COLUMNS)} FROM requirement_templates"
+    if enabled_only:
+        sql += " WHERE enabled = 1"
+    return [dict(zip(COLUMNS, row))
+            for row in conn.execute(sql + " ORDER BY position, id")]
+
+
+def _fallback(prompt: str) -> dict:
+    return {"title": f"Requirement: {prompt[:50]}",
+            "description": prompt,
+            "pegs_category": "System",
+            "priority": "Medium",
+            "confidence": 0.7}
+
+
+class LocalGenerator:
+    """Matches prompts against a list of template dicts (see COLUMNS)"""
+
+    def __init__(self, templates: list):
+        self.templates = list(templates)
+        # Rendered once; ``generate`` hands out copies
+        self._requirements = [
+            {"title": t["title"], "description": t["description"],
+             "pegs_category": t["pegs_category"], "priority": t["priority"],
+             "confidence": t["confidence"]}
+            for t in self.templates]
+        # One "category" per template, keyed by its index in table order
+        self.matcher = KeywordMatcher({
+            str(i): [trigger.strip() for trigger in t["triggers"].split(",")
+                     if trigger.strip()]
+            for i, t in enumerate(self.templates)})
+
+    @classmethod
+    def from_db(cls, conn):
+        return cls(load_templates(conn))
+
+    def _result(self, prompt: str, indices) -> dict:
+        requirements = [self._requirements[i] for i in indices] or \
+            [_fallback(prompt)]
+        return {"requirements": requirements, "provider": "local",
+                "count": len(requirements)}
+
+    def generate(self, prompt: str) -> dict:
+        """Requirements for one prompt, shaped like an LLM answer"""
+        prompt = prompt or ""
+        counts = self.matcher.counts(prompt)
+        result = self._result(prompt, [i for i, n in enumerate(counts) if n])
+        result["requirements"] = [dict(r) for r in result["requirements"]]
+        return result
+
+    def generate_batch(self, prompts) -> list:
+        """``generate`` for many prompts in one vectorized match.
+
+        Each distinct prompt is matched once, and prompts with the same
+        template hits share one result: treat the results as read-only.
+        """
+        prompts = [prompt or "" for prompt in prompts]
+        unique = list(dict.fromkeys(prompts))
+        if not self.templates:
+            hits = np.zeros((len(unique), 0), dtype=bool)
+        else:
+            hits = self.matcher.count_matrix(unique) > 0
+        by_hits, by_prompt = {}, {}
+        for prompt, row in zip(unique, hits):
+            if not row.any():
+                by_prompt[prompt] = self._result(prompt, ())
+                continue
+            key = row.tobytes()
+            if key not in by_hits:
+                by_hits[key] = self._result(prompt, np.flatnonzero(row))
+            by_prompt[prompt] = by_hits[key]
+        return [by_prompt[prompt] for prompt in prompts]
+
+
+_generator = None
+_lock = threading.Lock()
+
+
+def get_generator() -> LocalGenerator:
+    """The shared generator, loaded from the database on first use"""
+    global _generator
+    if _generator is None:
+        with _lock:
+            if _generator is None:
+                with pool.connection() as conn:
+                    ensure_template_table(conn)
+                    _generator = LocalGenerator.from_db(conn)
+    return _generator
+
+
+def reload_templates(conn) -> LocalGenerator:
+    """Recompile after the templates table changed"""
+    global _generator
+    generator = LocalGenerator.from_db(conn)
+    with _lock:
+        _generator = generator
+    return generator
@@ -0,0 +1,246 @@
+# near_duplicates.py
+"""
+Near-duplicate requirement detection with MinHash and LSH.
+
+Every requirement gets a MinHash signature of its description (title
+when there is none): SIS_DEDUP_PERMUTATIONS minimums of hashed character
+5-grams, whose agreement rate between two requirements estimates the
+Jaccard similarity of their texts. The signature is cut into
+SIS_DEDUP_BANDS bands and each band is hashed into a bucket row of
+``requirement_lsh``; requirements sharing any bucket are the only
+candidates compared, so a lookup reads a few index entries instead of
+the whole table. With 16 bands of 8 rows, texts with similarity 0.9
+become candidates 99.99% of the time, 0.8: 95%, 0.5: 6%, 0.3: 0.1%;
+candidates below SIS_DEDUP_THRESHOLD are then dropped by comparing
+signatures. Requirements share much of their wording ("The system
+shall ..."), so shorter bands would make most of the table candidates.
+
+Triggers drop a requirement's signature when it is deleted or its text
+changes; ``index_missing`` (re)signs every requirement without one.
+Check from the shell with:
+
+    python near_duplicates.py backfill
+    python near_duplicates.py report [threshold]
+"""
+
+import hashlib
+import os
+import re
+import sys
+import zlib
+
+import numpy as np
+
+# Dedupe settings (override through environment variables)
+PERMUTATIONS = int(os.getenv("SIS_DEDUP_PERMUTATIONS", "128"))
+BANDS = int(os.getenv("SIS_DEDUP_BANDS", "16"))
+THRESHOLD = float(os.getenv("SIS_DEDUP_THRESHOLD", "0.8"))
+DEDUP_ON_WRITE = os.getenv("SIS_DEDUP_ON_WRITE", "0") == "1"
+SHINGLE = 5
+BACKFILL_CHUNK = 2000
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(20240611)  # fixed: signatures are stored
+_A = _rng.randint(1, _PRIME, PERMUTATIONS).astype(np.uint64)
+_B = _rng.randint(0, _PRIME, PERMUTATIONS).astype(np.uint64)
+_ROWS = PERMUTATIONS // BANDS
+_WORDS = re.compile(r"[^a-z0-9]+")
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS requirement_minhash (
+        requirement_id INTEGER PRIMARY KEY,
+        signature BLOB NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS requirement_lsh (
+        band INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        requirement_id INTEGER NOT NULL,
+        PRIMARY KEY (band, bucket, requirement_id)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_requirement_lsh_id "
+    "ON requirement_lsh(requirement_id)",
+    """CREATE TRIGGER IF NOT EXISTS trg_requirement_minhash_delete
+    AFTER DELETE ON requirements
+    BEGIN
+        DELETE FROM requirement_minhash WHERE requirement_id = OLD.id;
+        DELETE FROM requirement_lsh WHERE requirement_id = OLD.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_requirement_minhash_update
+    AFTER UPDATE OF title, description ON requirements
+    BEGIN
+        DELETE FROM requirement_minhash WHERE requirement_id = OLD.id;
+        DELETE FROM requirement_lsh WHERE requirement_id = OLD.id;
+    END""",
+)
+
+
+def ensure_dedup_tables(conn):
+    for ddl in SCHEMA:
+        conn.execute(ddl)
+    conn.commit()
+
+
+def dedup_text(title, description) -> str:
+    """The text a requirement is compared by"""
+    return description or title or ""
+
+
+def signature(text: str) -> np.ndarray:
+    """MinHash of the text's character 5-grams (PERMUTATIONS uint32s)"""
+    normalized = _WORDS.sub(" ", (text or "").lower()).strip()
+    shingles = {normalized[i:i + SHINGLE]
+                for i in range(max(1, len(normalized) - SHINGLE + 1))}
+    hashes = np.fromiter((zlib.crc32(s.encode()) & _PRIME for s in shingles),
+                         dtype=np.uint64, count=len(shingles))
+    # (a * x + b) mod p per permutation; a, x < 2^31 so nothing overflows
+    values = (_A[:, None] * hashes[None, :] + _B[:, None]) % np.uint64(_PRIME)
+    return values.min(axis=1).astype(np.uint32)
+
+
+def buckets(sig: np.ndarray) -> list:
+    """(band, bucket) pairs of a signature"""
+    return [(band, int.from_bytes(hashlib.blake2b(
+                sig[band * _ROWS:(band + 1) * _ROWS].tobytes(),
+                digest_size=8).digest(), "little", signed=True))
+            for band in range(BANDS)]
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.mean(a == b))
+
+
+def add_signatures(conn, rows):
+    """Store (requirement_id, signature) pairs; the caller commits"""
+    rows = list(rows)
+    conn.executemany(
+        "INSERT OR REPLACE INTO requirement_minhash (requirement_id, "
+        "signature) VALUES (?, ?)", [(rid, sig.tobytes()) for rid, sig in rows])
+    conn.executemany(
+        "INSERT OR IGNORE INTO requirement_lsh (band, bucket, "
+        "requirement_id) VALUES (?, ?, ?)",
+        [(band, bucket, rid) for rid, sig in rows
+         for band, bucket in buckets(sig)])
+
+
+def _signatures(conn, ids) -> dict:
+    found = {}
+    ids = list(ids)
+    for start in range(0, len(ids), 500):  # SQLite parameter limit
+        part = ids[start:start + 500]
+        for rid, blob in conn.execute(
+                "SELECT requirement_id, signature FROM requirement_minhash "
+                f"WHERE requirement_id IN ({','.join('?' * len(part))})",
+                part):
+            found[rid] = np.frombuffer(blob, dtype=np.uint32)
+    return found
+
+
+def find_similar(conn, sig: np.ndarray, threshold: float = THRESHOLD,
+                 limit: int = 5, exclude: int = None) -> list:
+    """[(requirement_id, similarity)] at or above ``threshold``, best first"""
+    pairs = buckets(sig)
+    where = " OR ".join(["(band = ? AND bucket = ?)"] * len(pairs))
+    candidates = {rid for (rid,) in conn.execute(
+        f"SELECT DISTINCT requirement_id FROM requirement_lsh WHERE {where}",
+        [v for pair in pairs for v in pair])}
+    candidates.discard(exclude)
+    matches = [(rid, round(similarity(sig, other), 4))
+               for rid, other in _signatures(conn, candidates).items()]
+    matches = [m for m in matches if m[1] >= threshold]
+    matches.sort(key=lambda m: (-m[1], m[0]))
+    return matches[:limit]
+
+
+def index_missing(conn, limit: int = BACKFILL_CHUNK) -> int:
+    """Sign up to ``limit`` requirements that have no signature yet"""
+    rows = conn.execute(
+        "SELECT r.id, r.title, r.description FROM requirements r "
+        "LEFT JOIN requirement_minhash m ON m.requirement_id = r.id "
+        "WHERE m.requirement_id IS NULL LIMIT ?", (limit,)).fetchall()
+    if rows:
+        # Leftover buckets of rows signed before their text changed
+        conn.executemany("DELETE FROM requirement_lsh WHERE requirement_id = ?",
+                         [(rid,) for rid, _, _ in rows])
+        add_signatures(conn, [(rid, signature(dedup_text(title, description)))
+                              for rid, title, description in rows])
+        conn.commit()
+    return len(rows)
+
+
+def duplicate_clusters(conn, threshold: float = THRESHOLD,
+                       max_clusters: int = 500) -> dict:
+    """Groups of near-duplicate requirements, largest first.
+
+    Only requirements sharing an LSH bucket are compared: within each
+    bucket, the lowest id is compared with all the others at once, its
+    matches join its group, and the rest repeat that among themselves.
+    The lowest id of a group is the one to keep.
+    """
+    parent = {}
+
+    def find(x):
+        while parent.get(x, x) != x:
+            parent[x] = parent.get(parent[x], parent[x])
+            x = parent[x]
+        return x
+
+    compared = 0
+    groups = conn.execute(
+        "SELECT group_concat(requirement_id) FROM requirement_lsh "
+        "GROUP BY band, bucket HAVING COUNT(*) > 1")
+    for (members,) in groups:
+        ids = [int(i) for i in members.split(",")]
+        if len({find(i) for i in ids}) == 1:
+            continue  # already grouped through another band
+        sigs = _signatures(conn, ids)
+        ids = sorted(sigs)
+        matrix = np.vstack([sigs[i] for i in ids])
+        rest = np.arange(len(ids))
+        while len(rest) > 1:
+            head = rest[0]
+            close = (matrix[rest] == matrix[head]).mean(axis=1) >= threshold
+            compared += len(rest) - 1
+            for i in rest[close][1:]:
+                a, b = find(ids[head]), find(ids[i])
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+            rest = rest[~close]
+
+    clusters = {}
+    for rid in list(parent):
+        root = find(rid)
+        clusters.setdefault(root, {root}).add(rid)
+    clusters = sorted((sorted(members) for members in clusters.values()
+                       if len(members) > 1), key=lambda c: (-len(c), c[0]))
+    signed = conn.execute("SELECT COUNT(*) FROM requirement_minhash").fetchone()[0]
+    return {
+        "threshold": threshold,
+        "requirements": signed,
+        "clusters": len(clusters),
+        "redundant": sum(len(c) - 1 for c in clusters),
+        "compared": compared,
+        "groups": [{"keep": c[0], "duplicates": c[1:]}
+                   for c in clusters[:max_clusters]],
+    }
+
+
+if __name__ == "__main__":
+    from db_pool import pool
+
+    with pool.connection() as conn:
+        ensure_dedup_tables(conn)
+        signed = 0
+        while True:
+            count = index_missing(conn)
+            signed += count
+            if not count:
+                break
+        print(f"✅ Signed {signed} requirements")
+        if sys.argv[1:2] == ["report"]:
+            threshold = float(sys.argv[2]) if sys.argv[2:] else THRESHOLD
+            report = duplicate_clusters(conn, threshold)
+            print(f"{report['clusters']} clusters, {report['redundant']} "
+                  f"redundant of {report['requirements']} requirements")
+            for group in report["groups"][:20]:
+                print(f"  keep {group['keep']}: {group['duplicates']}")
@@ -0,0 +1,312 @@
+# pegs_analysis.py
+"""
+Per-project PEGS completeness, maintained incrementally.
+
+Triggers on ``requirements`` keep running counts per (project,
+dimension, value) in ``pegs_project_counters``, the per-project
+counterpart of pegs_stats.py, so a project's scores are computed from a
+dozen counter rows however many requirements it has. Requirements
+without a project count toward DEFAULT_PROJECT.
+
+Scores are percentages. A category scores its share of
+SIS_PEGS_TARGET requirements (capped at 100); overall completeness is
+the mean of the four categories, so a project is complete once every
+category has reached the target. Snapshots of the scores go to the
+``pegs_analysis`` table every SIS_PEGS_SNAPSHOT_SECONDS, for projects
+whose scores changed since their last snapshot.
+
+Check, rebuild or snapshot from the shell with:
+
+    python pegs_analysis.py check
+    python pegs_analysis.py rebuild
+    python pegs_analysis.py snapshot
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+from db_pool import db
+
+CATEGORIES = ("Project", "Environment", "Goals", "System")
+DIMENSIONS = ("pegs_category", "priority", "status")
+DEFAULT_PROJECT = 1
+# Analysis settings (override through environment variables)
+TARGET = int(os.getenv("SIS_PEGS_TARGET", "10"))
+SNAPSHOT_SECONDS = float(os.getenv("SIS_PEGS_SNAPSHOT_SECONDS", "900"))
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS pegs_project_counters (
+        project_id INTEGER NOT NULL,
+        dimension TEXT NOT NULL,
+        value TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (project_id, dimension, value)
+    ) WITHOUT ROWID""",
+    # Same columns as the pegs_analysis table of requirements.db
+    """CREATE TABLE IF NOT EXISTS pegs_analysis (
+        id INTEGER PRIMARY KEY,
+        project_id INTEGER,
+        analysis_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+        project_score FLOAT,
+        environment_score FLOAT,
+        goals_score FLOAT,
+        system_score FLOAT,
+        overall_completeness FLOAT,
+        insights TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_pegs_analysis_project "
+    "ON pegs_analysis(project_id, id)",
+)
+
+SCORE_COLUMNS = ("project_score", "environment_score", "goals_score",
+                 "system_score", "overall_completeness")
+
+
+def _bump(ref: str, delta: int) -> str:
+    """Trigger statements adding ``delta`` for every dimension of ``ref``"""
+    project = f"COALESCE({ref}.project_id, {DEFAULT_PROJECT})"
+    rows = [("'total'", "''")] + [(f"'{d}'", f"COALESCE({ref}.{d}, '')")
+                                  for d in DIMENSIONS]
+    return "\n".join(
+        f"    INSERT INTO pegs_project_counters (project_id, dimension, "
+        f"value, count) VALUES ({project}, {dim}, {value}, {delta}) "
+        f"ON CONFLICT (project_id, dimension, value) "
+        f"DO UPDATE SET count = count + ({delta});"
+        for dim, value in rows)
+
+
+TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS trg_pegs_project_insert
+AFTER INSERT ON requirements
+BEGIN
+{_bump("NEW", 1)}
+END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_pegs_project_delete
+AFTER DELETE ON requirements
+BEGIN
+{_bump("OLD", -1)}
+END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_pegs_project_update
+AFTER UPDATE OF project_id, {", ".join(DIMENSIONS)} ON requirements
+BEGIN
+{_bump("OLD", -1)}
+{_bump("NEW", 1)}
+END""",
+)
+
+
+def ensure_analysis_tables(conn):
+    """Create the counters, triggers and snapshot table; backfill once"""
+    c = conn.cursor()
+    columns = {row[1] for row in c.execute("PRAGMA table_info(requirements)")}
+    if "project_id" not in columns:
+        # The ORM model (database_models.py) has it; older schemas do not
+        c.execute("ALTER TABLE requirements ADD COLUMN project_id INTEGER")
+    exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+        "AND name = 'pegs_project_counters'").fetchone()
+    for ddl in SCHEMA + TRIGGERS:
+        c.execute(ddl)
+    conn.commit()
+    if not exists:
+        rebuild(conn)
+
+
+def _actual(conn) -> dict:
+    """Counts computed from the requirements table itself"""
+    project = f"COALESCE(project_id, {DEFAULT_PROJECT})"
+    counts = {}
+    for dim in ("total",) + DIMENSIONS:
+        value = "''" if dim == "total" else f"COALESCE({dim}, '')"
+        for project_id, val, count in conn.execute(
+                f"SELECT {project}, {value}, COUNT(*) FROM requirements "
+                f"GROUP BY 1, 2"):
+            counts[(project_id, dim, val)] = count
+    return counts
+
+
+def _stored(conn) -> dict:
+    return {(p, dim, value): count for p, dim, value, count in conn.execute(
+        "SELECT project_id, dimension, value, count "
+        "FROM pegs_project_counters WHERE count != 0")}
+
+
+def check(conn) -> dict:
+    """Compare the counters with a full scan and list any drift"""
+    actual, stored = _actual(conn), _stored(conn)
+    drift = [{
+        "project_id": project_id,
+        "dimension": dim,
+        "value": value,
+        "stored": stored.get(key, 0),
+        "actual": actual.get(key, 0)
+    } for key in sorted(set(actual) | set(stored))
+        for project_id, dim, value in [key]
+        if stored.get(key, 0) != actual.get(key, 0)]
+    return {"consistent": not drift, "drift": drift}
+
+
+def rebuild(conn) -> dict:
+    """Recompute every project's counters from the requirements table"""
+    c = conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        c.execute("DELETE FROM pegs_project_counters")
+        c.executemany(
+            "INSERT INTO pegs_project_counters (project_id, dimension, "
+            "value, count) VALUES (?, ?, ?, ?)",
+            [key + (count,) for key, count in _actual(conn).items()])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {"projects": len(projects(conn))}
+
+
+def projects(conn) -> list:
+    return [row[0] for row in conn.execute(
+        "SELECT DISTINCT project_id FROM pegs_project_counters "
+        "WHERE dimension = 'total' AND count > 0 ORDER BY project_id")]
+
+
+def _insights(total: int, counts: dict, statuses: dict,
+              priorities: dict) -> list:
+    if not total:
+        return ["No requirements yet"]
+    insights = []
+    for category in CATEGORIES:
+        count = counts.get(category, 0)
+        if not count:
+            insights.append(f"No {category} requirements yet")
+        elif count < TARGET:
+            insights.append(f"{category}: {count} of {TARGET} expected "
+                            f"requirements")
+    top = max(CATEGORIES, key=lambda c: counts.get(c, 0))
+    if counts.get(top, 0) * 2 > total:
+        insights.append(f"{top} holds {counts[top] * 100 // total}% of the "
+                        f"requirements")
+    drafts = statuses.get("Draft", 0)
+    if drafts:
+        insights.append(f"{drafts} of {total} requirements are still Draft")
+    urgent = priorities.get("Critical", 0) + priorities.get("High", 0)
+    if urgent:
+        insights.append(f"{urgent} Critical or High priority requirements")
+    return insights
+
+
+def read_scores(conn, project_id: int = DEFAULT_PROJECT) -> dict:
+    """Current scores of one project, from its counter rows only"""
+    dims = {dim: {} for dim in ("total",) + DIMENSIONS}
+    for dim, value, count in conn.execute(
+            "SELECT dimension, value, count FROM pegs_project_counters "
+            "WHERE project_id = ? AND count > 0", (project_id,)):
+        dims[dim][value] = count
+    total = dims["total"].get("", 0)
+    counts = dims["pegs_category"]
+    scores = [round(min(100.0, counts.get(c, 0) * 100 / TARGET), 1)
+              for c in CATEGORIES]
+    return {
+        "project_id": project_id,
+        "total": total,
+        "by_category": {c: counts.get(c, 0) for c in CATEGORIES},
+        **dict(zip(SCORE_COLUMNS, scores + [round(sum(scores) / 4, 1)])),
+        "insights": _insights(total, counts, dims["status"],
+                              dims["priority"]),
+        "target": TARGET
+    }
+
+
+def latest_snapshot(conn, project_id: int):
+    row = conn.execute(
+        f"SELECT id, analysis_date, {', '.join(SCORE_COLUMNS)}, insights "
+        f"FROM pegs_analysis WHERE project_id = ? ORDER BY id DESC LIMIT 1",
+        (project_id,)).fetchone()
+    return None if row is None else _snapshot(project_id, row)
+
+
+def _snapshot(project_id, row) -> dict:
+    return {"id": row[0], "project_id": project_id, "analysis_date": row[1],
+            **dict(zip(SCORE_COLUMNS, row[2:7])),
+            "insights": json.loads(row[7] or "[]")}
+
+
+def history(conn, project_id: int, limit: int = 50) -> list:
+    return [_snapshot(project_id, row) for row in conn.execute(
+        f"SELECT id, analysis_date, {', '.join(SCORE_COLUMNS)}, insights "
+        f"FROM pegs_analysis WHERE project_id = ? ORDER BY id DESC LIMIT ?",
+        (project_id, limit))]
+
+
+def snapshot(conn, force: bool = False) -> int:
+    """Write a pegs_analysis row for every project whose scores changed"""
+    written = []
+    # Projects with history too, so emptying a project is recorded
+    tracked = set(projects(conn)) | {row[0] for row in conn.execute(
+        "SELECT DISTINCT project_id FROM pegs_analysis")}
+    for project_id in sorted(tracked):
+        scores = read_scores(conn, project_id)
+        last = latest_snapshot(conn, project_id)
+        if not force and last is not None and all(
+                last[c] == scores[c] for c in SCORE_COLUMNS) and \
+                last["insights"] == scores["insights"]:
+            continue
+        written.append((project_id, *(scores[c] for c in SCORE_COLUMNS),
+                        json.dumps(scores["insights"])))
+    if written:
+        conn.executemany(
+            f"INSERT INTO pegs_analysis (project_id, "
+            f"{', '.join(SCORE_COLUMNS)}, insights) "
+            f"VALUES (?, ?, ?, ?, ?, ?, ?)", written)
+        conn.commit()
+    return len(written)
+
+
+class SnapshotSchedule:
+    """Writes snapshots every ``seconds`` from app startup to shutdown"""
+
+    def __init__(self, seconds: float = SNAPSHOT_SECONDS, database=db):
+        self.seconds = seconds
+        self.database = database
+        self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                written = await self.database.write(snapshot)
+                if written:
+                    print(f"✅ PEGS analysis: {written} snapshots written")
+            except Exception as e:
+                print(f"PEGS analysis snapshot failed: {e}")
+            await asyncio.sleep(self.seconds)
+
+    async def start(self):
+        if self.seconds > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+snapshots = SnapshotSchedule()
+
+
+if __name__ == "__main__":
+    from db_pool import pool
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    with pool.connection() as conn:
+        ensure_analysis_tables(conn)
+        if command == "rebuild":
+            print(json.dumps(rebuild(conn), indent=2))
+        elif command == "snapshot":
+            print(f"{snapshot(conn, force=True)} snapshots written")
+        else:
+            print(json.dumps(check(conn), indent=2))
@@ -0,0 +1,196 @@
+# pegs_matcher.py
+"""Single-pass multi-keyword matching for PEGS classification"""
+
+import json
+import re
+
+import numpy as np
+
+# Below this many keywords, one C-level substring search per keyword beats
+# a single regex pass over the text (see benchmarks/bench_classifier.py)
+SCAN_THRESHOLD = 256
+
+
+def _trie_pattern(keywords, end: str) -> str:
+    """Regex alternation shaped like a trie over ``keywords``.
+
+    Shared prefixes are matched once, so the cost per text position
+    depends on keyword length rather than on how many keywords there
+    are. Longer keywords are tried before the shorter ones they extend.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        alternatives = [re.escape(ch) + build(child)
+                        for ch, child in sorted(node.items()) if ch]
+        if "" in node:
+            alternatives.append(end)
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return "(?:" + "|".join(alternatives) + ")"
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Finds every keyword of every category in one pass over the text.
+
+    ``table`` maps category -> keywords. By default a keyword matches
+    anywhere in the text (the same ``keyword in text`` test the old
+    classifiers used); with ``word_boundary=True`` it must start and end
+    on a word boundary, so "api" no longer matches inside "capital".
+    Substring tables smaller than ``SCAN_THRESHOLD`` are checked keyword
+    by keyword, which is faster at that size.
+    """
+
+    def __init__(self, table: dict, word_boundary: bool = False):
+        self.table = {category: [kw.lower() for kw in keywords]
+                      for category, keywords in table.items()}
+        self.categories = list(self.table)
+        self.word_boundary = word_boundary
+        self.keywords = sorted({kw for kws in self.table.values()
+                                for kw in kws if kw})
+
+        # keyword -> category index for every list entry it appears in
+        self._hits = {kw: [] for kw in self.keywords}
+        for index, keywords in enumerate(self.table.values()):
+            for kw in keywords:
+                if kw:
+                    self._hits[kw].append(index)
+
+        # The regex reports the longest keyword starting at a position;
+        # shorter keywords that are prefixes of it matched there too
+        keyword_set = set(self.keywords)
+        self._implied = {}
+        for kw in self.keywords:
+            self._implied[kw] = [
+                kw[:i] for i in range(1, len(kw) + 1)
+                if kw[:i] in keyword_set and
+                (i == len(kw) or not word_boundary or
+                 not re.match(r"\w", kw[i]))
+            ]
+
+        # Small substring tables are cheaper to check keyword by keyword
+        self._scan = (not word_boundary and
+                      len(self.keywords) < SCAN_THRESHOLD)
+
+        end = r"(?!\w)" if word_boundary else ""
+        start = r"\b" if word_boundary else ""
+        # keyword x category incidence, for turning term counts into
+        # category counts with one matrix product
+        self._keyword_index = {kw: i for i, kw in enumerate(self.keywords)}
+        self._incidence = np.zeros((len(self.keywords), len(self.categories)))
+        for kw, indices in self._hits.items():
+            for index in indices:
+                self._incidence[self._keyword_index[kw], index] += 1
+        self._sizes = np.array([len(kws) for kws in self.table.values()],
+                               dtype=float)
+
+        if self.keywords and not self._scan:
+            self._pattern = re.compile(
+                start + _trie_pattern(self.keywords, end))
+        else:
+            self._pattern = None
+
+    @classmethod
+    def from_json(cls, path: str, word_boundary: bool = False):
+        """Build from a JSON file of {"Category": ["keyword", ...]}"""
+        with open(path) as f:
+            return cls(json.load(f), word_boundary=word_boundary)
+
+    def find(self, text: str) -> set:
+        """Every keyword present in ``text``"""
+        if not text or not self.keywords:
+            return set()
+        text = text.lower()
+        if self._scan:
+            return {kw for kw in self.keywords if kw in text}
+
+        search = self._pattern.search
+        longest = set()
+        m = search(text)
+        while m:
+            longest.add(m.group())
+            # Resume one character in, not after the match, so keywords
+            # that overlap this one are still found
+            m = search(text, m.start() + 1)
+
+        found = set()
+        for kw in longest:
+            found.update(self._implied[kw])
+        return found
+
+    def counts(self, text: str) -> list:
+        """Keyword hits per category, in ``self.categories`` order"""
+        counts = [0] * len(self.categories)
+        for kw in self.find(text):
+            for index in self._hits[kw]:
+                counts[index] += 1
+        return counts
+
+    def first_match(self, text: str, default: str) -> str:
+        """First category (in table order) with any hit, else ``default``"""
+        for category, count in zip(self.categories, self.counts(text)):
+            if count:
+                return category
+        return default
+
+    def scores(self, text: str, default: str = "System") -> dict:
+        """Hit ratio per category, normalized to sum to 1"""
+        scores = {}
+        for (category, keywords), count in zip(self.table.items(),
+                                               self.counts(text)):
+            scores[category] = count / len(keywords) if keywords else 0
+
+        total = sum(scores.values())
+        if total > 0:
+            return {k: v / total for k, v in scores.items()}
+        return {default: 1.0}
+
+    def term_matrix(self, texts):
+        """Sparse doc x keyword hits as COO (rows, cols) index arrays"""
+        rows, cols = [], []
+        index = self._keyword_index
+        for doc, text in enumerate(texts):
+            hits = [index[kw] for kw in self.find(text)]
+            rows.extend([doc] * len(hits))
+            cols.extend(hits)
+        return np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)
+
+    def count_matrix(self, texts) -> np.ndarray:
+        """Keyword hits per category for every text (docs x categories)"""
+        texts = list(texts)
+        rows, cols = self.term_matrix(texts)
+        counts = np.zeros((len(texts), len(self.categories)))
+        # Sparse term matrix times the incidence matrix, without scipy
+        np.add.at(counts, rows, self._incidence[cols])
+        return counts
+
+    def score_matrix(self, texts, default: str = "System") -> np.ndarray:
+        """Vectorized ``scores``: docs x categories, rows summing to 1.
+
+        Texts with no hit put all their weight on ``default`` when it is
+        one of the categories, matching ``scores``.
+        """
+        counts = self.count_matrix(texts)
+        ratios = np.divide(counts, self._sizes, out=np.zeros_like(counts),
+                           where=self._sizes > 0)
+        totals = ratios.sum(axis=1, keepdims=True)
+        scores = np.divide(ratios, totals, out=np.zeros_like(ratios),
+                           where=totals > 0)
+        if default in self.categories:
+            scores[totals[:, 0] == 0, self.categories.index(default)] = 1.0
+        return scores
+
+    def first_match_batch(self, texts, default: str) -> list:
+        """Vectorized ``first_match`` over many texts"""
+        hit = self.count_matrix(texts) > 0
+        labels = np.array(self.categories + [default], dtype=object)
+        first = np.where(hit.any(axis=1), hit.argmax(axis=1),
+                         len(self.categories))
+        return labels[first].tolist()
@@ -0,0 +1,156 @@
+# pegs_stats.py
+"""
+Materialized requirement counters for /api/pegs/stats.
+
+Triggers on ``requirements`` keep one small row per (dimension, value)
+up to date, so stats are read from a handful of rows instead of
+scanning the table. Check or rebuild them from the shell with:
+
+    python pegs_stats.py check
+    python pegs_stats.py rebuild
+"""
+
+import sys
+
+from http_cache import bump_version
+
+DIMENSIONS = ("pegs_category", "priority", "status")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requirement_counters (
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, value)
+) WITHOUT ROWID
+"""
+
+
+def _bump(ref: str, delta: int) -> str:
+    """Trigger statements adding ``delta`` for every dimension of ``ref``"""
+    rows = [("'total'", "''")] + [(f"'{d}'", f"COALESCE({ref}.{d}, '')")
+                                  for d in DIMENSIONS]
+    return "\n".join(
+        f"    INSERT INTO requirement_counters (dimension, value, count) "
+        f"VALUES ({dim}, {value}, {delta}) "
+        f"ON CONFLICT (dimension, value) DO UPDATE SET count = count + ({delta});"
+        for dim, value in rows)
+
+
+TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS trg_requirement_counters_insert
+AFTER INSERT ON requirements
+BEGIN
+{_bump("NEW", 1)}
+END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_requirement_counters_delete
+AFTER DELETE ON requirements
+BEGIN
+{_bump("OLD", -1)}
+END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_requirement_counters_update
+AFTER UPDATE OF {", ".join(DIMENSIONS)} ON requirements
+BEGIN
+{_bump("OLD", -1)}
+{_bump("NEW", 1)}
+END""",
+)
+
+
+def ensure_counters(conn):
+    """Create the counters table and triggers, backfilling on first use"""
+    c = conn.cursor()
+    exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+        "AND name = 'requirement_counters'").fetchone()
+    c.execute(SCHEMA)
+    for ddl in TRIGGERS:
+        c.execute(ddl)
+    conn.commit()
+    if not exists:
+        rebuild(conn)
+
+
+def _actual(conn) -> dict:
+    """Counts computed from the requirements table itself"""
+    counts = {("total", ""): conn.execute(
+        "SELECT COUNT(*) FROM requirements").fetchone()[0]}
+    for dim in DIMENSIONS:
+        for value, count in conn.execute(
+                f"SELECT COALESCE({dim}, ''), COUNT(*) FROM requirements "
+                f"GROUP BY COALESCE({dim}, '')"):
+            counts[(dim, value)] = count
+    return counts
+
+
+def _stored(conn) -> dict:
+    return {(dim, value): count for dim, value, count in conn.execute(
+        "SELECT dimension, value, count FROM requirement_counters "
+        "WHERE count != 0")}
+
+
+def check(conn) -> dict:
+    """Compare the counters with a full scan and list any drift"""
+    actual, stored = _actual(conn), _stored(conn)
+    drift = [{
+        "dimension": dim,
+        "value": value,
+        "stored": stored.get((dim, value), 0),
+        "actual": actual.get((dim, value), 0)
+    } for dim, value in sorted(set(actual) | set(stored))
+             if stored.get((dim, value), 0) != actual.get((dim, value), 0)]
+    return {"consistent": not drift, "drift": drift}
+
+
+def rebuild(conn) -> dict:
+    """Recompute every counter from the requirements table"""
+    c = conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        c.execute("DELETE FROM requirement_counters")
+        c.executemany(
+            "INSERT INTO requirement_counters (dimension, value, count) "
+            "VALUES (?, ?, ?)",
+            [(dim, value, count)
+             for (dim, value), count in _actual(conn).items()])
+        # /api/pegs/stats responses are cached on the requirements version
+        bump_version(c)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return read_stats(conn)
+
+
+def read_stats(conn) -> dict:
+    """Stats in the /api/pegs/stats shape, read from the counters"""
+    stats = {"total": 0, "by_category": {}, "by_priority": {},
+             "by_status": {}}
+    keys = {"pegs_category": "by_category", "priority": "by_priority",
+            "status": "by_status"}
+    for dim, value, count in conn.execute(
+            "SELECT dimension, value, count FROM requirement_counters "
+            "WHERE count > 0"):
+        if dim == "total":
+            stats["total"] = count
+        elif value:
+            stats[keys[dim]][value] = count
+    return stats
+
+
+if __name__ == "__main__":
+    import json
+
+    from db_pool import pool
+
+    commands = {"check": check, "rebuild": rebuild}
+    if len(sys.argv) != 2 or sys.argv[1] not in commands:
+        print("usage: python pegs_stats.py check|rebuild")
+        sys.exit(2)
+
+    with pool.connection() as conn:
+        ensure_counters(conn)
+        result = commands[sys.argv[1]](conn)
+    print(json.dumps(result, indent=2))
+    if sys.argv[1] == "check" and not result["consistent"]:
+        sys.exit(1)
@@ -12,6 +12,9 @@ import sqlite3
 from datetime import datetime
 from typing import Optional
 
+# Async handlers run their SQLite work on the shared DB threads
+from db_pool import db
+
 # Initialize database
 def init_db():
     conn = sqlite3.connect('sis_requirements.db')
@@ -51,64 +54,64 @@ def add_enhanced_endpoints(app):
 
     @app.get("/api/db/status")
     async def db_status():
-        try:
-            conn = sqlite3.connect('sis_requirements.db')
+        def count(conn):
             c = conn.cursor()
             c.execute("SELECT COUNT(*) FROM requirements")
-            count = c.fetchone()[0]
-            conn.close()
-            return {"status": "connected", "requirements": count}
+            return c.fetchone()[0]
+
+        try:
+            return {"status": "connected", "requirements": await db.run(count)}
         except Exception as e:
             return {"status": "error", "error": str(e)}
 
     @app.post("/api/requirements/store")
     async def store_requirement(data: dict):
-        conn = sqlite3.connect('sis_requirements.db')
-        c = conn.cursor()
-
         category = classify_pegs(data.get("description", ""))
 
-        c.execute("""INSERT INTO requirements (title, description, pegs_category, priority) 
-                     VALUES (?, ?, ?, ?)""",
-                  (data.get("title", ""), data.get("description", ""), 
-                   category, data.get("priority", "Medium")))
-        conn.commit()
-        req_id = c.lastrowid
-        conn.close()
+        def insert(conn):
+            c = conn.cursor()
+            c.execute("""INSERT INTO requirements (title, description, pegs_category, priority) 
+                         VALUES (?, ?, ?, ?)""",
+                      (data.get("title", ""), data.get("description", ""), 
+                       category, data.get("priority", "Medium")))
+            conn.commit()
+            return c.lastrowid
+
+        req_id = await db.write(insert)
 
         return {"status": "success", "id": req_id, "category": category}
 
     @app.get("/api/requirements/list")
     async def list_requirements():
-        conn = sqlite3.connect('sis_requirements.db')
-        c = conn.cursor()
-        c.execute("SELECT * FROM requirements ORDER BY created_at DESC")
+        def fetch(conn):
+            c = conn.cursor()
+            c.execute("SELECT * FROM requirements ORDER BY created_at DESC")
+            return c.fetchall()
 
         requirements = []
-        for row in c.fetchall():
+        for row in await db.run(fetch):
             requirements.append({
                 "id": row[0], "title": row[1], "description": row[2],
                 "pegs_category": row[3], "priority": row[4], "status": row[5]
             })
-        conn.close()
 
         return {"count": len(requirements), "requirements": requirements}
 
     @app.get("/api/pegs/stats")
     async def pegs_stats():
-        conn = sqlite3.connect('sis_requirements.db')
-        c = conn.cursor()
+        def fetch(conn):
+            c = conn.cursor()
+            c.execute("SELECT COUNT(*) FROM requirements")
+            total = c.fetchone()[0]
+            c.execute("SELECT pegs_category, COUNT(*) FROM requirements GROUP BY pegs_category")
+            return total, c.fetchall()
 
         stats = {"total": 0, "by_category": {}}
 
-        c.execute("SELECT COUNT(*) FROM requirements")
-        stats["total"] = c.fetchone()[0]
-
-        c.execute("SELECT pegs_category, COUNT(*) FROM requirements GROUP BY pegs_category")
-        for row in c.fetchall():
+        stats["total"], rows = await db.run(fetch)
+        for row in rows:
             stats["by_category"][row[0] if row[0] else "Uncategorized"] = row[1]
 
-        conn.close()
         return stats
 
     print("✅ Enhanced endpoints added!")
@@ -123,4 +126,4 @@ print("✅ Created enhanced_features.py successfully!")
 print("\nNow you can:")
 print("1. Add to app.py: from enhanced_features import add_enhanced_endpoints")
 print("2. After app = FastAPI(), add: add_enhanced_endpoints(app)")
-print("3. Save and run!"
\ No newline at end of file
+print("3. Save and run!")
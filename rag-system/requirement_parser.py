@@ -0,0 +1,205 @@
+# requirement_parser.py
+"""
+Incremental parser for LLM answers that list requirements.
+
+Text is fed in as it arrives from a provider stream and each requirement
+is returned as soon as it is complete, so it can be shown (or stored)
+before the model has finished answering. Two answer shapes are handled:
+
+  JSON   a list (or stream) of objects, optionally inside a ``` fence,
+         or an object wrapping such lists ({"requirements": [...]});
+         an object is complete when its closing brace arrives
+  lines  bulleted, numbered or "... shall ..." lines; a line is complete
+         at its newline (the last one when the stream closes)
+
+An answer is read as lines until a line opens a ``` fence or starts
+with "[" or "{", so a prose preamble ("Here are the requirements:")
+before the JSON is skipped. JSON that yields no requirement (a fenced
+bullet list, say) is read as lines when the stream closes.
+"""
+
+import json
+import re
+
+PRIORITIES = ("Critical", "High", "Medium", "Low")
+CATEGORIES = ("Project", "Environment", "Goals", "System")
+
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)]|[A-Za-z][.)])\s+")
+_HEADING = re.compile(r"^\s*\**\s*([^:*]{3,80}?)\s*\**\s*:\s+(.+)$")
+_SHALL = re.compile(r"\b(shall|must|should)\b", re.IGNORECASE)
+_OPENERS = {"]": "[", "}": "{"}
+
+
+def _pick(value, allowed, default):
+    """Case-insensitive match of ``value`` against ``allowed``"""
+    for option in allowed:
+        if str(value or "").strip().lower() == option.lower():
+            return option
+    return default
+
+
+class RequirementParser:
+    """Feed text with ``feed()``, then call ``close()`` once at the end.
+
+    Both return the requirements completed by that text, normalized to
+    title, description, pegs_category, priority and confidence.
+    ``classify`` (text -> PEGS category) fills in missing categories.
+    """
+
+    def __init__(self, classify=None):
+        self.classify = classify
+        self.mode = None  # "lines" once text arrives, "json" after a switch
+        self.count = 0
+        self._buffer = ""
+        # Text since JSON mode began, kept until an object is found
+        self._json_text = None
+        # JSON scanner state: open containers as [char, start, emitted]
+        self._stack = []
+        self._in_string = False
+        self._escaped = False
+        self._pos = 0
+
+    def feed(self, text: str) -> list:
+        self._buffer += text
+        if self.mode is None:
+            if not self._buffer.strip():
+                return []
+            self.mode = "lines"
+        if self.mode == "json":
+            if self._json_text is not None:
+                self._json_text += text
+            return self._scan_json()
+        return self._scan_lines(final=False)
+
+    def close(self) -> list:
+        if self.mode == "lines":
+            return self._scan_lines(final=True)
+        if self.mode == "json" and self._json_text is not None:
+            # No object came out of it; read the same text as lines
+            self.mode, self._buffer = "lines", self._json_text
+            return self._scan_lines(final=True, switch=False)
+        return []
+
+    @staticmethod
+    def _opens_json(line: str) -> bool:
+        head = line.lstrip()
+        return head[:1] in ("[", "{") or head.startswith("```")
+
+    def _to_json(self, text: str) -> list:
+        self.mode = "json"
+        self._buffer = self._json_text = text
+        self._stack, self._pos = [], 0
+        self._in_string = self._escaped = False
+        return self._scan_json()
+
+    def _scan_json(self) -> list:
+        found = []
+        buffer = self._buffer
+        stack = self._stack
+        for pos in range(self._pos, len(buffer)):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "[{":
+                stack.append([char, pos, False])
+            elif stack and stack[-1][0] == _OPENERS.get(char):
+                _, start, emitted = stack.pop()
+                if char == "}" and self._candidate(stack):
+                    item = self._item(buffer[start:pos + 1])
+                    # A wrapper whose listed objects came out is done
+                    if item is not None and not emitted:
+                        found.append(self._normalize(item))
+                        self._json_text = None
+                        for entry in stack:
+                            entry[2] = True
+        # Keep only unfinished objects; everything before them is done
+        objects = [entry[1] for entry in stack if entry[0] == "{"]
+        keep = objects[0] if objects else len(buffer)
+        for entry in stack:
+            entry[1] -= keep
+        self._buffer = buffer[keep:]
+        self._pos = len(self._buffer)
+        return found
+
+    @staticmethod
+    def _candidate(stack) -> bool:
+        """Whether an object closing inside ``stack`` can be a requirement:
+        at the top level, in a list, or in a list inside one object"""
+        objects = sum(entry[0] == "{" for entry in stack)
+        return objects == 0 or (objects == 1 and stack[-1][0] == "[")
+
+    @staticmethod
+    def _item(text: str):
+        try:
+            item = json.loads(text)
+        except ValueError:
+            return None
+        if isinstance(item, dict) and (item.get("description") or
+                                       item.get("title")):
+            return item
+        return None
+
+    def _scan_lines(self, final: bool, switch: bool = True) -> list:
+        lines = self._buffer.split("\n")
+        pending = "" if final else lines.pop()
+        self._buffer = pending
+        if switch:
+            # The unfinished line counts too: "[" can start a JSON answer
+            for index, line in enumerate(lines + [pending]):
+                if self._opens_json(line):
+                    rest = "\n".join(lines[index:] + [pending])
+                    return (self._scan_lines_of(lines[:index]) +
+                            self._to_json(rest))
+        return self._scan_lines_of(lines)
+
+    def _scan_lines_of(self, lines) -> list:
+        found = []
+        for line in lines:
+            if not line.strip() or line.strip().startswith("```"):
+                continue
+            bulleted = _BULLET.match(line)
+            if not bulleted and not _SHALL.search(line):
+                continue
+            text = line[bulleted.end():] if bulleted else line.strip()
+            text = text.strip().strip("*").strip()
+            if not text:
+                continue
+            heading = _HEADING.match(text)
+            if heading:
+                found.append(self._normalize({"title": heading.group(1),
+                                              "description": heading.group(2)}))
+            else:
+                found.append(self._normalize({"description": text}))
+        return found
+
+    def _normalize(self, item: dict) -> dict:
+        description = str(item.get("description") or item.get("title"))
+        title = str(item.get("title") or description[:60])
+        category = _pick(item.get("pegs_category") or item.get("category"),
+                         CATEGORIES, None)
+        if category is None:
+            category = (self.classify(f"{title} {description}")
+                        if self.classify else "System")
+        self.count += 1
+        try:
+            confidence = float(item.get("confidence", 0.8))
+        except (TypeError, ValueError):
+            confidence = 0.8
+        return {"title": title.strip(),
+                "description": description.strip(),
+                "pegs_category": category,
+                "priority": _pick(item.get("priority"), PRIORITIES, "Medium"),
+                "confidence": confidence}
+
+
+def parse_requirements(text: str, classify=None) -> list:
+    """Every requirement in a complete answer"""
+    parser = RequirementParser(classify)
+    return parser.feed(text) + parser.close()
@@ -0,0 +1,156 @@
+# requirements_list.py
+"""Keyset pagination and streaming for /api/requirements/list"""
+
+import base64
+import json
+
+from db_pool import pool
+from fast_json import dumps, join_objects, json_object_sql
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+FETCH_SIZE = 500
+
+COLUMNS = ("id", "title", "description", "pegs_category", "priority",
+           "status", "created_at")
+# Encoded rows are (id, created_at, JSON object of COLUMNS): SQLite
+# writes the JSON, Python only joins it
+ENCODED = f"id, created_at, {json_object_sql(COLUMNS)}"
+FILTERS = ("pegs_category", "priority", "status")
+ORDER_KEYS = ("id", "created_at")
+
+# Each filter is backed by an (filter, id) index so "WHERE x = ? AND
+# id > ? ORDER BY id" is a range scan; created_at ordering has its own
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_requirements_category_id ON requirements (pegs_category, id)",
+    "CREATE INDEX IF NOT EXISTS idx_requirements_priority_id ON requirements (priority, id)",
+    "CREATE INDEX IF NOT EXISTS idx_requirements_status_id ON requirements (status, id)",
+    "CREATE INDEX IF NOT EXISTS idx_requirements_created_id ON requirements (created_at, id)",
+)
+
+
+class ListQueryError(ValueError):
+    """Raised for an invalid cursor, order key or limit"""
+
+
+def encode_cursor(order_by: str, descending: bool, row) -> str:
+    """Opaque cursor pointing just past an encoded ``row``"""
+    key = [row[1], row[0]] if order_by == "created_at" else [row[0]]
+    payload = {"o": order_by, "d": descending, "k": key}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order_by: str, descending: bool) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        key = payload["k"]
+    except (ValueError, KeyError, TypeError):
+        raise ListQueryError("malformed cursor")
+    if payload.get("o") != order_by or payload.get("d") != descending:
+        raise ListQueryError("cursor was issued for a different ordering")
+    return key
+
+
+def build_query(order_by: str = "id", descending: bool = False,
+                cursor: str = None, filters: dict = None,
+                limit: int = None, encoded: bool = False):
+    """Return (sql, params) for one keyset page (see ENCODED)"""
+    if order_by not in ORDER_KEYS:
+        raise ListQueryError(f"order_by must be one of {ORDER_KEYS}")
+
+    where, params = [], []
+    for name, value in (filters or {}).items():
+        if name in FILTERS and value is not None:
+            where.append(f"{name} = ?")
+            params.append(value)
+
+    op = "<" if descending else ">"
+    if cursor:
+        key = decode_cursor(cursor, order_by, descending)
+        if order_by == "created_at":
+            # Row-value comparison keeps ties on created_at stable by id
+            where.append(f"(created_at, id) {op} (?, ?)")
+        else:
+            where.append(f"id {op} ?")
+        params.extend(key)
+
+    direction = "DESC" if descending else "ASC"
+    order = (f"created_at {direction}, id {direction}"
+             if order_by == "created_at" else f"id {direction}")
+    select = ENCODED if encoded else ", ".join(COLUMNS)
+    sql = f"SELECT {select} FROM requirements"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {order}"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return sql, params
+
+
+def clamp_limit(limit: int) -> int:
+    if limit is None:
+        return DEFAULT_LIMIT
+    if limit < 1:
+        raise ListQueryError("limit must be positive")
+    return min(limit, MAX_LIMIT)
+
+
+def fetch_page_json(conn, order_by, descending, cursor, filters,
+                    limit) -> bytes:
+    """One page plus the cursor for the next one (None on the last page),
+    as a JSON body built from SQLite's JSON"""
+    # Ask for one extra row to learn whether another page exists
+    sql, params = build_query(order_by, descending, cursor, filters,
+                              limit + 1, encoded=True)
+    rows = conn.execute(sql, params).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(order_by, descending, rows[-1])
+    return (b'{"count":%d,"requirements":' % len(rows) +
+            join_objects(row[2] for row in rows) +
+            b',"next_cursor":' + dumps(next_cursor) + b"}")
+
+
+def stream_rows(fmt, order_by, descending, cursor, filters, limit=None):
+    """Encode rows page by page (NDJSON or one JSON body).
+
+    Without a limit the stream runs to the end of the result set. Every
+    FETCH_SIZE rows is a keyset query of its own, so a pooled connection
+    is borrowed only while a page is read, never while a slow client
+    takes it; rows written meanwhile ahead of the stream show up in it.
+    """
+    count, last = 0, None
+    if fmt == "json":
+        yield b'{"requirements":['
+    while limit is None or count < limit:
+        size = FETCH_SIZE if limit is None else min(FETCH_SIZE, limit - count)
+        sql, params = build_query(order_by, descending, cursor, filters,
+                                  size, encoded=True)
+        with pool.connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        if not rows:
+            break
+        encoded = [row[2] for row in rows]
+        if fmt == "json":
+            yield (b"," if count else b"") + ",".join(encoded).encode()
+        else:
+            yield ("\n".join(encoded) + "\n").encode()
+        count += len(rows)
+        last = rows[-1]
+        if len(rows) < size:
+            break
+        cursor = encode_cursor(order_by, descending, last)
+
+    # A limited stream can be resumed where it stopped
+    next_cursor = None
+    if limit is not None and count == limit and last is not None:
+        next_cursor = encode_cursor(order_by, descending, last)
+    if fmt == "json":
+        yield (f'],"count":{count},"next_cursor":'
+               f'{json.dumps(next_cursor)}}}').encode()
+    elif next_cursor:
+        yield (json.dumps({"next_cursor": next_cursor}) + "\n").encode()
@@ -0,0 +1,178 @@
+# requirements_search.py
+"""Full-text search over requirements with SQLite FTS5"""
+
+import html
+import re
+import sqlite3
+
+MAX_LIMIT = 100
+HIGHLIGHT = ("<mark>", "</mark>")
+# SQLite marks matches with these private-use characters; the text is
+# HTML-escaped before they become HIGHLIGHT, so only the marks are markup
+MATCH_MARKS = ("\ue000", "\ue001")
+# OperationalErrors caused by the query text rather than the database
+QUERY_ERRORS = ("fts5: syntax error", "no such column")
+
+# External-content FTS table: the text lives in requirements, the index
+# is kept in sync by the triggers below
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS requirements_fts USING fts5(
+    title, description,
+    content='requirements', content_rowid='id',
+    tokenize='porter unicode61'
+)
+"""
+
+TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS trg_requirements_fts_insert
+AFTER INSERT ON requirements
+BEGIN
+    INSERT INTO requirements_fts (rowid, title, description)
+    VALUES (NEW.id, NEW.title, NEW.description);
+END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_requirements_fts_delete
+AFTER DELETE ON requirements
+BEGIN
+    INSERT INTO requirements_fts (requirements_fts, rowid, title, description)
+    VALUES ('delete', OLD.id, OLD.title, OLD.description);
+END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_requirements_fts_update
+AFTER UPDATE OF title, description ON requirements
+BEGIN
+    INSERT INTO requirements_fts (requirements_fts, rowid, title, description)
+    VALUES ('delete', OLD.id, OLD.title, OLD.description);
+    INSERT INTO requirements_fts (rowid, title, description)
+    VALUES (NEW.id, NEW.title, NEW.description);
+END""",
+)
+
+# Title hits weigh twice as much as description hits
+SEARCH_SQL = """
+SELECT r.id, r.title, r.description, r.pegs_category, r.priority, r.status,
+       bm25(requirements_fts, 2.0, 1.0) AS rank,
+       highlight(requirements_fts, 0, ?, ?),
+       snippet(requirements_fts, 1, ?, ?, '…', 24)
+FROM requirements_fts
+JOIN requirements r ON r.id = requirements_fts.rowid
+WHERE requirements_fts MATCH ? {category}
+ORDER BY rank
+LIMIT ? OFFSET ?
+"""
+
+# Ids and scores only, for rank fusion in retrieval.py
+RANK_SQL = """
+SELECT rowid, bm25(requirements_fts, 2.0, 1.0) AS rank
+FROM requirements_fts
+WHERE requirements_fts MATCH ?
+ORDER BY rank
+LIMIT ?
+"""
+
+
+class SearchUnavailable(Exception):
+    """Raised when this SQLite build has no FTS5"""
+
+
+class SearchQueryError(ValueError):
+    """Raised for a query with nothing searchable in it"""
+
+
+def ensure_fts(conn) -> bool:
+    """Create the FTS table and triggers; False if FTS5 is missing"""
+    c = conn.cursor()
+    exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'requirements_fts'"
+    ).fetchone()
+    try:
+        c.execute(SCHEMA)
+    except sqlite3.OperationalError as e:
+        if "fts5" in str(e):
+            print("⚠️ SQLite has no FTS5; /api/requirements/search disabled")
+            return False
+        raise
+    for ddl in TRIGGERS:
+        c.execute(ddl)
+    if not exists:
+        # Index rows stored before the FTS table existed
+        c.execute("INSERT INTO requirements_fts (requirements_fts) "
+                  "VALUES ('rebuild')")
+    conn.commit()
+    return True
+
+
+def to_match_query(text: str, match: str = "all") -> str:
+    """Turn free text into a safe FTS5 query of quoted terms.
+
+    A trailing ``*`` on a word keeps prefix matching; every other FTS5
+    operator character is dropped so user input cannot break the query.
+    """
+    terms = [f'"{word}"{"*" if star else ""}'
+             for word, star in re.findall(r"(\w+)(\*?)", text or "")]
+    if not terms:
+        raise SearchQueryError("query has no searchable words")
+    return (" OR " if match == "any" else " ").join(terms)
+
+
+def _execute(conn, sql: str, params) -> list:
+    try:
+        return conn.execute(sql, params).fetchall()
+    except sqlite3.OperationalError as e:
+        if "no such table" in str(e):
+            raise SearchUnavailable(str(e))
+        if any(error in str(e) for error in QUERY_ERRORS):
+            raise SearchQueryError(str(e))
+        # Locked or failing database: a server error, not the client's
+        raise
+
+
+def to_html(marked) -> str:
+    """Escape highlighted text for HTML, then turn the marks into tags"""
+    if marked is None:
+        return None
+    escaped = html.escape(marked)
+    for mark, tag in zip(MATCH_MARKS, HIGHLIGHT):
+        escaped = escaped.replace(mark, tag)
+    return escaped
+
+
+def search(conn, query: str, limit: int = 20, offset: int = 0,
+           match: str = "all", pegs_category: str = None) -> dict:
+    """BM25-ranked, highlighted hits for one page of results"""
+    if limit < 1 or offset < 0:
+        raise SearchQueryError("limit must be positive and offset >= 0")
+    limit = min(limit, MAX_LIMIT)
+    fts_query = to_match_query(query, match)
+
+    sql = SEARCH_SQL.format(
+        category="AND r.pegs_category = ?" if pegs_category else "")
+    params = [*MATCH_MARKS, *MATCH_MARKS, fts_query]
+    if pegs_category:
+        params.append(pegs_category)
+    # One extra row tells us whether there is a next page
+    params += [limit + 1, offset]
+
+    rows = _execute(conn, sql, params)
+
+    hits = [{
+        "id": row[0],
+        "title": row[1],
+        "description": row[2],
+        "pegs_category": row[3],
+        "priority": row[4],
+        "status": row[5],
+        "score": round(-row[6], 6),
+        "title_highlight": to_html(row[7]),
+        "snippet": to_html(row[8])
+    } for row in rows[:limit]]
+    return {
+        "query": query,
+        "count": len(hits),
+        "results": hits,
+        "next_offset": offset + limit if len(rows) > limit else None
+    }
+
+
+def rank_ids(conn, query: str, limit: int = 50, match: str = "any") -> list:
+    """(id, score) of the best BM25 matches, without highlighting"""
+    rows = _execute(conn, RANK_SQL, (to_match_query(query, match), limit))
+    return [(row_id, -rank) for row_id, rank in rows]
@@ -0,0 +1,298 @@
+# retrieval.py
+"""Context retrieval for the RAG path (requirements and documents)"""
+
+import asyncio
+import os
+import sqlite3
+import time
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from ann_index import ANN_INDEX, IVFIndex
+from db_pool import DB_PATH, db
+from requirements_search import SearchQueryError, SearchUnavailable, rank_ids
+from vector_index import (KIND_CHUNK, KIND_DOCUMENT, KIND_REQUIREMENT,
+                          VectorIndex, get_embedder, key_name, make_key,
+                          split_key)
+from vector_store import VECTOR_DIR, VectorStore
+
+TOP_K = int(os.getenv("SIS_RETRIEVAL_TOP_K", "5"))
+BUILD_BATCH = 2000
+
+# Hybrid retrieval: the whole call (search stages plus passage lookup)
+# must fit in SIS_RETRIEVAL_BUDGET_MS; the concurrent lexical and vector
+# stages get STAGE_SHARE of it
+RETRIEVAL_BUDGET_MS = int(os.getenv("SIS_RETRIEVAL_BUDGET_MS", "250"))
+STAGE_SHARE = 0.7
+CANDIDATES = 50
+RRF_K = 60
+
+# Fused score multiplier for passages in the requested PEGS category
+PEGS_BOOST = float(os.getenv("SIS_RETRIEVAL_PEGS_BOOST", "1.5"))
+
+
+def requirement_text(title, description) -> str:
+    return f"{title or ''}\n{description or ''}".strip()
+
+
+def _table_exists(conn, name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (name,)).fetchone() is not None
+
+
+def open_index(embedder):
+    """Persistent store in SIS_VECTOR_DIR (in memory if it is empty),
+    searched through an IVF index unless SIS_ANN_INDEX=exact"""
+    if VECTOR_DIR:
+        index = VectorStore(VECTOR_DIR, embedder.dim, embedder.name,
+                            source=os.path.abspath(DB_PATH))
+    else:
+        index = VectorIndex(embedder.dim)
+    if ANN_INDEX == "ivf":
+        index = IVFIndex(index)
+    return index
+
+
+class Retriever:
+    """Embeds requirements and documents and finds the top-k passages"""
+
+    def __init__(self, embedder=None, index=None):
+        self.embedder = embedder or get_embedder()
+        self.index = index if index is not None else open_index(self.embedder)
+
+    def add(self, kind: int, items):
+        """Index (row_id, text) pairs of one kind in a single batch"""
+        items = [(row_id, text) for row_id, text in items if text]
+        if not items:
+            return
+        vectors = self.embedder.embed(text for _, text in items)
+        self.index.add([make_key(kind, row_id) for row_id, _ in items],
+                       vectors)
+
+    def remove(self, kind: int, row_ids):
+        self.index.remove(make_key(kind, row_id) for row_id in row_ids)
+
+    def add_requirements(self, rows):
+        """Index (id, title, description) rows"""
+        self.add(KIND_REQUIREMENT,
+                 [(row_id, requirement_text(title, description))
+                  for row_id, title, description in rows])
+
+    def add_chunks(self, rows):
+        """Index (chunk id, filename, text) document chunks"""
+        self.add(KIND_CHUNK, [(row_id, requirement_text(filename, text))
+                              for row_id, filename, text in rows])
+
+    def build(self, conn):
+        """Embed stored requirements and documents the index lacks.
+
+        Per kind, the row count and highest id in the database are
+        checked against the index's count and watermark. When rows were
+        only added since the last start, just those above the watermark
+        are read, so a warm start does not grow with the corpus. If the
+        counts still differ (an append or remove lost after the database
+        commit), the id sets are compared: missing rows are embedded and
+        deleted ones dropped.
+        """
+        self._reconcile(conn, KIND_REQUIREMENT, "FROM requirements",
+                        "id", "title, description")
+        if _table_exists(conn, "documents"):
+            # Chunked uploads have no content; their chunks are indexed
+            self._reconcile(conn, KIND_DOCUMENT, "FROM documents",
+                            "id", "filename, content",
+                            "content IS NOT NULL")
+        if _table_exists(conn, "document_chunks"):
+            self._reconcile(conn, KIND_CHUNK,
+                            "FROM document_chunks c "
+                            "JOIN documents d ON d.id = c.document_id",
+                            "c.id", "d.filename, c.text")
+        return len(self.index)
+
+    def _reconcile(self, conn, kind, source, id_column, text_columns,
+                   condition=None):
+        def select(columns, *where):
+            where = [w for w in (condition, *where) if w]
+            return (f"SELECT {columns} {source}" +
+                    (" WHERE " + " AND ".join(where) if where else ""))
+
+        def add_rows(sql, params):
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(BUILD_BATCH)
+                if not rows:
+                    break
+                self.add(kind, [(row_id, requirement_text(name, body))
+                                for row_id, name, body in rows])
+
+        stored, top = conn.execute(
+            select(f"COUNT(*), MAX({id_column})")).fetchone()
+        mark = self.index.watermark(kind)
+        if stored == self.index.count(kind) and (top or 0) <= mark:
+            return
+        add_rows(select(f"{id_column}, {text_columns}", f"{id_column} > ?") +
+                 f" ORDER BY {id_column}", (mark,))
+        if stored == self.index.count(kind):
+            return
+
+        rows = conn.execute(select(id_column))
+        stored = np.fromiter((row_id for row_id, in rows), dtype=np.int64)
+        held = self.index.ids(kind)
+        stale = np.setdiff1d(held, stored, assume_unique=True)
+        if len(stale):
+            self.remove(kind, stale.tolist())
+        missing = np.setdiff1d(stored, held, assume_unique=True).tolist()
+        for start in range(0, len(missing), BUILD_BATCH):
+            batch = missing[start:start + BUILD_BATCH]
+            marks = ",".join("?" * len(batch))
+            add_rows(select(f"{id_column}, {text_columns}",
+                            f"{id_column} IN ({marks})"), batch)
+
+    def _passages(self, conn, keys) -> dict:
+        """(text, PEGS category) for each key, looked up by kind"""
+        ids = {}
+        for key in keys:
+            kind, row_id = split_key(key)
+            ids.setdefault(kind, []).append(row_id)
+
+        passages = {}
+        queries = {
+            KIND_REQUIREMENT: "SELECT id, title, description, pegs_category "
+                              "FROM requirements WHERE id",
+            KIND_DOCUMENT: "SELECT id, filename, content, NULL FROM documents "
+                           "WHERE id",
+            KIND_CHUNK: "SELECT c.id, d.filename, c.text, c.pegs_category "
+                        "FROM document_chunks c "
+                        "JOIN documents d ON d.id = c.document_id WHERE c.id",
+        }
+        for kind, row_ids in ids.items():
+            if kind not in queries:
+                continue
+            marks = ",".join("?" * len(row_ids))
+            for row_id, name, body, category in conn.execute(
+                    f"{queries[kind]} IN ({marks})", row_ids):
+                passages[make_key(kind, row_id)] = (
+                    requirement_text(name, body), category)
+        return passages
+
+    def retrieve_many(self, conn, queries, k: int = TOP_K) -> list:
+        """Top-k passages for each query, embedded and searched as a batch"""
+        queries = list(queries)
+        if not queries:
+            return []
+        results = self.index.search(self.embedder.embed(queries), k)
+        passages = self._passages(conn, {key for keys, _ in results
+                                         for key in keys})
+        return [[{
+            "source": key_name(key),
+            "score": round(score, 4),
+            "text": passages[key][0]
+        } for key, score in zip(keys, scores) if key in passages]
+                for keys, scores in results]
+
+    def retrieve(self, conn, query: str, k: int = TOP_K) -> list:
+        return self.retrieve_many(conn, [query], k)[0]
+
+    def vector_keys(self, query: str, k: int = CANDIDATES) -> list:
+        """Index keys of the nearest stored passages, best first"""
+        keys, _ = self.index.search(self.embedder.embed([query]), k)[0]
+        return keys
+
+    async def hybrid(self, query: str, k: int = TOP_K,
+                     pegs_category: str = None,
+                     budget_ms: int = RETRIEVAL_BUDGET_MS) -> dict:
+        """Top-k passages from BM25 and vector search fused with RRF.
+
+        Both searches run concurrently; a stage that misses its deadline
+        is dropped from the fusion rather than delaying the answer.
+        Passages in ``pegs_category`` get their fused score multiplied by
+        ``PEGS_BOOST``. Timings per stage are returned with the passages.
+        """
+        started = time.perf_counter()
+        deadline = started + budget_ms / 1000
+        timings = {}
+
+        async def stage(name, call, timeout):
+            t0 = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(call(), max(timeout, 0))
+                status = "ok"
+            except asyncio.TimeoutError:
+                result, status = None, "timeout"
+            except (SearchQueryError, SearchUnavailable):
+                result, status = None, "skipped"
+            except sqlite3.OperationalError:
+                result, status = None, "error"
+            timings[name] = {
+                "ms": round((time.perf_counter() - t0) * 1000, 2),
+                "status": status,
+                "hits": len(result) if result is not None else 0
+            }
+            return result or []
+
+        stage_timeout = budget_ms * STAGE_SHARE / 1000
+        lexical, vector = await asyncio.gather(
+            stage("lexical",
+                  lambda: db.run(rank_ids, query, CANDIDATES), stage_timeout),
+            stage("vector",
+                  lambda: run_in_threadpool(self.vector_keys, query,
+                                            CANDIDATES), stage_timeout))
+
+        fused = rrf_fuse({
+            "lexical": [make_key(KIND_REQUIREMENT, row_id)
+                        for row_id, _ in lexical],
+            "vector": vector
+        })
+        passages = await stage(
+            "fetch", lambda: db.run(self._passages, list(fused)),
+            deadline - time.perf_counter())
+
+        results = []
+        for key, (score, ranks) in fused.items():
+            if key not in passages:
+                continue
+            text, category = passages[key]
+            if pegs_category and category == pegs_category:
+                score *= PEGS_BOOST
+            results.append({
+                "source": key_name(key),
+                "score": round(score, 6),
+                "text": text,
+                "pegs_category": category,
+                "ranks": ranks
+            })
+        results.sort(key=lambda p: -p["score"])
+
+        timings["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        timings["budget_ms"] = budget_ms
+        return {"passages": results[:k], "timings": timings}
+
+
+def rrf_fuse(rankings: dict, k: int = RRF_K) -> dict:
+    """Reciprocal-rank fusion of ranked key lists.
+
+    Returns key -> (sum of 1 / (k + rank), {ranking name: rank}), best
+    first; ranks start at 1.
+    """
+    fused = {}
+    for name, keys in rankings.items():
+        for rank, key in enumerate(keys, 1):
+            score, ranks = fused.get(key, (0.0, {}))
+            ranks[name] = rank
+            fused[key] = (score + 1 / (k + rank), ranks)
+    return dict(sorted(fused.items(), key=lambda item: -item[1][0]))
+
+
+def build_prompt(prompt: str, passages: list) -> str:
+    """Prompt with the retrieved passages attached as numbered context"""
+    if not passages:
+        return prompt
+    context = "\n\n".join(f"[{i}] ({p['source']}) {p['text']}"
+                          for i, p in enumerate(passages, 1))
+    return (f"Use the following project context where relevant.\n\n"
+            f"{context}\n\nRequest: {prompt}")
+
+
+# Shared retriever; built from the database at app startup
+retriever = Retriever()
@@ -14,6 +14,8 @@ import sqlite3
 from datetime import datetime
 from typing import Optional
 
+from db_pool import db
+
 def init_database():
     conn = sqlite3.connect('sis_requirements.db')
     c = conn.cursor()
@@ -77,19 +79,19 @@ def add_enhanced_endpoints(app):
 
     @app.post("/api/requirements/store")
     async def store_requirement(data: dict):
-        conn = sqlite3.connect('sis_requirements.db')
-        c = conn.cursor()
-
         category = classify_pegs(data.get("description", ""))
 
-        c.execute("""INSERT INTO requirements (title, description, pegs_category, priority)
-                     VALUES (?, ?, ?, ?)""",
-                  (data.get("title"), data.get("description"), 
-                   category, data.get("priority", "Medium")))
-
-        conn.commit()
-        req_id = c.lastrowid
-        conn.close()
+        def insert(conn):
+            c = conn.cursor()
+            c.execute("""INSERT INTO requirements (title, description, pegs_category, priority)
+                         VALUES (?, ?, ?, ?)""",
+                      (data.get("title"), data.get("description"), 
+                       category, data.get("priority", "Medium")))
+            conn.commit()
+            return c.lastrowid
+
+        # Runs on the shared DB threads instead of blocking the event loop
+        req_id = await db.write(insert)
 
         return {"status": "stored", "id": req_id, "category": category}
 
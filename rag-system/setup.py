@@ -144,6 +144,24 @@ class Document(Base):
     uploaded_at = Column(DateTime, default=func.now())
 
     project = relationship("Project", back_populates="documents")
+    chunks = relationship("DocumentChunk", back_populates="document",
+                          order_by="DocumentChunk.ordinal")
+
+class DocumentChunk(Base):
+    """One overlapping text window of an uploaded document (see document_ingest.py)"""
+    __tablename__ = "document_chunks"
+
+    id = Column(Integer, primary_key=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
+    ordinal = Column(Integer, nullable=False)
+    # Page for PDFs, paragraph for DOCX, line for text files
+    location_start = Column(Integer)
+    location_end = Column(Integer)
+    text = Column(Text, nullable=False)
+    pegs_category = Column(String)
+    created_at = Column(DateTime, default=func.now())
+
+    document = relationship("Document", back_populates="chunks")
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
@@ -153,6 +171,18 @@ class ChatSession(Base):
     messages = Column(JSON)
     created_at = Column(DateTime, default=func.now())
 
+class ChatHistory(Base):
+    __tablename__ = "chat_history"
+
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id"))
+    message = Column(Text)
+    response = Column(Text)
+    provider = Column(String)
+    sources = Column(Text)
+    confidence = Column(Float)
+    created_at = Column(DateTime, default=func.now())
+
 # Create tables
 Base.metadata.create_all(bind=engine)
 
@@ -182,105 +212,193 @@ import os
 import json
 from typing import Dict, List, Any
 
+from starlette.concurrency import run_in_threadpool
+
+from llm_cache import response_cache
+from llm_providers import HEDGE_PROVIDERS, LLMError, fake_stream, llm
+from local_generator import get_generator
+from requirement_parser import RequirementParser, parse_requirements
+from retrieval import RETRIEVAL_BUDGET_MS, TOP_K, build_prompt
+
 class LLMService:
     """Lightweight LLM service for Replit"""
 
-    def __init__(self):
-        self.openai_key = os.environ.get("OPENAI_API_KEY", "")
-        self.anthropic_key = os.environ.get("ANTHROPIC_API_KEY", "")
-
-        if self.openai_key:
-            try:
-                import openai
-                openai.api_key = self.openai_key
-                self.openai_available = True
-            except:
-                self.openai_available = False
+    def __init__(self, retriever=None, classify=None, client=None, cache=None):
+        self.retriever = retriever
+        # Optional text -> PEGS category, used to boost matching passages
+        self.classify = classify
+        # Pooled async client for openai / groq / anthropic (llm_providers.py)
+        self.client = client or llm
+        # Exact + similar-prompt answers of the hosted providers (llm_cache.py)
+        self.cache = cache or response_cache
+
+    async def generate_requirements(self, prompt: str, provider: str = "local", context: Dict = None,
+                                    use_cache: bool = True) -> Dict:
+        """Generate requirements based on prompt.
+
+        Hosted-provider answers are cached; use_cache=False skips the lookup
+        (the fresh answer still replaces the cached one). A cache hit
+        keeps the sources and context the answer was generated from, which
+        may predate requirements indexed since; "cache" says it is a hit.
+        """
+        remote = provider != "local" and self.client.available(provider)
+        if remote and use_cache:
+            cached, match = await run_in_threadpool(self.cache.get, prompt, provider, context)
+            if cached is not None:
+                cached["cache"] = match
+                return cached
+        elif remote:
+            self.cache.record_bypass()
+
+        retrieval = await self._retrieve(prompt)
+        passages = retrieval["passages"]
+
+        if remote:
+            result = await self._generate_remote(provider, build_prompt(prompt, passages),
+                                                 prompt, context)
         else:
-            self.openai_available = False
+            result = self._generate_local(prompt, context)
+
+        result["sources"] = [p["source"] for p in passages]
+        result["context"] = passages
+        result["retrieval"] = retrieval["timings"]
+        # Local-rule fallbacks after a provider error are not worth keeping
+        if remote and result.get("provider") != "local":
+            await run_in_threadpool(self.cache.put, prompt, provider, result, context)
+        if remote:
+            result["cache"] = "miss" if use_cache else "bypass"
+        return result
+
+    async def _retrieve(self, prompt: str) -> Dict:
+        """Hybrid top-k passages for the prompt within the retrieval budget"""
+        if self.retriever is None:
+            return {"passages": [], "timings": {}}
+        try:
+            category = self.classify(prompt) if self.classify else None
+            return await self.retriever.hybrid(prompt, TOP_K, category,
+                                               RETRIEVAL_BUDGET_MS)
+        except Exception as e:
+            print(f"Retrieval error: {e}")
+            return {"passages": [], "timings": {}}
 
-    async def generate_requirements(self, prompt: str, provider: str = "local", context: Dict = None) -> Dict:
-        """Generate requirements based on prompt"""
+    def _provider_order(self, provider: str) -> List[str]:
+        """The requested provider, then the ones to hedge with"""
+        return [provider] + [p for p in HEDGE_PROVIDERS if p != provider]
 
-        if provider == "openai" and self.openai_available:
-            return await self._generate_openai(prompt, context)
-        else:
-            return self._generate_local(prompt, context)
+    async def _generate_remote(self, provider: str, full_prompt: str, prompt: str,
+                               context: Dict = None) -> Dict:
+        """Generate with a hosted LLM, falling back to local rules.
 
-    async def _generate_openai(self, prompt: str, context: Dict = None) -> Dict:
-        """Generate using OpenAI"""
+        Slow or failing providers are hedged with the next healthy one
+        (SIS_LLM_HEDGE_PROVIDERS); "provider" in the result is the winner.
+        """
         try:
-            import openai
-
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a requirements engineering expert using PEGS framework."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=500
-            )
-
-            return self._parse_response(response.choices[0].message.content)
-        except Exception as e:
-            print(f"OpenAI error: {e}")
+            used, text = await self.client.hedged(self._provider_order(provider), full_prompt)
+            return self._parse_response(text, used)
+        except LLMError as e:
+            print(f"LLM error: {e}")
             return self._generate_local(prompt, context)
 
     def _generate_local(self, prompt: str, context: Dict = None) -> Dict:
-        """Generate using local rules"""
-        prompt_lower = prompt.lower()
-        requirements = []
-
-        if "authentication" in prompt_lower:
-            requirements.append({
-                "title": "Multi-Factor Authentication",
-                "description": "System shall implement MFA for all user access points",
-                "pegs_category": "System",
-                "priority": "Critical",
-                "confidence": 0.9
-            })
+        """Generate using local rules (requirement_templates, local_generator.py)"""
+        return get_generator().generate(prompt)
 
-        if "compliance" in prompt_lower:
-            requirements.append({
-                "title": "FERPA Compliance",
-                "description": "System shall ensure FERPA compliance for student data",
-                "pegs_category": "Environment",
-                "priority": "Critical",
-                "confidence": 0.95
-            })
+    def generate_batch(self, prompts: List[str]) -> List[Dict]:
+        """Local-rule requirements for many prompts in one pass.
 
-        if "performance" in prompt_lower:
-            requirements.append({
-                "title": "Response Time Requirement",
-                "description": "System shall maintain <2 second response time",
-                "pegs_category": "System",
-                "priority": "High",
-                "confidence": 0.85
-            })
+        Prompts with the same template hits share one (read-only) result.
+        """
+        return get_generator().generate_batch(prompts)
 
-        if not requirements:
-            requirements.append({
-                "title": f"Requirement: {prompt[:50]}",
-                "description": prompt,
-                "pegs_category": "System",
-                "priority": "Medium",
-                "confidence": 0.7
-            })
-
-        return {"requirements": requirements, "provider": "local", "count": len(requirements)}
-
-    def _parse_response(self, response: str) -> Dict:
+    def _parse_response(self, response: str, provider: str = "openai") -> Dict:
         """Parse LLM response"""
-        return {
-            "requirements": [{
+        requirements = parse_requirements(response, self.classify)
+        if not requirements:
+            requirements = [{
                 "title": "Generated Requirement",
                 "description": response,
                 "pegs_category": "System",
                 "priority": "Medium",
                 "confidence": 0.8
-            }],
-            "provider": "openai"
-        }
+            }]
+        return {"requirements": requirements, "provider": provider,
+                "count": len(requirements)}
+
+    async def stream_requirements(self, prompt: str, provider: str = "local",
+                                  context: Dict = None, use_cache: bool = True):
+        """Yield (event, data) pairs while generating requirements.
+
+        Events: "retrieval" (sources), "token" (text as it arrives),
+        "requirement" (each one once parsed), "error" (provider failure)
+        and finally "done" with the complete result, shaped like
+        generate_requirements' answer. The "local" provider streams its
+        rule-based answer, so the stream also works offline.
+        """
+        remote = provider != "local" and self.client.available(provider)
+        if remote and use_cache:
+            cached, match = await run_in_threadpool(self.cache.get, prompt, provider, context)
+            if cached is not None:
+                cached["cache"] = match
+                for req in cached.get("requirements", []):
+                    yield "requirement", req
+                yield "done", cached
+                return
+        elif remote:
+            self.cache.record_bypass()
+
+        retrieval = await self._retrieve(prompt)
+        passages = retrieval["passages"]
+        yield "retrieval", {"sources": [p["source"] for p in passages],
+                            "timings": retrieval["timings"]}
+
+        parser = RequirementParser(self.classify)
+        requirements, text, used = [], [], "local"
+        if remote:
+            # Streams are not hedged: they go to the first healthy provider
+            healthy = self.client.healthy(self._provider_order(provider))
+            used = healthy[0] if healthy else "local"
+        if used != "local":
+            pieces = self.client.stream(used, build_prompt(prompt, passages))
+        else:
+            local = self._generate_local(prompt, context)["requirements"]
+            pieces = fake_stream(json.dumps(local, indent=1))
+        try:
+            async for piece in pieces:
+                text.append(piece)
+                yield "token", {"text": piece}
+                for req in parser.feed(piece):
+                    requirements.append(req)
+                    yield "requirement", req
+            for req in parser.close():
+                requirements.append(req)
+                yield "requirement", req
+        except LLMError as e:
+            print(f"LLM error: {e}")
+            yield "error", {"provider": used, "message": str(e)}
+            # Keep what was already streamed; otherwise fall back to local rules
+            if not requirements:
+                used = "local"
+                for req in self._generate_local(prompt, context)["requirements"]:
+                    requirements.append(req)
+                    yield "requirement", req
+        finally:
+            await pieces.aclose()
+
+        if not requirements and text:
+            requirements = self._parse_response("".join(text), used)["requirements"]
+            for req in requirements:
+                yield "requirement", req
+
+        result = {"requirements": requirements, "provider": used,
+                  "count": len(requirements),
+                  "sources": [p["source"] for p in passages],
+                  "context": passages,
+                  "retrieval": retrieval["timings"]}
+        if remote and used != "local":
+            await run_in_threadpool(self.cache.put, prompt, provider, result, context)
+        if remote:
+            result["cache"] = "miss" if use_cache else "bypass"
+        yield "done", result
 '''
 
     with open('llm_service.py', 'w') as f:
@@ -297,38 +415,39 @@ def create_pegs_classifier():
     code = '''# pegs_classifier.py
 """PEGS Framework classifier"""
 
+from pegs_matcher import KeywordMatcher
+
 class PEGSClassifier:
     """Classify requirements into PEGS categories"""
 
-    def __init__(self):
-        self.keywords = {
+    def __init__(self, keywords: dict = None, word_boundary: bool = False):
+        self.keywords = keywords or {
             "Project": ["timeline", "schedule", "milestone", "budget", "resource", "deadline"],
             "Environment": ["compliance", "regulation", "integration", "ferpa", "gdpr", "policy"],
             "Goals": ["objective", "target", "metric", "kpi", "roi", "efficiency"],
             "System": ["architecture", "database", "api", "security", "performance", "authentication"]
         }
+        # Compiled once; finds every keyword of every category in one pass
+        self.matcher = KeywordMatcher(self.keywords, word_boundary=word_boundary)
 
     def classify(self, text: str) -> dict:
         """Classify text into PEGS categories"""
-        scores = {}
-        text_lower = text.lower()
-
-        for category, keywords in self.keywords.items():
-            score = sum(1 for keyword in keywords if keyword in text_lower)
-            scores[category] = score / len(keywords) if keywords else 0
-
-        total = sum(scores.values())
-        if total > 0:
-            scores = {k: v/total for k, v in scores.items()}
-        else:
-            scores = {"System": 1.0}
-
-        return scores
+        return self.matcher.scores(text)
 
     def get_primary_category(self, text: str) -> str:
         """Get primary PEGS category"""
         scores = self.classify(text)
         return max(scores, key=scores.get)
+
+    def classify_batch(self, texts: list):
+        """Score many texts at once: NumPy matrix of texts x self.matcher.categories"""
+        return self.matcher.score_matrix(texts)
+
+    def get_primary_categories(self, texts: list) -> list:
+        """Primary PEGS category for each text"""
+        scores = self.classify_batch(texts)
+        categories = self.matcher.categories
+        return [categories[i] for i in scores.argmax(axis=1)]
 '''
 
     with open('pegs_classifier.py', 'w') as f:
@@ -355,18 +474,56 @@ IMPORTS_TO_ADD = """
 # Enhanced SIS System Imports
 from database_models import (
     Base, engine, SessionLocal, get_db,
-    Project, Requirement, Document, ChatSession, Tag
+    Project, Requirement, Document, DocumentChunk, ChatSession, ChatHistory,
+    Tag
 )
 from llm_service import LLMService
+from retrieval import retriever
 from pegs_classifier import PEGSClassifier
+from db_pool import pool
+from job_queue import jobs
+from llm_providers import PROVIDERS, llm
+from llm_cache import response_cache
+from near_duplicates import (DEDUP_ON_WRITE, THRESHOLD as DEDUP_THRESHOLD,
+                             add_signatures, dedup_text, find_similar,
+                             signature, similarity)
+from pegs_stats import ensure_counters, read_stats
+from fast_json import dumps, join_objects, json_object_sql, json_response
+from http_cache import cached_json, ensure_version_table
+from fastapi import Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import Optional, List, Dict, Any
+from datetime import datetime, timedelta
 import re
 import os
+import json
 
 # Initialize services
-llm_service = LLMService()
 pegs_classifier = PEGSClassifier()
+llm_service = LLMService(retriever=retriever,
+                         classify=pegs_classifier.get_primary_category)
+
+# Recent hosted-LLM answers from chat history seed the response cache
+def warm_llm_cache(db, limit: int = 500):
+    since = datetime.utcnow() - timedelta(seconds=response_cache.ttl)
+    rows = (db.query(ChatHistory)
+            .filter(ChatHistory.created_at >= since, ChatHistory.provider != "local")
+            .order_by(ChatHistory.id.desc()).limit(limit).all())
+    for row in reversed(rows):
+        try:
+            requirements = json.loads(row.response or "[]")
+            response_cache.put(row.message, row.provider, {
+                "requirements": requirements,
+                "provider": row.provider,
+                "count": len(requirements),
+                "sources": json.loads(row.sources or "[]")
+            })
+        except (TypeError, ValueError):
+            continue
+    if rows:
+        print(f"✅ LLM cache warmed with {len(rows)} answers")
 
 # Initialize database
 def init_database():
@@ -381,8 +538,13 @@ def init_database():
         db.add(default_project)
         db.commit()
         print("✅ Default project created")
+    warm_llm_cache(db)
     db.close()
 
+    with pool.connection() as conn:
+        ensure_counters(conn)
+        ensure_version_table(conn)
+
 init_database()
 """
 
@@ -390,68 +552,149 @@ init_database()
 ENDPOINTS_TO_ADD = """
 # Enhanced API Endpoints
 
-@app.post("/api/requirements/generate")
-async def generate_requirements(chat_data: dict, db: Session = Depends(get_db)):
-    message = chat_data.get("message", "")
-    provider = chat_data.get("provider", "local")
-
-    result = await llm_service.generate_requirements(message, provider)
+# Saves generated requirements and the chat turn; returns the new ids.
+# With dedupe, requirements that near-duplicate a stored one (or an
+# earlier one of the same answer) are skipped and listed in
+# result["duplicates"].
+def store_generated(message: str, provider: str, result: dict,
+                    dedupe: bool = DEDUP_ON_WRITE) -> list:
+    db = SessionLocal()
+    try:
+        project = db.query(Project).first()
+        created, signatures, duplicates = [], [], []
+        for req in result.get("requirements", []):
+            sig = signature(dedup_text(req.get("title"), req.get("description")))
+            if dedupe:
+                with pool.connection() as conn:
+                    match = find_similar(conn, sig, limit=1)
+                if match or any(similarity(sig, s) >= DEDUP_THRESHOLD for s in signatures):
+                    duplicates.append({"title": req.get("title", ""),
+                                       "duplicate_of": match[0][0] if match else None})
+                    continue
+            signatures.append(sig)
+            db_req = Requirement(
+                project_id=project.id if project else 1,
+                title=req.get("title", ""),
+                description=req.get("description", ""),
+                pegs_category=req.get("pegs_category", "System"),
+                priority=req.get("priority", "Medium"),
+                status="Draft",
+                confidence_score=req.get("confidence", 0.8),
+                llm_provider=provider
+            )
+            db.add(db_req)
+            created.append(db_req)
 
-    project = db.query(Project).first()
-    for req in result.get("requirements", []):
-        db_req = Requirement(
+        # Record which stored passages the answer was grounded on
+        confidences = [req.get("confidence", 0.8) for req in result.get("requirements", [])]
+        db.add(ChatHistory(
             project_id=project.id if project else 1,
-            title=req.get("title", ""),
-            description=req.get("description", ""),
-            pegs_category=req.get("pegs_category", "System"),
-            priority=req.get("priority", "Medium"),
-            status="Draft",
-            confidence_score=req.get("confidence", 0.8),
-            llm_provider=provider
-        )
-        db.add(db_req)
-    db.commit()
+            message=message,
+            response=json.dumps(result.get("requirements", [])),
+            provider=result.get("provider", provider),
+            sources=json.dumps(result.get("sources", [])),
+            confidence=sum(confidences) / len(confidences) if confidences else None
+        ))
+        db.commit()
 
+        # Signed for later duplicate checks
+        with pool.connection() as conn:
+            add_signatures(conn, [(r.id, sig) for r, sig in zip(created, signatures)])
+            conn.commit()
+        if dedupe:
+            result["duplicates"] = duplicates
+        # New requirements become retrievable context right away
+        retriever.add_requirements([(r.id, r.title, r.description) for r in created])
+        return [r.id for r in created]
+    finally:
+        db.close()
+
+@jobs.handler("requirements.generate")
+async def run_generation(job):
+    message = job.payload.get("message", "")
+    provider = job.payload.get("provider", "local")
+    result = await llm_service.generate_requirements(
+        message, provider, use_cache=job.payload.get("cache", True))
+    # A cached answer was stored when it was first generated
+    if result.get("cache") in ("exact", "semantic"):
+        result["requirement_ids"] = []
+        return result
+    result["requirement_ids"] = await run_in_threadpool(
+        store_generated, message, provider, result,
+        job.payload.get("dedupe", DEDUP_ON_WRITE))
     return result
 
+@app.post("/api/requirements/generate")
+async def generate_requirements(chat_data: dict, request: Request):
+    # Answers 202 at once; the result appears on GET /api/jobs/{id}.
+    # "cache": false or Cache-Control: no-cache asks for a fresh answer.
+    no_cache = "no-cache" in request.headers.get("Cache-Control", "")
+    job = await jobs.enqueue(
+        "requirements.generate",
+        {"message": chat_data.get("message", ""),
+         "provider": chat_data.get("provider", "local"),
+         "cache": bool(chat_data.get("cache", True)) and not no_cache,
+         "dedupe": bool(chat_data.get("dedupe", DEDUP_ON_WRITE))},
+        priority=10,
+        idempotency_key=request.headers.get("Idempotency-Key"))
+    return JSONResponse(status_code=202, content=job,
+                        headers={"Location": f"/api/jobs/{job['id']}"})
+
+@app.post("/api/requirements/generate/stream")
+async def stream_requirements(chat_data: dict, request: Request):
+    # Server-sent events: tokens and requirements as they are generated,
+    # then "done" with the full result and "saved" once it is stored.
+    message = chat_data.get("message", "")
+    provider = chat_data.get("provider", "local")
+    no_cache = "no-cache" in request.headers.get("Cache-Control", "")
+    use_cache = bool(chat_data.get("cache", True)) and not no_cache
+    dedupe = bool(chat_data.get("dedupe", DEDUP_ON_WRITE))
+
+    def sse(event, data):
+        return f"event: {event}\\\\ndata: {json.dumps(data, default=str)}\\\\n\\\\n"
+
+    async def events():
+        result = None
+        async for event, data in llm_service.stream_requirements(
+                message, provider, use_cache=use_cache):
+            if event == "done":
+                result = data
+            yield sse(event, data)
+        # Stored only once the answer is complete, so a client that
+        # disconnects half way leaves nothing behind
+        if result is not None and result.get("cache") not in ("exact", "semantic"):
+            ids = await run_in_threadpool(store_generated, message, provider,
+                                          result, dedupe)
+            yield sse("saved", {"requirement_ids": ids,
+                                "duplicates": result.get("duplicates", [])})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache",
+                                      "X-Accel-Buffering": "no"})
+
+REQUIREMENT_JSON = json_object_sql(
+    ("id", "title", "description", "pegs_category", "priority", "status"))
+
 @app.get("/api/requirements")
-def get_requirements(pegs_category: Optional[str] = None, db: Session = Depends(get_db)):
-    query = db.query(Requirement)
+def get_requirements(request: Request, pegs_category: Optional[str] = None):
+    # SQLite encodes each row; no ORM objects or dicts are built per row
+    sql = f"SELECT {REQUIREMENT_JSON} FROM requirements"
+    params = []
     if pegs_category:
-        query = query.filter(Requirement.pegs_category == pegs_category)
-    requirements = query.all()
-
-    return {
-        "count": len(requirements),
-        "requirements": [
-            {
-                "id": r.id,
-                "title": r.title,
-                "description": r.description,
-                "pegs_category": r.pegs_category,
-                "priority": r.priority,
-                "status": r.status
-            }
-            for r in requirements
-        ]
-    }
+        sql += " WHERE pegs_category = ?"
+        params.append(pegs_category)
+    with pool.connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    body = (b'{"count":%d,"requirements":' % len(rows) +
+            join_objects(row[0] for row in rows) + b"}")
+    return json_response(body, request)
 
 @app.get("/api/pegs/stats")
-def get_pegs_statistics(db: Session = Depends(get_db)):
-    requirements = db.query(Requirement).all()
-
-    stats = {"total": len(requirements), "by_category": {}, "by_priority": {}}
-
-    for req in requirements:
-        if req.pegs_category not in stats["by_category"]:
-            stats["by_category"][req.pegs_category] = 0
-        stats["by_category"][req.pegs_category] += 1
-
-        if req.priority not in stats["by_priority"]:
-            stats["by_priority"][req.priority] = 0
-        stats["by_priority"][req.priority] += 1
-
-    return stats
+def get_pegs_statistics(request: Request):
+    # Served from the trigger-maintained counters, not a scan of every
+    # row, and answered with a 304 while requirements are unchanged
+    with pool.connection() as conn:
+        return cached_json(request, conn, lambda: dumps(read_stats(conn)))
 
 @app.get("/api/system/health")
 def system_health_check(db: Session = Depends(get_db)):
@@ -462,7 +705,8 @@ def system_health_check(db: Session = Depends(get_db)):
         "total_projects": db.query(Project).count(),
         "llm_providers": {
             "local": "available",
-            "openai": "configured" if os.environ.get("OPENAI_API_KEY") else "not configured"
+            **{name: "configured" if llm.available(name) else "not configured"
+               for name in PROVIDERS}
         }
     }
 """
@@ -0,0 +1,7 @@
+# tests/conftest.py
+"""Make the flat rag-system modules importable wherever pytest starts"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
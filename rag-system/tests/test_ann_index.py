@@ -0,0 +1,72 @@
+# tests/test_ann_index.py
+import numpy as np
+
+from ann_index import IVFIndex
+from vector_index import VectorIndex, normalize
+from vector_store import VectorStore
+
+DIM = 32
+
+
+def clustered(rows=1000, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = normalize(rng.normal(size=(clusters, DIM)).astype(np.float32))
+    vectors = centres[rng.integers(clusters, size=rows)]
+    return normalize(vectors + 0.1 * rng.normal(size=(rows, DIM))
+                     .astype(np.float32))
+
+
+def recall(index, exact, queries, k=10):
+    hits = 0
+    for (found, _), (truth, _) in zip(index.search(queries, k),
+                                      exact.search(queries, k)):
+        hits += len(set(found) & set(truth))
+    return hits / (k * len(queries))
+
+
+def test_trained_index_matches_exact_search():
+    vectors = clustered()
+    exact = VectorIndex(DIM)
+    exact.add(range(len(vectors)), vectors)
+    ivf = IVFIndex(VectorIndex(DIM), nlist=20, nprobe=4, min_rows=10 ** 9)
+    ivf.add(range(len(vectors)), vectors)
+    queries = clustered(rows=50, seed=1)
+
+    # Exact until trained
+    assert recall(ivf, exact, queries) == 1.0
+    stats = ivf.train()
+    assert stats["ann"]["trained"] and stats["ann"]["nlist"] == 20
+    assert recall(ivf, exact, queries) >= 0.9
+    # Probing every list is exact again
+    found, _ = ivf.search(queries[:1], k=10, nprobe=20)[0]
+    assert found == exact.search(queries[:1], k=10)[0][0]
+
+
+def test_rows_added_or_removed_after_training():
+    vectors = clustered()
+    ivf = IVFIndex(VectorIndex(DIM), nlist=20, nprobe=2, min_rows=10 ** 9)
+    ivf.add(range(900), vectors[:900])
+    ivf.train()
+    ivf.add(range(900, 1000), vectors[900:])
+    ivf.remove([5])
+
+    found, scores = ivf.search(vectors[950:951], k=1)[0]
+    assert found == [950] and scores[0] > 0.99
+    assert 5 not in ivf.search(vectors[5:6], k=10)[0][0]
+    # New rows were labelled with the trained centroids
+    assert (ivf.base.snapshot()[2] >= 0).all()
+
+
+def test_centroids_persist_with_the_store(tmp_path):
+    vectors = clustered()
+    ivf = IVFIndex(VectorStore(str(tmp_path), DIM, "test"), nlist=20,
+                   min_rows=10 ** 9)
+    ivf.add(range(len(vectors)), vectors)
+    ivf.train()
+
+    reopened = IVFIndex(VectorStore(str(tmp_path), DIM, "test"), nlist=20,
+                        min_rows=10 ** 9)
+    stats = reopened.stats()["ann"]
+    assert (stats["trained"], stats["trained_rows"]) == (True, 1000)
+    found, _ = reopened.search(vectors[:1], k=1)[0]
+    assert found == [0]
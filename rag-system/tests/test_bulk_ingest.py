@@ -0,0 +1,87 @@
+# tests/test_bulk_ingest.py
+import asyncio
+import io
+import json
+import sqlite3
+
+import pytest
+
+import bulk_ingest
+from bulk_ingest import ingest
+
+
+class InlineDatabase:
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False,
+                                    isolation_level=None)
+        self.conn.execute("""CREATE TABLE requirements (
+            id INTEGER PRIMARY KEY, title TEXT, description TEXT,
+            pegs_category TEXT, priority TEXT, status TEXT)""")
+        self.conn.execute("CREATE TABLE progress (records INTEGER)")
+        self.conn.execute("INSERT INTO progress VALUES (0)")
+
+    async def write(self, fn, *args):
+        return fn(self.conn, *args)
+
+
+def classify(texts):
+    return ["System"] * len(texts)
+
+
+def upload(records) -> io.BytesIO:
+    return io.BytesIO("".join(json.dumps(r) + "\n"
+                              for r in records).encode())
+
+
+def run(spool, **kwargs) -> list:
+    async def collect():
+        return [json.loads(line)
+                async for line in ingest(spool, "ndjson", classify,
+                                         **kwargs)]
+    return asyncio.run(collect())
+
+
+RECORDS = [{"title": f"R{i}", "description": f"System shall do {i}"}
+           for i in range(10)]
+
+
+def test_checkpoint_commits_with_its_chunk(monkeypatch):
+    database = InlineDatabase()
+    monkeypatch.setattr(bulk_ingest, "db", database)
+    chunks = 0
+
+    def checkpoint(conn, records, params, errors):
+        nonlocal chunks
+        chunks += 1
+        conn.execute("UPDATE progress SET records = records + ?", (records,))
+        if chunks == 3:
+            raise RuntimeError("crash before the commit")
+
+    with pytest.raises(RuntimeError):
+        run(upload(RECORDS), chunk_rows=4, checkpoint=checkpoint)
+
+    def stored():
+        conn = database.conn
+        return (conn.execute("SELECT records FROM progress").fetchone()[0],
+                conn.execute("SELECT COUNT(*) FROM requirements")
+                .fetchone()[0])
+
+    # The failed chunk's rows went with its checkpoint
+    assert stored() == (8, 8)
+    run(upload(RECORDS), chunk_rows=4, skip=8, checkpoint=checkpoint)
+    assert stored() == (10, 10)
+
+
+def test_wrongly_typed_fields_are_rejected(monkeypatch):
+    database = InlineDatabase()
+    monkeypatch.setattr(bulk_ingest, "db", database)
+    records = [{"description": 123},
+               {"title": {"a": 1}, "description": "System shall log"},
+               {"description": "System shall audit", "priority": ["High"]},
+               {"title": "Ok", "description": "System shall export"}]
+    *chunks, done = run(upload(records), chunk_rows=2)
+    assert (done["inserted"], done["rejected"]) == (1, 3)
+    errors = [e["error"] for chunk in chunks for e in chunk["errors"]]
+    assert errors == ["description must be a string, not int",
+                      "title must be a string, not dict",
+                      "priority must be a string, not list"]
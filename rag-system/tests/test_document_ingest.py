@@ -0,0 +1,52 @@
+# tests/test_document_ingest.py
+import asyncio
+import io
+import sqlite3
+
+import pytest
+
+import document_ingest
+from document_ingest import ensure_document_tables, ingest_document
+
+
+class InlineDatabase:
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        ensure_document_tables(self.conn)
+
+    async def write(self, fn, *args):
+        return fn(self.conn, *args)
+
+    def count(self, table):
+        sql = f"SELECT COUNT(*) FROM {table}"
+        return self.conn.execute(sql).fetchone()[0]
+
+
+def classify(texts):
+    return ["System"] * len(texts)
+
+
+def test_cancelled_upload_removes_partial_document(monkeypatch):
+    database = InlineDatabase()
+    monkeypatch.setattr(document_ingest, "db", database)
+    removed = []
+
+    async def segments(stalled):
+        yield [(1, "The system shall export grades. " * 200)]
+        await stalled.wait()  # a client that stops sending
+
+    async def run():
+        stalled = asyncio.Event()
+        task = asyncio.create_task(ingest_document(
+            io.BytesIO(), "grades.txt", "text", classify, batch_size=1,
+            on_delete=removed.extend, segments=segments(stalled)))
+        while database.count("document_chunks") == 0:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert database.count("documents") == 0
+    assert database.count("document_chunks") == 0
+    assert removed
@@ -0,0 +1,77 @@
+# tests/test_fast_json.py
+import gzip
+import json
+import sqlite3
+import sys
+import types
+
+import pytest
+
+from fast_json import COMPRESS_MIN_BYTES, compress, json_response
+from requirements_list import fetch_page_json
+
+BODY = json.dumps([{"title": f"R{i}"} for i in range(200)]).encode()
+
+
+class FakeRequest:
+    def __init__(self, accept_encoding=None):
+        self.headers = {} if accept_encoding is None else \
+            {"accept-encoding": accept_encoding}
+
+
+@pytest.fixture
+def no_brotli(monkeypatch):
+    monkeypatch.setitem(sys.modules, "brotli", None)
+
+
+def test_compression_follows_accept_encoding(no_brotli):
+    assert len(BODY) >= COMPRESS_MIN_BYTES
+    body, coding = compress(BODY, "gzip, deflate")
+    assert coding == "gzip" and gzip.decompress(body) == BODY
+    # Refused codings, small bodies and no header are sent as they are
+    assert compress(BODY, "gzip;q=0, identity") == (BODY, None)
+    assert compress(BODY[:10], "gzip") == (BODY[:10], None)
+    assert compress(BODY, "") == (BODY, None)
+    # Brotli is preferred, but falls back to gzip when not installed
+    assert compress(BODY, "br, gzip")[1] == "gzip"
+
+
+def test_brotli_when_installed(monkeypatch):
+    fake = types.SimpleNamespace(compress=lambda body, quality: b"br:" + body)
+    monkeypatch.setitem(sys.modules, "brotli", fake)
+    assert compress(BODY, "gzip;q=0.5, br;q=1.0") == (b"br:" + BODY, "br")
+
+
+def test_json_response_headers(no_brotli):
+    response = json_response(BODY, FakeRequest("gzip"))
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert gzip.decompress(response.body) == BODY
+
+    plain = json_response(BODY, FakeRequest())
+    assert "content-encoding" not in plain.headers
+    assert plain.body == BODY
+    assert plain.headers["content-type"] == "application/json"
+
+
+def test_sqlite_encoded_page_is_valid_json():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""CREATE TABLE requirements (
+        id INTEGER PRIMARY KEY, title TEXT, description TEXT,
+        pegs_category TEXT, priority TEXT, status TEXT,
+        created_at TIMESTAMP)""")
+    conn.executemany(
+        "INSERT INTO requirements (title, description) VALUES (?, ?)",
+        [('Quote "it"', "Line\nbreak ✅"), ("Plain", None), ("Last", "x")])
+
+    page = json.loads(fetch_page_json(conn, "id", False, None, {}, 2))
+    assert page["count"] == 2
+    assert [r["title"] for r in page["requirements"]] == ['Quote "it"',
+                                                          "Plain"]
+    assert page["requirements"][0]["description"] == "Line\nbreak ✅"
+    assert page["requirements"][1]["description"] is None
+
+    rest = json.loads(fetch_page_json(conn, "id", False,
+                                      page["next_cursor"], {}, 2))
+    assert ([r["title"] for r in rest["requirements"]],
+            rest["next_cursor"]) == (["Last"], None)
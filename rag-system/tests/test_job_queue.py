@@ -0,0 +1,136 @@
+# tests/test_job_queue.py
+import asyncio
+import sqlite3
+import threading
+import time
+
+import job_queue
+from job_queue import (FINAL_STATES, JobQueue, claim_job, ensure_jobs_table,
+                       fetch_job, insert_job, recover_jobs, renew_leases,
+                       requeue_lapsed)
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def test_claim_order_and_next_due(tmp_path):
+    conn = connect(tmp_path / "jobs.db")
+    ensure_jobs_table(conn)
+    low, _ = insert_job(conn, "generate", {}, 0, None, 3)
+    high, _ = insert_job(conn, "generate", {}, 5, None, 3)
+    conn.execute("UPDATE jobs SET run_after = 100 WHERE id = ?", (low["id"],))
+    conn.commit()
+
+    job, due = claim_job(conn, now=50)
+    assert (job["id"], job["state"], job["attempts"], due) == \
+        (high["id"], "running", 1, None)
+    assert claim_job(conn, now=50) == (None, 100)
+
+
+def test_only_lapsed_leases_are_recovered(tmp_path):
+    conn = connect(tmp_path / "jobs.db")
+    ensure_jobs_table(conn)
+    job, _ = insert_job(conn, "generate", {}, 0, None, 3)
+    claim_job(conn, now=100, owner="live", lease=60)
+
+    # Another process starting up leaves the live worker's job alone
+    assert recover_jobs(conn, now=150) == 0
+    renew_leases(conn, "live", now=150, lease=60)
+    assert recover_jobs(conn, now=200) == 0
+    assert fetch_job(conn, job["id"])["state"] == "running"
+
+    # Once the owner stops renewing, the job is requeued
+    assert recover_jobs(conn, now=211) == 1
+    assert fetch_job(conn, job["id"])["state"] == "queued"
+
+
+def test_stopping_owner_requeues_its_jobs(tmp_path):
+    conn = connect(tmp_path / "jobs.db")
+    ensure_jobs_table(conn)
+    for _ in range(2):
+        insert_job(conn, "generate", {}, 0, None, 3)
+    mine, _ = claim_job(conn, now=100, owner="me")
+    theirs, _ = claim_job(conn, now=100, owner="other")
+    assert requeue_lapsed(conn, now=100, owner="me") == 1
+    assert fetch_job(conn, mine["id"])["state"] == "queued"
+    assert fetch_job(conn, theirs["id"])["state"] == "running"
+
+
+def test_concurrent_claims_take_each_job_once(tmp_path):
+    path = tmp_path / "jobs.db"
+    conn = connect(path)
+    ensure_jobs_table(conn)
+    for _ in range(200):
+        insert_job(conn, "generate", {}, 0, None, 3)
+    claimed = []
+
+    def worker():
+        own = connect(path)
+        while True:
+            job, _ = claim_job(own, time.time())
+            if job is None:
+                break
+            claimed.append(job["id"])
+        own.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == list(range(1, 201))
+
+
+class InlineDatabase:
+    """Runs db.run/db.write calls on the test's own connection"""
+
+    def __init__(self, path):
+        self.conn = connect(path)
+        ensure_jobs_table(self.conn)
+
+    async def run(self, fn, *args):
+        return fn(self.conn, *args)
+
+    write = run
+
+
+async def wait_for_state(queue, job_id, states=FINAL_STATES):
+    for _ in range(500):
+        job = await queue.get(job_id)
+        if job["state"] in states:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} stuck in {job['state']}")
+
+
+def test_unserializable_result_fails_job_and_keeps_worker(tmp_path,
+                                                          monkeypatch):
+    monkeypatch.setattr(job_queue, "db", InlineDatabase(tmp_path / "q.db"))
+    queue = JobQueue(workers=1)
+
+    @queue.handler("broken")
+    async def broken(job):
+        return {"when": object()}
+
+    @queue.handler("fine")
+    async def fine(job):
+        return {"ok": True}
+
+    async def run():
+        await queue.start()
+        try:
+            bad = await queue.enqueue("broken")
+            failed = await wait_for_state(queue, bad["id"])
+            good = await queue.enqueue("fine")
+            done = await wait_for_state(queue, good["id"])
+        finally:
+            await queue.stop()
+        return failed, done
+
+    failed, done = asyncio.run(run())
+    assert failed["state"] == "failed"
+    assert failed["error"].startswith("TypeError")
+    assert (done["state"], done["result"]) == ("done", {"ok": True})
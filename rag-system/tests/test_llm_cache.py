@@ -0,0 +1,53 @@
+# tests/test_llm_cache.py
+from llm_cache import ResponseCache
+from vector_index import HashingEmbedder
+
+RESULT = {"requirements": [{"title": "Records", "description": "..."}]}
+
+
+def make_cache(**kwargs):
+    return ResponseCache(HashingEmbedder(dim=256), **kwargs)
+
+
+def test_exact_hit_ignores_case_spacing_and_punctuation():
+    cache = make_cache()
+    cache.put("Student records FERPA compliance", "openai", RESULT)
+    result, how = cache.get("  student   RECORDS ferpa compliance? ",
+                            "openai")
+    assert (result, how) == (RESULT, "exact")
+    # Copies out, so callers can change what they get
+    result["requirements"].clear()
+    assert cache.get("student records ferpa compliance", "openai")[0] == \
+        RESULT
+
+
+def test_similar_prompt_hits_only_in_the_same_scope():
+    cache = make_cache(threshold=0.8)
+    cache.put("student records FERPA compliance", "openai", RESULT,
+              context={"project": 1})
+    result, how = cache.get("FERPA compliance for student records",
+                            "openai", context={"project": 1})
+    assert how == "semantic" and 0.8 <= result["cache_similarity"] < 1
+    assert cache.get("FERPA compliance for student records", "groq",
+                     context={"project": 1}) == (None, None)
+    assert cache.get("FERPA compliance for student records", "openai",
+                     context={"project": 2}) == (None, None)
+    assert cache.get("timetable clash detection", "openai",
+                     context={"project": 1}) == (None, None)
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) \
+        == (0, 1, 3)
+
+
+def test_expired_and_evicted_entries_miss():
+    cache = make_cache(ttl=-1)
+    cache.put("export grades", "openai", RESULT)
+    assert cache.get("export grades", "openai") == (None, None)
+    assert cache.stats()["expired"] == 1
+
+    cache = make_cache(size=2)
+    for prompt in ("export grades", "reset passwords", "audit logins"):
+        cache.put(prompt, "openai", RESULT)
+    assert cache.get("export grades", "openai") == (None, None)
+    assert cache.get("audit logins", "openai")[1] == "exact"
+    assert cache.stats()["evictions"] == 2
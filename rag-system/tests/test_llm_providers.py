@@ -0,0 +1,174 @@
+# tests/test_llm_providers.py
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from llm_providers import LLMClient, LLMError, Provider
+
+
+class MockUpstream:
+    """httpx transport answering chat completions per provider URL path.
+
+    ``plans`` maps a provider name to (delay seconds, status) and counts
+    the calls and the peak concurrency seen.
+    """
+
+    def __init__(self, plans):
+        self.plans = plans
+        self.calls = {name: 0 for name in plans}
+        self.active = self.peak = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        name = request.url.path.strip("/")
+        delay, status = self.plans[name]
+        self.calls[name] += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.active -= 1
+        if status >= 400:
+            return httpx.Response(status, text="upstream error")
+        prompt = json.loads(request.content)["messages"][-1]["content"]
+        if json.loads(request.content).get("stream"):
+            events = "".join(
+                f"data: {json.dumps({'choices': [{'delta': {'content': w}}]})}"
+                f"\n\n" for w in (f"{name}:", prompt))
+            return httpx.Response(200, text=events + "data: [DONE]\n\n")
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": f"{name}:{prompt}"}}]})
+
+
+def make_client(monkeypatch, plans, concurrency=4):
+    monkeypatch.setenv("TEST_LLM_KEY", "secret")
+    upstream = MockUpstream(plans)
+    providers = {}
+    for name in plans:
+        providers[name] = Provider(name, "http://mock", f"/{name}",
+                                   "TEST_LLM_KEY", "mock")
+        providers[name].concurrency = concurrency
+    return LLMClient(providers, httpx.MockTransport(upstream.handle)), \
+        upstream
+
+
+def test_identical_calls_in_flight_share_one_request(monkeypatch):
+    client, upstream = make_client(monkeypatch, {"a": (0.05, 200)})
+
+    async def run():
+        try:
+            return await asyncio.gather(
+                *(client.complete("a", "export grades") for _ in range(5)),
+                client.complete("a", "reset passwords"))
+        finally:
+            await client.aclose()
+
+    answers = asyncio.run(run())
+    assert answers == ["a:export grades"] * 5 + ["a:reset passwords"]
+    assert upstream.calls["a"] == 2
+    assert client.stats()["a"]["coalesced"] == 4
+
+
+def test_concurrency_is_limited_per_provider(monkeypatch):
+    client, upstream = make_client(monkeypatch, {"a": (0.02, 200)},
+                                   concurrency=2)
+
+    async def run():
+        try:
+            await asyncio.gather(*(client.complete("a", f"prompt {i}")
+                                   for i in range(8)))
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+    assert (upstream.calls["a"], upstream.peak) == (8, 2)
+
+
+def test_errors_and_streams(monkeypatch):
+    client, _ = make_client(monkeypatch, {"a": (0, 200), "bad": (0, 400)})
+
+    async def run():
+        try:
+            with pytest.raises(LLMError) as failed:
+                await client.complete("bad", "anything")
+            pieces = [piece async for piece in client.stream("a", "hi")]
+            return failed.value, pieces
+        finally:
+            await client.aclose()
+
+    error, pieces = asyncio.run(run())
+    assert (error.provider, error.status) == ("bad", 400)
+    assert pieces == ["a:", "hi"]
+
+
+def test_breaker_opens_after_failures_then_probes(monkeypatch):
+    client, upstream = make_client(monkeypatch, {"down": (0, 503),
+                                                 "bad": (0, 400)})
+    breaker = client.breakers["down"]
+    breaker.failures, breaker.reset = 3, 60
+
+    async def run():
+        try:
+            for _ in range(5):
+                with pytest.raises(LLMError):
+                    await client.complete("down", "anything")
+            # A rejected prompt is not an outage
+            for _ in range(5):
+                with pytest.raises(LLMError):
+                    await client.complete("bad", "anything")
+            assert client.breakers["bad"].state == "closed"
+
+            # After the reset period one probe goes through
+            breaker.opened_at -= 60
+            upstream.plans["down"] = (0, 200)
+            return await client.complete("down", "anything")
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == "down:anything"
+    # Open after three failures; the other two were never sent
+    assert upstream.calls["down"] == 4
+    stats = client.stats()["down"]
+    assert (stats["rejected"], stats["breaker_trips"]) == (2, 1)
+    assert breaker.state == "closed"
+
+
+def test_hedge_asks_the_next_provider_when_the_first_is_slow(monkeypatch):
+    client, _ = make_client(monkeypatch, {"slow": (1.0, 200),
+                                          "fast": (0, 200),
+                                          "down": (0, 503)})
+    monkeypatch.setattr(client, "hedge_delay", lambda provider: 0.05)
+
+    async def run():
+        try:
+            hedged = await client.hedged(["slow", "fast"], "export grades")
+            failover = await client.hedged(["down", "fast"], "audit logins")
+            return hedged, failover
+        finally:
+            await client.aclose()
+
+    hedged, failover = asyncio.run(run())
+    assert hedged == ("fast", "fast:export grades")
+    assert failover == ("fast", "fast:audit logins")
+    assert client.stats()["fast"]["hedge_wins"] == 1
+
+
+def test_hedge_skips_providers_with_an_open_breaker(monkeypatch):
+    client, upstream = make_client(monkeypatch, {"down": (0, 503),
+                                                 "fast": (0, 200)})
+    breaker = client.breakers["down"]
+    breaker.failures = 1
+    breaker.record_failure()
+
+    async def run():
+        try:
+            return await client.hedged(["down", "fast"], "export grades")
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run())[0] == "fast"
+    assert upstream.calls["down"] == 0
+    with pytest.raises(LLMError, match="no healthy provider"):
+        asyncio.run(client.hedged(["down"], "export grades"))
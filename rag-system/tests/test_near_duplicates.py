@@ -0,0 +1,64 @@
+# tests/test_near_duplicates.py
+import sqlite3
+
+import pytest
+
+from near_duplicates import (duplicate_clusters, ensure_dedup_tables,
+                             find_similar, index_missing, signature,
+                             similarity)
+
+GRADES = "The system shall export student grades to CSV every night"
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE requirements (id INTEGER PRIMARY KEY, "
+                 "title TEXT, description TEXT)")
+    ensure_dedup_tables(conn)
+    conn.executemany(
+        "INSERT INTO requirements (title, description) VALUES (?, ?)",
+        [("Grades", GRADES),
+         ("Grades again", GRADES.replace("every night", "every night.")),
+         ("Grades export", "The system shall export student grades to CSV "
+                           "each night"),
+         ("Login", "The system shall lock an account after five failed "
+                   "logins"),
+         ("Title only", None)])
+    conn.commit()
+    return conn
+
+
+def test_signature_similarity_tracks_the_text():
+    assert similarity(signature(GRADES), signature(GRADES.upper())) == 1.0
+    close = similarity(signature(GRADES),
+                       signature(GRADES.replace("every", "each")))
+    far = similarity(signature(GRADES),
+                     signature("Passwords shall expire after ninety days"))
+    assert close > 0.7 > 0.2 > far
+
+
+def test_backfill_then_lookup_and_clusters(conn):
+    assert index_missing(conn) == 5
+    assert index_missing(conn) == 0
+
+    matches = find_similar(conn, signature(GRADES), threshold=0.7,
+                           exclude=1)
+    assert [rid for rid, _ in matches] == [2, 3]
+    assert matches[0][1] == 1.0
+
+    report = duplicate_clusters(conn, threshold=0.7)
+    assert report["groups"] == [{"keep": 1, "duplicates": [2, 3]}]
+    assert (report["requirements"], report["redundant"]) == (5, 2)
+
+
+def test_triggers_drop_signatures_of_changed_rows(conn):
+    index_missing(conn)
+    conn.execute("UPDATE requirements SET description = 'The system shall "
+                 "archive transcripts' WHERE id = 2")
+    conn.execute("DELETE FROM requirements WHERE id = 3")
+    assert find_similar(conn, signature(GRADES), threshold=0.7,
+                        exclude=1) == []
+    # Only the updated row needs signing again
+    assert index_missing(conn) == 1
+    assert duplicate_clusters(conn, threshold=0.7)["groups"] == []
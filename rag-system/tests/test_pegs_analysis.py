@@ -0,0 +1,72 @@
+# tests/test_pegs_analysis.py
+import sqlite3
+
+import pytest
+
+from pegs_analysis import (DEFAULT_PROJECT, TARGET, check,
+                           ensure_analysis_tables, history, read_scores,
+                           rebuild, snapshot)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""CREATE TABLE requirements (
+        id INTEGER PRIMARY KEY, title TEXT, description TEXT,
+        pegs_category TEXT, priority TEXT, status TEXT)""")
+    # Rows from before the counters existed are backfilled
+    conn.execute("INSERT INTO requirements (pegs_category, priority, status) "
+                 "VALUES ('System', 'High', 'Draft')")
+    ensure_analysis_tables(conn)
+    return conn
+
+
+def add(conn, category, project_id=None, priority="Medium", status="Draft"):
+    conn.execute("INSERT INTO requirements (pegs_category, priority, status, "
+                 "project_id) VALUES (?, ?, ?, ?)",
+                 (category, priority, status, project_id))
+
+
+def test_counters_follow_insert_update_and_delete(conn):
+    assert check(conn) == {"consistent": True, "drift": []}
+    for _ in range(3):
+        add(conn, "Goals", project_id=2)
+    add(conn, None)
+    conn.execute("UPDATE requirements SET pegs_category = 'Project', "
+                 "project_id = 2 WHERE id = 1")
+    conn.execute("UPDATE requirements SET status = 'Approved' "
+                 "WHERE id = 2")
+    conn.execute("DELETE FROM requirements WHERE id = 3")
+    assert check(conn) == {"consistent": True, "drift": []}
+
+    scores = read_scores(conn, 2)
+    assert (scores["total"], scores["by_category"]["Goals"],
+            scores["by_category"]["Project"]) == (3, 2, 1)
+    assert scores["goals_score"] == min(100.0, 2 * 100 / TARGET)
+    assert read_scores(conn, DEFAULT_PROJECT)["total"] == 1
+
+
+def test_check_reports_drift_and_rebuild_repairs_it(conn):
+    conn.execute("UPDATE pegs_project_counters SET count = 7 "
+                 "WHERE dimension = 'total'")
+    conn.commit()
+    report = check(conn)
+    assert not report["consistent"]
+    assert report["drift"] == [{"project_id": DEFAULT_PROJECT,
+                                "dimension": "total", "value": "",
+                                "stored": 7, "actual": 1}]
+    rebuild(conn)
+    assert check(conn)["consistent"]
+
+
+def test_snapshot_only_writes_changed_projects(conn):
+    assert snapshot(conn) == 1
+    assert snapshot(conn) == 0
+    add(conn, "Environment", project_id=2)
+    assert snapshot(conn) == 1
+    conn.execute("DELETE FROM requirements WHERE project_id = 2")
+    # Emptying a project is recorded too
+    assert snapshot(conn) == 1
+    latest = history(conn, 2)[0]
+    assert latest["overall_completeness"] == 0
+    assert latest["insights"] == ["No requirements yet"]
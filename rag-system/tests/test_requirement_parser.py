@@ -0,0 +1,90 @@
+# tests/test_requirement_parser.py
+from requirement_parser import RequirementParser, parse_requirements
+
+PROSE_AND_FENCE = """Here are the requirements:
+
+```json
+[
+  {"title": "MFA", "description": "System shall require MFA",
+   "pegs_category": "System", "priority": "Critical"},
+  {"title": "FERPA", "description": "System shall protect records",
+   "pegs_category": "environment"}
+]
+```
+Let me know if you need more."""
+
+
+def test_prose_then_fenced_json():
+    found = parse_requirements(PROSE_AND_FENCE)
+    assert [r["title"] for r in found] == ["MFA", "FERPA"]
+    assert found[0]["priority"] == "Critical"
+    assert found[1]["pegs_category"] == "Environment"
+
+
+def test_prose_then_fenced_json_streamed():
+    parser = RequirementParser()
+    found = []
+    for start in range(0, len(PROSE_AND_FENCE), 7):
+        found += parser.feed(PROSE_AND_FENCE[start:start + 7])
+    found += parser.close()
+    assert [r["title"] for r in found] == ["MFA", "FERPA"]
+
+
+def test_prose_then_bare_json_without_newline():
+    found = parse_requirements(
+        'Sure:\n[{"title": "Backup", "description": "Daily backups"}]')
+    assert [r["title"] for r in found] == ["Backup"]
+
+
+WRAPPED = """```json
+{"requirements": [
+  {"title": "MFA", "description": "System shall require MFA",
+   "tags": ["auth", "{not an object}"]},
+  {"title": "Export", "description": "Grades export as CSV"}
+], "notes": {"source": "interview"}}
+```"""
+
+
+def test_wrapper_object_yields_listed_requirements():
+    found = parse_requirements(WRAPPED)
+    assert [r["title"] for r in found] == ["MFA", "Export"]
+    assert found[1]["description"] == "Grades export as CSV"
+
+
+def test_wrapper_object_streamed():
+    parser = RequirementParser()
+    found, fed = {}, 0
+    for start in range(0, len(WRAPPED), 5):
+        fed += len(WRAPPED[start:start + 5])
+        for requirement in parser.feed(WRAPPED[start:start + 5]):
+            found[requirement["title"]] = fed
+    assert parser.close() == []
+    assert list(found) == ["MFA", "Export"]
+    # Each listed object comes out as soon as it closes
+    assert found["MFA"] < WRAPPED.index('{"title": "Export"')
+
+
+def test_single_wrapped_requirement():
+    found = parse_requirements(
+        '{"title": "Backup", "description": "Daily backups", '
+        '"steps": [{"id": 1}]}')
+    assert [r["title"] for r in found] == ["Backup"]
+
+
+def test_bullets():
+    found = parse_requirements(
+        "Requirements:\n- **Audit**: System shall log changes\n"
+        "2. Reports within 2 seconds\nThanks!")
+    assert [r["title"] for r in found] == ["Audit",
+                                           "Reports within 2 seconds"]
+
+
+def test_fenced_bullets_fall_back_to_lines():
+    found = parse_requirements("```\n- System shall back up data\n```")
+    assert [r["description"] for r in found] == ["System shall back up data"]
+
+
+def test_classify_fills_missing_category():
+    found = parse_requirements('[{"description": "Budget cap"}]',
+                               classify=lambda text: "Project")
+    assert found[0]["pegs_category"] == "Project"
@@ -0,0 +1,61 @@
+# tests/test_requirements_list.py
+import json
+
+import pytest
+
+import requirements_list
+from db_pool import ConnectionPool
+from requirements_list import FETCH_SIZE, stream_rows
+
+ROWS = FETCH_SIZE * 2 + 37
+
+
+@pytest.fixture
+def scratch_pool(tmp_path, monkeypatch):
+    pool = ConnectionPool(str(tmp_path / "list.db"), size=1)
+    with pool.connection() as conn:
+        conn.execute("""CREATE TABLE requirements (
+            id INTEGER PRIMARY KEY, title TEXT, description TEXT,
+            pegs_category TEXT, priority TEXT, status TEXT,
+            created_at TIMESTAMP)""")
+        conn.executemany(
+            "INSERT INTO requirements (title, pegs_category, created_at) "
+            "VALUES (?, ?, ?)",
+            [(f"R{i}", "System" if i % 2 else "Goals",
+              f"2026-01-{i % 28 + 1:02d}") for i in range(1, ROWS + 1)])
+        conn.commit()
+    monkeypatch.setattr(requirements_list, "pool", pool)
+    return pool
+
+
+def ndjson(chunks):
+    return [json.loads(line) for line in b"".join(chunks).splitlines()]
+
+
+def test_stream_releases_connection_between_pages(scratch_pool):
+    ids = []
+    for chunk in stream_rows("ndjson", "id", False, None, {}):
+        # A slow client holding a chunk does not hold the connection
+        assert scratch_pool.stats()["in_use"] == 0
+        ids += [json.loads(line)["id"] for line in chunk.splitlines()]
+    assert ids == list(range(1, ROWS + 1))
+
+
+def test_limited_stream_resumes_from_cursor(scratch_pool):
+    filters = {"pegs_category": "System"}
+    first = ndjson(stream_rows("ndjson", "created_at", True, None, filters,
+                               limit=FETCH_SIZE + 1))
+    cursor = first.pop()["next_cursor"]
+    rest = ndjson(stream_rows("ndjson", "created_at", True, cursor, filters))
+    rows = first + rest
+    assert len(first) == FETCH_SIZE + 1
+    assert len(rows) == (ROWS + 1) // 2
+    keys = [(row["created_at"], row["id"]) for row in rows]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_json_stream_body(scratch_pool):
+    body = json.loads(b"".join(stream_rows("json", "id", False, None, {},
+                                           limit=3)))
+    assert [row["id"] for row in body["requirements"]] == [1, 2, 3]
+    assert body["count"] == 3 and body["next_cursor"]
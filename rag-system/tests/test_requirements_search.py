@@ -0,0 +1,49 @@
+# tests/test_requirements_search.py
+import sqlite3
+
+import pytest
+
+from requirements_search import SearchQueryError, ensure_fts, search
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""CREATE TABLE requirements (
+        id INTEGER PRIMARY KEY, title TEXT, description TEXT,
+        pegs_category TEXT, priority TEXT, status TEXT)""")
+    if not ensure_fts(conn):
+        pytest.skip("SQLite has no FTS5")
+    conn.execute(
+        "INSERT INTO requirements (title, description) VALUES (?, ?)",
+        ("<script>alert(1)</script> export",
+         'Export grades as CSV <img src=x onerror="steal()">'))
+    conn.commit()
+    return conn
+
+
+def test_highlights_escape_stored_text(conn):
+    hit = search(conn, "export")["results"][0]
+    assert hit["title_highlight"] == \
+        "&lt;script&gt;alert(1)&lt;/script&gt; <mark>export</mark>"
+    assert hit["snippet"].startswith("<mark>Export</mark> grades")
+    assert "<img" not in hit["snippet"]
+    assert "&lt;img src=x onerror=&quot;steal()&quot;&gt;" in hit["snippet"]
+
+
+class FailingConnection:
+    def __init__(self, message):
+        self.message = message
+
+    def execute(self, sql, params):
+        raise sqlite3.OperationalError(self.message)
+
+
+def test_query_errors_are_client_errors():
+    with pytest.raises(SearchQueryError):
+        search(FailingConnection("fts5: syntax error near \"\""), "export")
+
+
+def test_database_errors_are_not_client_errors():
+    with pytest.raises(sqlite3.OperationalError):
+        search(FailingConnection("database is locked"), "export")
@@ -0,0 +1,132 @@
+# tests/test_retrieval.py
+import asyncio
+import sqlite3
+
+import numpy as np
+import pytest
+
+import retrieval
+from requirements_search import ensure_fts, rank_ids
+from retrieval import Retriever, build_prompt, rrf_fuse
+from vector_index import (KIND_CHUNK, KIND_REQUIREMENT, HashingEmbedder,
+                          VectorIndex, make_key, split_key)
+
+EMBEDDER = HashingEmbedder(dim=256)
+
+
+def test_index_search_and_remove_keep_rows_consistent():
+    index = VectorIndex(EMBEDDER.dim, capacity=2)
+    texts = ["export grades", "reset password", "audit logins"]
+    keys = [make_key(KIND_REQUIREMENT, i) for i in (1, 2, 3)]
+    index.add(keys, EMBEDDER.embed(texts))
+    assert len(index) == 3  # grew past the initial capacity
+
+    found, scores = index.search(EMBEDDER.embed(["reset password"]), k=2)[0]
+    assert found[0] == keys[1]
+    assert scores[0] > scores[1]
+
+    # Removing a middle row moves the last one into its slot
+    index.remove([keys[0]])
+    found, _ = index.search(EMBEDDER.embed(["audit logins"]), k=5)[0]
+    assert found[0] == keys[2] and keys[0] not in found
+    assert index.ids(KIND_REQUIREMENT).tolist() == [3, 2]
+    assert split_key(make_key(KIND_CHUNK, 7)) == (KIND_CHUNK, 7)
+
+
+def test_embedder_is_stable_and_unit_length():
+    first = EMBEDDER.embed(["The system shall export grades"])
+    again = HashingEmbedder(dim=256).embed(["The system shall export grades"])
+    assert np.array_equal(first, again)
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0)
+    assert not EMBEDDER.embed([""]).any()
+
+
+def test_retrieve_returns_nearest_requirements():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE requirements (id INTEGER PRIMARY KEY, "
+                 "title TEXT, description TEXT, pegs_category TEXT)")
+    conn.executemany(
+        "INSERT INTO requirements (title, description) VALUES (?, ?)",
+        [("Grades", "The system shall export student grades to CSV"),
+         ("Login", "The system shall lock accounts after failed logins"),
+         ("Backup", "The system shall back up the database nightly")])
+    retriever = Retriever(EMBEDDER, VectorIndex(EMBEDDER.dim))
+    assert retriever.build(conn) == 3
+
+    passages = retriever.retrieve(conn, "lock accounts after failed logins",
+                                  k=2)
+    assert [p["source"] for p in passages][0] == "requirement:2"
+    assert "Login" in passages[0]["text"]
+
+    prompt = build_prompt("Write login requirements", passages)
+    assert prompt.startswith("Use the following project context")
+    assert "[1] (requirement:2)" in prompt
+    assert build_prompt("Plain", []) == "Plain"
+
+
+def test_rrf_rewards_keys_ranked_by_both_lists():
+    fused = rrf_fuse({"lexical": [1, 2, 3], "vector": [3, 4, 1]}, k=60)
+    assert list(fused)[:2] == [1, 3]
+    score, ranks = fused[3]
+    assert ranks == {"lexical": 3, "vector": 1}
+    assert score == pytest.approx(1 / 63 + 1 / 61)
+    assert fused[4][1] == {"vector": 2}
+
+
+class InlineDatabase:
+    """db.run on the test's connection; ``delay`` stalls the BM25 stage"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.delay = 0.0
+
+    async def run(self, fn, *args):
+        if fn is rank_ids:
+            await asyncio.sleep(self.delay)
+        return fn(self.conn, *args)
+
+
+@pytest.fixture
+def hybrid_setup(monkeypatch):
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.execute("""CREATE TABLE requirements (
+        id INTEGER PRIMARY KEY, title TEXT, description TEXT,
+        pegs_category TEXT, priority TEXT, status TEXT)""")
+    if not ensure_fts(conn):
+        pytest.skip("SQLite has no FTS5")
+    conn.executemany(
+        "INSERT INTO requirements (title, description, pegs_category) "
+        "VALUES (?, ?, ?)",
+        [("Grades", "The system shall export grades as CSV", "System"),
+         ("Budget", "Exporting grades shall stay within budget", "Project"),
+         ("Login", "The system shall lock accounts", "System")])
+    conn.commit()
+    retriever = Retriever(EMBEDDER, VectorIndex(EMBEDDER.dim))
+    retriever.build(conn)
+    database = InlineDatabase(conn)
+    monkeypatch.setattr(retrieval, "db", database)
+    return retriever, database
+
+
+def test_hybrid_fuses_both_stages_and_boosts_category(hybrid_setup):
+    retriever, _ = hybrid_setup
+    result = asyncio.run(retriever.hybrid("export grades", k=2))
+    timings = result["timings"]
+    assert timings["lexical"]["status"] == timings["vector"]["status"] == "ok"
+    top = result["passages"][0]
+    assert top["source"] == "requirement:1"
+    assert set(top["ranks"]) == {"lexical", "vector"}
+
+    boosted = asyncio.run(retriever.hybrid("export grades", k=2,
+                                           pegs_category="Project"))
+    assert boosted["passages"][0]["source"] == "requirement:2"
+
+
+def test_hybrid_drops_a_stage_that_misses_the_budget(hybrid_setup):
+    retriever, database = hybrid_setup
+    database.delay = 0.5
+    result = asyncio.run(retriever.hybrid("export grades", k=2,
+                                          budget_ms=100))
+    assert result["timings"]["lexical"]["status"] == "timeout"
+    assert result["passages"]
+    assert all(set(p["ranks"]) == {"vector"} for p in result["passages"])
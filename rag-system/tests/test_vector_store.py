@@ -0,0 +1,90 @@
+# tests/test_vector_store.py
+import sqlite3
+
+import numpy as np
+import pytest
+
+from retrieval import Retriever
+from vector_index import KIND_REQUIREMENT, HashingEmbedder, make_key
+from vector_store import VectorStore
+
+EMBEDDER = HashingEmbedder()
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE requirements (id INTEGER PRIMARY KEY, "
+                 "title TEXT, description TEXT)")
+    conn.executemany(
+        "INSERT INTO requirements (title, description) VALUES (?, ?)",
+        [(f"R{i}", f"System shall handle case {i}") for i in range(50)])
+    return conn
+
+
+def open_store(path):
+    return VectorStore(str(path), EMBEDDER.dim, EMBEDDER.name)
+
+
+def held(store):
+    return sorted(store.ids(KIND_REQUIREMENT).tolist())
+
+
+def key(row_id):
+    return make_key(KIND_REQUIREMENT, row_id)
+
+
+def test_reopened_store_keeps_rows_counts_and_search(tmp_path, conn):
+    Retriever(EMBEDDER, open_store(tmp_path)).build(conn)
+    store = open_store(tmp_path)
+    assert len(store) == store.count(KIND_REQUIREMENT) == 50
+    assert store.watermark(KIND_REQUIREMENT) == 50
+    query = EMBEDDER.embed(["System shall handle case 7"])
+    keys, _ = store.search(query, k=1)[0]
+    assert keys == [key(8)]
+
+
+def test_remove_and_replace_update_counts(tmp_path):
+    store = open_store(tmp_path)
+    vectors = EMBEDDER.embed(["a", "b", "c"])
+    store.add([key(1), key(2), key(3)], vectors)
+    store.remove([key(2)])
+    store.add([key(1)], EMBEDDER.embed(["a again"]))
+    assert store.count(KIND_REQUIREMENT) == 2
+    assert held(store) == [1, 3]
+    assert open_store(tmp_path).count(KIND_REQUIREMENT) == 2
+
+
+def test_warm_build_reads_only_new_rows(tmp_path, conn, monkeypatch):
+    Retriever(EMBEDDER, open_store(tmp_path)).build(conn)
+    conn.execute("INSERT INTO requirements (title, description) "
+                 "VALUES ('New', 'System shall export')")
+    store = open_store(tmp_path)
+    monkeypatch.setattr(store, "ids", lambda kind: pytest.fail("full diff"))
+    assert Retriever(EMBEDDER, store).build(conn) == 51
+
+
+def test_build_repairs_lost_append_and_lost_remove(tmp_path, conn):
+    Retriever(EMBEDDER, open_store(tmp_path)).build(conn)
+    # An append lost below the watermark
+    open_store(tmp_path).remove([key(10)])
+    assert Retriever(EMBEDDER, open_store(tmp_path)).build(conn) == 50
+    assert 10 in held(open_store(tmp_path))
+
+    # A database delete whose index remove was lost
+    conn.execute("DELETE FROM requirements WHERE id = 20")
+    store = open_store(tmp_path)
+    assert Retriever(EMBEDDER, store).build(conn) == 49
+    assert 20 not in held(store)
+
+
+def test_compaction_keeps_live_rows(tmp_path):
+    store = open_store(tmp_path)
+    texts = [f"text {i}" for i in range(20)]
+    store.add([key(i) for i in range(1, 21)], EMBEDDER.embed(texts))
+    store.remove([key(i) for i in range(1, 21, 2)])
+    stats = store.compact()
+    assert (stats["rows"], stats["deleted"]) == (10, 0)
+    assert held(open_store(tmp_path)) == list(range(2, 21, 2))
+    assert np.isfinite(store.search(EMBEDDER.embed(["text 3"]), k=3)[0][1]) \
+        .all()
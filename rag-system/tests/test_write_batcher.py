@@ -0,0 +1,63 @@
+# tests/test_write_batcher.py
+import asyncio
+import sqlite3
+
+import pytest
+
+from write_batcher import WriteBatcher
+
+
+class InlineDatabase:
+    """Runs write calls on the test's own connection"""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:", isolation_level=None)
+        self.conn.execute("CREATE TABLE rows (id INTEGER PRIMARY KEY, "
+                          "name TEXT UNIQUE)")
+        self.conn.execute("CREATE TABLE tags (row_id INTEGER, "
+                          "tag TEXT NOT NULL)")
+
+    async def write(self, fn, *args):
+        return fn(self.conn, *args)
+
+
+def write_with_tag(c, params):
+    name, tag = params
+    c.execute("INSERT INTO rows (name) VALUES (?)", (name,))
+    row_id = c.lastrowid
+    c.execute("INSERT INTO tags (row_id, tag) VALUES (?, ?)", (row_id, tag))
+    return row_id
+
+
+def test_failing_writer_row_is_rolled_back_alone():
+    database = InlineDatabase()
+    batcher = WriteBatcher(None, database=database, writer=write_with_tag)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.submit(("a", "x")),
+            batcher.submit(("b", None)),  # tag insert fails after the row
+            batcher.submit(("c", "z")),
+            return_exceptions=True)
+
+    _, failed, _ = asyncio.run(run())
+    assert isinstance(failed, sqlite3.IntegrityError)
+    names = [name for name, in database.conn.execute(
+        "SELECT name FROM rows ORDER BY id")]
+    assert names == ["a", "c"]
+    assert database.conn.execute("SELECT COUNT(*) FROM tags").fetchone() \
+        == (2,)
+
+
+def test_unknown_durability_mode():
+    with pytest.raises(ValueError):
+        WriteBatcher("INSERT INTO rows (name) VALUES (?)", durability="fast")
+
+
+def test_batch_restores_synchronous():
+    database = InlineDatabase()
+    database.conn.execute("PRAGMA synchronous=FULL")
+    batcher = WriteBatcher("INSERT INTO rows (name) VALUES (?)",
+                           durability="off", database=database)
+    assert asyncio.run(batcher.submit(("a",))) == 1
+    assert database.conn.execute("PRAGMA synchronous").fetchone() == (2,)
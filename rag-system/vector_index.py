@@ -0,0 +1,263 @@
+# vector_index.py
+"""Embeddings and an in-memory cosine-similarity index for retrieval"""
+
+import math
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+EMBEDDING_DIM = int(os.getenv("SIS_EMBEDDING_DIM", "384"))
+EMBEDDING_MODEL = os.getenv("SIS_EMBEDDING_MODEL", "")
+
+# Index keys pack the source kind into the high bits of an int64 so
+# requirements and document passages share one index
+KIND_REQUIREMENT = 0
+KIND_DOCUMENT = 1
+KIND_CHUNK = 2
+KIND_NAMES = {KIND_REQUIREMENT: "requirement", KIND_DOCUMENT: "document",
+              KIND_CHUNK: "chunk"}
+_KIND_SHIFT = 48
+
+
+def make_key(kind: int, row_id: int) -> int:
+    return (kind << _KIND_SHIFT) | row_id
+
+
+def split_key(key: int) -> tuple:
+    return int(key) >> _KIND_SHIFT, int(key) & ((1 << _KIND_SHIFT) - 1)
+
+
+def split_keys(keys: np.ndarray) -> tuple:
+    """Vectorized ``split_key``: (kinds, row ids) arrays"""
+    keys = np.asarray(keys, dtype=np.int64)
+    return keys >> _KIND_SHIFT, keys & ((1 << _KIND_SHIFT) - 1)
+
+
+def key_name(key: int) -> str:
+    """Readable source id such as "requirement:12" """
+    kind, row_id = split_key(key)
+    return f"{KIND_NAMES.get(kind, kind)}:{row_id}"
+
+
+class HashingEmbedder:
+    """Offline embedder: signed feature hashing of words, stems and pairs.
+
+    Needs no model download and is stable across processes (crc32, not
+    Python's salted hash), so vectors can be stored and reused.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str):
+        words = re.findall(r"\w+", (text or "").lower())
+        # Crude stems let "logins" meet "login" and "authenticate" meet
+        # "authentication"
+        stems = [f"~{w[:5]}" for w in words if len(w) > 5]
+        return words + stems + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts) -> np.ndarray:
+        texts = list(texts)
+        rows, cols, values = [], [], []
+        for row, text in enumerate(texts):
+            counts = {}
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode())
+                counts[h] = counts.get(h, 0) + 1
+            for h, count in counts.items():
+                rows.append(row)
+                cols.append(h % self.dim)
+                # Sublinear term frequency, sign from an independent bit
+                sign = 1.0 if (h >> 31) & 1 else -1.0
+                values.append(sign * (1.0 + math.log(count)))
+
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(vectors, (np.asarray(rows, dtype=np.intp),
+                            np.asarray(cols, dtype=np.intp)),
+                  np.asarray(values, dtype=np.float32))
+        return normalize(vectors)
+
+
+class SentenceTransformerEmbedder:
+    """Local sentence-transformers model, when installed and configured"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st-{model_name}"
+
+    def embed(self, texts) -> np.ndarray:
+        vectors = self.model.encode(list(texts), batch_size=64,
+                                    convert_to_numpy=True)
+        return normalize(vectors.astype(np.float32))
+
+
+def get_embedder():
+    """SIS_EMBEDDING_MODEL if it loads, otherwise the hashing fallback"""
+    if EMBEDDING_MODEL:
+        try:
+            return SentenceTransformerEmbedder(EMBEDDING_MODEL)
+        except Exception as e:
+            print(f"⚠️ Embedding model unavailable ({e}); using hashing")
+    return HashingEmbedder()
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+class VectorIndex:
+    """Exact top-k cosine search over a contiguous float32 matrix.
+
+    Rows are unit vectors, so cosine similarity is one matrix product.
+    Capacity doubles as rows are added, keeping inserts amortized O(1).
+    Each row also carries an int32 label (-1 if unset) that an ANN index
+    layered on top uses for its cluster assignment.
+    """
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        self.dim = dim
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._keys = np.zeros(capacity, dtype=np.int64)
+        self._labels = np.full(capacity, -1, dtype=np.int32)
+        self._rows = {}
+        self._size = 0
+        # Bumped whenever rows change position (see snapshot)
+        self._layout = 0
+        self._arrays = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        if needed <= len(self._keys):
+            return
+        capacity = max(needed, 2 * len(self._keys))
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        keys = np.zeros(capacity, dtype=np.int64)
+        keys[:self._size] = self._keys[:self._size]
+        labels = np.full(capacity, -1, dtype=np.int32)
+        labels[:self._size] = self._labels[:self._size]
+        self._vectors, self._keys, self._labels = vectors, keys, labels
+
+    def add(self, keys, vectors: np.ndarray, labels=None):
+        """Insert or replace rows; ``vectors`` must be unit length"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if labels is None:
+            labels = np.full(len(vectors), -1, dtype=np.int32)
+        with self._lock:
+            self._reserve(len(vectors))
+            for key, vector, label in zip(keys, vectors, labels):
+                key = int(key)
+                row = self._rows.get(key)
+                if row is None:
+                    row = self._size
+                    self._rows[key] = row
+                    self._keys[row] = key
+                    self._size += 1
+                self._vectors[row] = vector
+                self._labels[row] = label
+
+    def remove(self, keys):
+        """Drop rows by moving the last row into each freed slot"""
+        with self._lock:
+            for key in keys:
+                row = self._rows.pop(int(key), None)
+                if row is None:
+                    continue
+                last = self._size - 1
+                if row != last:
+                    moved = int(self._keys[last])
+                    self._vectors[row] = self._vectors[last]
+                    self._keys[row] = moved
+                    self._labels[row] = self._labels[last]
+                    self._rows[moved] = row
+                self._size -= 1
+                self._layout += 1
+
+    def search(self, queries: np.ndarray, k: int = 5):
+        """Top-k (keys, scores) per query row, best first"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            n = self._size
+            if n == 0 or k < 1:
+                return [([], []) for _ in queries]
+            scores = queries @ self._vectors[:n].T
+            keys = self._keys[:n].copy()
+        return top_k(scores, keys, k)
+
+    def snapshot(self) -> tuple:
+        """(vectors, keys, labels, layout) views of the current rows.
+
+        Row positions stay valid while ``layout`` is unchanged; appends
+        only add rows at the end.
+        """
+        with self._lock:
+            n = self._size
+            return (self._vectors[:n], self._keys[:n], self._labels[:n],
+                    self._layout)
+
+    def set_labels(self, layout: int, start: int, labels) -> bool:
+        """Overwrite labels from row ``start``; False if rows have moved"""
+        with self._lock:
+            if layout != self._layout:
+                return False
+            self._labels[start:start + len(labels)] = labels
+            return True
+
+    def save_array(self, name: str, array: np.ndarray, meta: dict = None):
+        self._arrays[name] = (array, meta or {})
+
+    def load_array(self, name: str) -> tuple:
+        """(array, meta) saved under ``name``, or (None, None)"""
+        return self._arrays.get(name, (None, None))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"dim": self.dim, "rows": self._size, "live": self._size,
+                    "bytes": self._size * (self.dim * 4 + 12)}
+
+    def watermark(self, kind: int) -> int:
+        """Highest row id of ``kind`` held in the index (0 if none)"""
+        with self._lock:
+            kinds, ids = split_keys(self._keys[:self._size])
+            ids = ids[kinds == kind]
+            return int(ids.max()) if len(ids) else 0
+
+    def ids(self, kind: int) -> np.ndarray:
+        """Row ids of ``kind`` held in the index"""
+        with self._lock:
+            kinds, ids = split_keys(self._keys[:self._size])
+            return ids[kinds == kind]
+
+    def count(self, kind: int) -> int:
+        """Number of rows of ``kind`` held in the index"""
+        return len(self.ids(kind))
+
+
+def top_k(scores: np.ndarray, keys: np.ndarray, k: int):
+    """Best ``k`` (keys, scores) per row of a queries x rows score matrix.
+
+    Rows scored ``-inf`` (deleted entries) are never returned.
+    """
+    k = min(k, scores.shape[1])
+    if k < 1:
+        return [([], []) for _ in scores]
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    results = []
+    for row, candidates in enumerate(top):
+        order = candidates[np.argsort(-scores[row, candidates])]
+        order = order[np.isfinite(scores[row, order])]
+        results.append((keys[order].tolist(), scores[row, order].tolist()))
+    return results
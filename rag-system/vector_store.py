@@ -0,0 +1,469 @@
+# vector_store.py
+"""
+Persistent, memory-mapped embedding store for retrieval.
+
+Layout of SIS_VECTOR_DIR:
+
+    manifest.json       dim, embedder, row counts (also per kind),
+                        generation, watermarks
+    vectors.<gen>.f32   row-major float32 matrix, one row per entry
+    keys.<gen>.i64      int64 index key per row; -1 marks a deleted row
+    labels.<gen>.i32    int32 ANN cluster label per row; -1 if unassigned
+    <name>.npy          side arrays such as the ANN centroids
+
+Opening maps the files without reading them, so startup cost does not
+grow with the corpus. New rows are appended to the end of the files and
+deletes overwrite the key with a tombstone; neither rewrites existing
+rows. Once enough rows are tombstoned a background thread copies the
+live rows into the next generation and swaps the manifest atomically.
+
+The files are derived data: if the manifest is missing or was written
+for another embedder or database, the store starts empty and is rebuilt
+from the database, and rows lost after the database committed them are
+re-embedded on the next start (``Retriever.build`` compares the counts).
+That is why appends do not fsync the manifest unless SIS_VECTOR_FSYNC=1;
+resets and compactions, which delete files, always do.
+
+Inspect or compact the store from the shell with:
+
+    python vector_store.py stats
+    python vector_store.py compact
+"""
+
+import glob
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+
+from vector_index import split_keys, top_k
+
+VECTOR_DIR = os.getenv("SIS_VECTOR_DIR", "vector_store")
+# Compact once this share of the rows (and at least COMPACT_MIN_ROWS) is dead
+COMPACT_RATIO = float(os.getenv("SIS_VECTOR_COMPACT_RATIO", "0.2"))
+COMPACT_MIN_ROWS = 1024
+FSYNC = os.getenv("SIS_VECTOR_FSYNC", "0") == "1"
+COPY_BLOCK = 8192
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 2
+TOMBSTONE = -1
+# Per-row files: name -> (extension, dtype)
+COLUMNS = {
+    "vectors": ("f32", np.float32),
+    "keys": ("i64", np.int64),
+    "labels": ("i32", np.int32),
+}
+
+
+class VectorStore:
+    """On-disk counterpart of ``VectorIndex`` with the same interface.
+
+    The manifest is the commit point: rows appended after the last
+    manifest write (e.g. by a crash mid-append) are truncated on open.
+    ``count()`` and ``watermark()`` are read from the manifest, so the
+    caller can check it is in step with the database without reading
+    the keys; ``ids()`` lists them when it is not.
+    """
+
+    def __init__(self, path: str, dim: int, embedder: str, source: str = ""):
+        self.path = path
+        self.dim = dim
+        self.embedder = embedder
+        self.source = source
+        self._manifest = None
+        self._vectors = None
+        self._keys = None
+        self._labels = None
+        self._stale = False  # maps lag the manifest after an append
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._compactor = None
+
+    def _file(self, stem: str, generation: int) -> str:
+        return os.path.join(self.path,
+                            f"{stem}.{generation}.{COLUMNS[stem][0]}")
+
+    def _row_bytes(self, stem: str) -> int:
+        width = self.dim if stem == "vectors" else 1
+        return width * np.dtype(COLUMNS[stem][1]).itemsize
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.path, MANIFEST)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, manifest: dict, sync: bool = True):
+        """Replace the manifest atomically (write, fsync, rename)"""
+        final = os.path.join(self.path, MANIFEST)
+        tmp = final + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, final)
+        self._manifest = manifest
+
+    def _open(self):
+        """Map the current generation; cheap no-op once open"""
+        if self._manifest is not None:
+            if self._stale:
+                self._map()
+            return
+        os.makedirs(self.path, exist_ok=True)
+        manifest = self._read_manifest()
+        if (manifest is None
+                or manifest.get("version") != FORMAT_VERSION
+                or manifest.get("dim") != self.dim
+                or manifest.get("embedder") != self.embedder
+                or manifest.get("source") != self.source
+                or not self._truncate(manifest)):
+            manifest = self._reset(manifest)
+        self._manifest = manifest
+        self._map()
+        self._remove_stale()
+
+    def _truncate(self, manifest: dict) -> bool:
+        """Cut both files back to the committed row count"""
+        rows, generation = manifest["rows"], manifest["generation"]
+        for stem in COLUMNS:
+            size = rows * self._row_bytes(stem)
+            path = self._file(stem, generation)
+            if not os.path.exists(path) or os.path.getsize(path) < size:
+                return False
+            if os.path.getsize(path) > size:
+                os.truncate(path, size)
+        return True
+
+    def _reset(self, old):
+        generation = (old or {}).get("generation", 0) + 1
+        for stem in COLUMNS:
+            open(self._file(stem, generation), "wb").close()
+        for path in glob.glob(os.path.join(self.path, "*.npy")):
+            os.remove(path)
+        manifest = {
+            "version": FORMAT_VERSION,
+            "dim": self.dim,
+            "embedder": self.embedder,
+            "source": self.source,
+            "generation": generation,
+            "rows": 0,
+            "deleted": 0,
+            "counts": {},
+            "watermarks": {},
+            "arrays": {}
+        }
+        self._write_manifest(manifest)
+        return manifest
+
+    def _remove_stale(self):
+        """Delete files of other generations (e.g. an interrupted compaction)"""
+        current = {self._file(stem, self._manifest["generation"])
+                   for stem in COLUMNS}
+        for ext, _ in COLUMNS.values():
+            for path in glob.glob(os.path.join(self.path, f"*.*.{ext}")):
+                if path not in current:
+                    os.remove(path)
+
+    def _map(self):
+        self._stale = False
+        rows, generation = self._manifest["rows"], self._manifest["generation"]
+        if rows == 0:
+            self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+            self._keys = np.zeros(0, dtype=np.int64)
+            self._labels = np.zeros(0, dtype=np.int32)
+            return
+        # Zero-copy: pages are read on demand and shared with the OS cache
+        self._vectors = np.memmap(self._file("vectors", generation),
+                                  dtype=np.float32, mode="r",
+                                  shape=(rows, self.dim))
+        self._keys = np.memmap(self._file("keys", generation),
+                               dtype=np.int64, mode="r+", shape=(rows,))
+        self._labels = np.memmap(self._file("labels", generation),
+                                 dtype=np.int32, mode="r+", shape=(rows,))
+
+    def __len__(self):
+        with self._lock:
+            self._open()
+            return self._manifest["rows"] - self._manifest["deleted"]
+
+    def watermark(self, kind: int) -> int:
+        """Highest row id of ``kind`` ever added (0 if none)"""
+        with self._lock:
+            self._open()
+            return self._manifest["watermarks"].get(str(kind), 0)
+
+    def count(self, kind: int) -> int:
+        """Live rows of ``kind`` (kept in the manifest)"""
+        with self._lock:
+            self._open()
+            return self._counts().get(str(kind), 0)
+
+    def _counts(self) -> dict:
+        """Per-kind live row counts of the current manifest"""
+        counts = self._manifest.get("counts")
+        if counts is None:
+            # Manifest written before per-kind counts: count once
+            keys = np.asarray(self._keys)
+            kinds, _ = split_keys(keys[keys != TOMBSTONE])
+            values, numbers = np.unique(kinds, return_counts=True)
+            counts = {str(int(kind)): int(number)
+                      for kind, number in zip(values, numbers)}
+            self._manifest["counts"] = counts
+        return counts
+
+    def ids(self, kind: int) -> np.ndarray:
+        """Row ids of ``kind`` held in the store (tombstones excluded)"""
+        with self._lock:
+            self._open()
+            keys = np.asarray(self._keys)
+        kinds, ids = split_keys(keys[keys != TOMBSTONE])
+        return ids[kinds == kind]
+
+    def _tombstone(self, keys) -> int:
+        if not len(self._keys):
+            return 0
+        dead = np.isin(self._keys, keys)
+        count = int(dead.sum())
+        if count:
+            counts = self._counts()
+            kinds, _ = split_keys(np.asarray(self._keys[dead]))
+            for kind, number in zip(*np.unique(kinds, return_counts=True)):
+                counts[str(int(kind))] = counts.get(str(int(kind)), 0) - \
+                    int(number)
+            self._keys[dead] = TOMBSTONE
+            self._keys.flush()
+            self._manifest["deleted"] += count
+        return count
+
+    def add(self, keys, vectors: np.ndarray, labels=None):
+        """Append rows; keys at or below the watermark replace older rows"""
+        keys = np.asarray(list(keys), dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if not len(keys):
+            return
+        if labels is None:
+            labels = np.full(len(keys), -1, dtype=np.int32)
+        labels = np.asarray(labels, dtype=np.int32)
+        # Keep only the last copy of a key repeated within the batch
+        _, last = np.unique(keys[::-1], return_index=True)
+        keep = np.sort(len(keys) - 1 - last)
+        keys, vectors = keys[keep], np.ascontiguousarray(vectors[keep])
+        labels = labels[keep]
+        kinds, ids = split_keys(keys)
+
+        with self._lock:
+            self._open()
+            self._counts()
+            manifest = dict(self._manifest)
+            marks = dict(manifest["watermarks"])
+            seen = np.zeros(len(keys), dtype=bool)
+            for kind in np.unique(kinds).tolist():
+                of_kind = kinds == kind
+                seen |= of_kind & (ids <= marks.get(str(kind), 0))
+                marks[str(kind)] = max(marks.get(str(kind), 0),
+                                       int(ids[of_kind].max()))
+            if seen.any():
+                self._tombstone(keys[seen])
+                manifest["deleted"] = self._manifest["deleted"]
+            counts = dict(self._manifest["counts"])
+            for kind in np.unique(kinds).tolist():
+                counts[str(kind)] = counts.get(str(kind), 0) + \
+                    int((kinds == kind).sum())
+            manifest["counts"] = counts
+
+            generation = manifest["generation"]
+            with open(self._file("vectors", generation), "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self._file("keys", generation), "ab") as f:
+                f.write(keys.tobytes())
+            with open(self._file("labels", generation), "ab") as f:
+                f.write(labels.tobytes())
+            manifest["rows"] += len(keys)
+            manifest["watermarks"] = marks
+            self._write_manifest(manifest, sync=FSYNC)
+            # Re-mapped on the next read, so a run of appends maps once
+            self._stale = True
+            self._maybe_compact()
+
+    def remove(self, keys):
+        """Tombstone rows by key"""
+        keys = np.asarray(list(keys), dtype=np.int64)
+        with self._lock:
+            self._open()
+            if self._tombstone(keys):
+                self._write_manifest(dict(self._manifest), sync=FSYNC)
+                self._maybe_compact()
+
+    def search(self, queries: np.ndarray, k: int = 5):
+        """Top-k (keys, scores) per query row, best first"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            self._open()
+            vectors, keys = self._vectors, np.array(self._keys)
+        if not len(keys) or k < 1:
+            return [([], []) for _ in queries]
+        scores = queries @ vectors.T
+        scores[:, keys == TOMBSTONE] = -np.inf
+        return top_k(scores, keys, k)
+
+    def snapshot(self) -> tuple:
+        """(vectors, keys, labels, layout) maps of the committed rows.
+
+        ``layout`` is the generation: row positions stay valid until a
+        compaction or reset moves to the next one.
+        """
+        with self._lock:
+            self._open()
+            return (self._vectors, self._keys, self._labels,
+                    self._manifest["generation"])
+
+    def set_labels(self, layout: int, start: int, labels) -> bool:
+        """Overwrite labels in place from row ``start``; False if stale"""
+        with self._lock:
+            self._open()
+            if layout != self._manifest["generation"]:
+                return False
+            self._labels[start:start + len(labels)] = labels
+            if isinstance(self._labels, np.memmap):
+                self._labels.flush()
+            return True
+
+    def save_array(self, name: str, array: np.ndarray, meta: dict = None):
+        """Store a side array as <name>.npy and record it in the manifest"""
+        with self._lock:
+            self._open()
+            final = os.path.join(self.path, f"{name}.npy")
+            with open(final + ".tmp", "wb") as f:
+                np.save(f, array)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(final + ".tmp", final)
+            arrays = dict(self._manifest["arrays"], **{name: meta or {}})
+            self._write_manifest(dict(self._manifest, arrays=arrays))
+
+    def load_array(self, name: str) -> tuple:
+        """(array, meta) saved under ``name``, or (None, None)"""
+        with self._lock:
+            self._open()
+            if name not in self._manifest["arrays"]:
+                return None, None
+            array = np.load(os.path.join(self.path, f"{name}.npy"))
+            return array, self._manifest["arrays"][name]
+
+    def _maybe_compact(self):
+        deleted, rows = self._manifest["deleted"], self._manifest["rows"]
+        if (deleted >= COMPACT_MIN_ROWS and deleted > COMPACT_RATIO * rows
+                and not (self._compactor and self._compactor.is_alive())):
+            self._compactor = threading.Thread(target=self.compact,
+                                               name="vector-compactor",
+                                               daemon=True)
+            self._compactor.start()
+
+    def compact(self) -> dict:
+        """Copy live rows into a new generation and switch to it.
+
+        The bulk copy runs without the store lock, so searches and
+        appends carry on; rows appended and deletes made meanwhile are
+        applied under the lock just before the manifest swap.
+        """
+        with self._compact_lock:
+            with self._lock:
+                self._open()
+                old = self._manifest
+                columns = {"vectors": self._vectors, "keys": self._keys}
+            generation, copied = old["generation"], old["rows"]
+            new = generation + 1
+            live = np.flatnonzero(
+                np.asarray(columns["keys"][:copied]) != TOMBSTONE)
+
+            files = {stem: open(self._file(stem, new), "wb")
+                     for stem in COLUMNS}
+            try:
+                for start in range(0, len(live), COPY_BLOCK):
+                    block = live[start:start + COPY_BLOCK]
+                    for stem in ("vectors", "keys"):
+                        files[stem].write(
+                            np.asarray(columns[stem][block]).tobytes())
+
+                with self._lock:
+                    self._open()
+                    current = self._manifest
+                    if current["generation"] != generation:
+                        raise RuntimeError("store was reset during compaction")
+                    # Rows appended and labels set while copying go over
+                    # as they are now
+                    tail = slice(copied, current["rows"])
+                    files["labels"].write(
+                        np.asarray(self._labels[live]).tobytes())
+                    for stem, f in files.items():
+                        column = getattr(self, f"_{stem}")
+                        f.write(np.asarray(column[tail]).tobytes())
+                        f.flush()
+                        os.fsync(f.fileno())
+                        f.close()
+
+                    rows = len(live) + (current["rows"] - copied)
+                    new_keys = np.memmap(self._file("keys", new),
+                                         dtype=np.int64, mode="r+",
+                                         shape=(rows,)) if rows else None
+                    if len(live):
+                        # Deletes made while copying
+                        dead = np.asarray(self._keys[live]) == TOMBSTONE
+                        new_keys[:len(live)][dead] = TOMBSTONE
+                    deleted = int((new_keys == TOMBSTONE).sum()) if rows else 0
+                    if rows:
+                        new_keys.flush()
+
+                    self._write_manifest(dict(current, generation=new,
+                                              rows=rows, deleted=deleted))
+                    self._map()
+                    # Searches still holding the old maps keep working
+                    # after the files are unlinked
+                    self._remove_stale()
+                    return self.stats()
+            except BaseException:
+                for f in files.values():
+                    f.close()
+                for stem in COLUMNS:
+                    if os.path.exists(self._file(stem, new)):
+                        os.remove(self._file(stem, new))
+                raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._open()
+            manifest = self._manifest
+            return {
+                "path": os.path.abspath(self.path),
+                "embedder": manifest["embedder"],
+                "dim": manifest["dim"],
+                "generation": manifest["generation"],
+                "rows": manifest["rows"],
+                "deleted": manifest["deleted"],
+                "live": manifest["rows"] - manifest["deleted"],
+                "bytes": manifest["rows"] * sum(map(self._row_bytes, COLUMNS)),
+                "watermarks": manifest["watermarks"],
+                "counts": self._counts(),
+                "compacting": bool(self._compactor
+                                   and self._compactor.is_alive())
+            }
+
+
+if __name__ == "__main__":
+    from retrieval import retriever
+
+    # The store may sit under an ANN index
+    store = getattr(retriever.index, "base", retriever.index)
+    if len(sys.argv) != 2 or sys.argv[1] not in ("stats", "compact") \
+            or not hasattr(store, "compact"):
+        print("usage: python vector_store.py stats|compact "
+              "(with SIS_VECTOR_DIR set)")
+        sys.exit(2)
+    command = retriever.index.stats if sys.argv[1] == "stats" else store.compact
+    print(json.dumps(command(), indent=2))
@@ -0,0 +1,160 @@
+# write_batcher.py
+"""Group-commit batching for single-row INSERTs"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+
+from db_pool import db
+
+# Batching settings (override through environment variables)
+BATCH_MAX_ROWS = int(os.getenv("SIS_WRITE_BATCH_ROWS", "256"))
+BATCH_MAX_DELAY_MS = float(os.getenv("SIS_WRITE_BATCH_DELAY_MS", "2"))
+DURABILITY = os.getenv("SIS_WRITE_DURABILITY", "normal")
+
+# Durability mode -> PRAGMA synchronous value used for each group commit.
+#   full:   fsync on every commit; survives power loss
+#   normal: WAL default; survives an app crash, may lose the last commits
+#           on power loss
+#   off:    no fsync at all; fastest, for bulk loads and benchmarks
+DURABILITY_MODES = {"full": "FULL", "normal": "NORMAL", "off": "OFF"}
+
+# Errors that belong to one row rather than to the whole batch
+ROW_ERRORS = (sqlite3.IntegrityError, sqlite3.InterfaceError,
+              sqlite3.ProgrammingError)
+
+
+class WriteBatcher:
+    """Collects concurrent INSERTs and commits them as one transaction.
+
+    Callers ``await batcher.submit(params)`` and get back their own
+    ``lastrowid``. Rows are flushed after ``max_delay_ms`` or as soon as
+    ``max_rows`` are pending; while one batch is committing on the writer
+    thread the next one keeps filling up.
+
+    ``writer(cursor, params)``, if given, writes each row instead of
+    ``sql`` and its return value is what ``submit`` returns; it runs on
+    the writer thread, so it sees the rows earlier in the same batch.
+    """
+
+    def __init__(self, sql: str, max_rows: int = BATCH_MAX_ROWS,
+                 max_delay_ms: float = BATCH_MAX_DELAY_MS,
+                 durability: str = DURABILITY, database=db, writer=None):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"unknown durability mode: {durability!r} "
+                             f"(expected one of {sorted(DURABILITY_MODES)})")
+        self.sql = sql
+        self.max_rows = max(1, max_rows)
+        self.max_delay = max_delay_ms / 1000
+        self.durability = durability
+        self.database = database
+        self.writer = writer
+        self._pending = []
+        self._timer = None
+        # Commits in flight; the loop only keeps weak references to tasks
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._largest = 0
+
+    async def submit(self, params: tuple) -> int:
+        """Queue one row and wait for the commit that contains it"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((params, future))
+        if len(self._pending) >= self.max_rows:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._commit(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _commit(self, batch):
+        try:
+            results = await self.database.write(self._insert_batch,
+                                                [p for p, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _insert_batch(self, conn, rows):
+        """Insert every row in one transaction (runs on the writer thread)"""
+        # The connection is shared with other writes; give it back with
+        # its own setting
+        synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+        conn.execute(f"PRAGMA synchronous={DURABILITY_MODES[self.durability]}")
+        c = conn.cursor()
+        results = []
+        c.execute("BEGIN")
+        try:
+            for params in rows:
+                # A failing statement is rolled back on its own, so one bad
+                # row does not cost the rest of the batch its commit
+                try:
+                    if self.writer is not None:
+                        results.append(self._write_row(c, params))
+                    else:
+                        c.execute(self.sql, params)
+                        results.append(c.lastrowid)
+                except ROW_ERRORS as e:
+                    results.append(e)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute(f"PRAGMA synchronous={synchronous}")
+
+        with self._lock:
+            self._batches += 1
+            self._rows += len(rows)
+            self._largest = max(self._largest, len(rows))
+        return results
+
+    def _write_row(self, c, params):
+        """Run the writer inside a savepoint: its statements may already
+        have succeeded when a later one fails, and those must not be
+        committed with the rest of the batch"""
+        c.execute("SAVEPOINT batch_row")
+        try:
+            result = self.writer(c, params)
+        except ROW_ERRORS:
+            c.execute("ROLLBACK TO batch_row")
+            c.execute("RELEASE batch_row")
+            raise
+        c.execute("RELEASE batch_row")
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "durability": self.durability,
+                "max_rows": self.max_rows,
+                "max_delay_ms": self.max_delay * 1000,
+                "batches": self._batches,
+                "rows": self._rows,
+                "avg_batch": round(self._rows / self._batches, 2)
+                if self._batches else 0.0,
+                "largest_batch": self._largest
+            }